@@ -0,0 +1,77 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+"""Compare rows fetched by financial statements entry by entry and summed up per period.
+
+        bench --site <site> execute erpnext.accounts.benchmarks.financial_statements.run
+                --kwargs "{'company': '_Test Company', 'from_fiscal_year': '2019'}"
+
+GL entries of all accounts of the company, till the end of the last fiscal year, are read
+the way Balance Sheet and Profit and Loss reports used to (one row per GL Entry) and
+summed up per account and period in the query, as `set_gl_entries_by_account` does now.
+"""
+
+import frappe
+from frappe.utils import nowdate
+
+import erpnext
+from erpnext.accounts.report.financial_statements import (
+	get_period_list,
+	set_gl_entries_by_account,
+)
+from erpnext.accounts.utils import get_fiscal_year
+from erpnext.stock.benchmarks.utils import measure, print_results
+
+
+def run(company=None, from_fiscal_year=None, to_fiscal_year=None, periodicity="Monthly"):
+	company = company or erpnext.get_default_company()
+	to_fiscal_year = to_fiscal_year or get_fiscal_year(nowdate(), company=company)[0]
+	period_list = get_period_list(
+		from_fiscal_year or to_fiscal_year,
+		to_fiscal_year,
+		None,
+		None,
+		"Fiscal Year",
+		periodicity,
+		company=company,
+	)
+	to_date = period_list[-1].to_date
+
+	results = []
+	with measure("fetch GL entries", results):
+		gl_entries = get_gl_entries(company, to_date)
+	results[-1].rows = len(gl_entries)
+
+	filters = frappe._dict(company=company, period_start_date=period_list[0].year_start_date)
+	lft, rgt = frappe.db.get_value("Account", {"company": company}, ["min(lft)", "max(rgt)"])
+	with measure(f"sum up per account and {periodicity.lower()} period", results):
+		gl_entries_by_account = {}
+		set_gl_entries_by_account(
+			company, None, to_date, lft, rgt, filters, gl_entries_by_account, period_list=period_list
+		)
+	results[-1].rows = sum(len(entries) for entries in gl_entries_by_account.values())
+
+	print_results(results)
+	for result in results:
+		print(f"{result.label:<60} {result.rows:>10} rows")
+
+	return results
+
+
+def get_gl_entries(company, to_date):
+	gle = frappe.qb.DocType("GL Entry")
+	return (
+		frappe.qb.from_(gle)
+		.select(
+			gle.account,
+			gle.debit,
+			gle.credit,
+			gle.debit_in_account_currency,
+			gle.credit_in_account_currency,
+			gle.account_currency,
+			gle.posting_date,
+			gle.is_opening,
+			gle.fiscal_year,
+		)
+		.where((gle.company == company) & (gle.is_cancelled == 0) & (gle.posting_date <= to_date))
+	).run(as_dict=True)
@@ -0,0 +1,80 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+"""Compare merging of similar GL entries by scanning the merged list against keyed lookups.
+
+        bench --site <site> execute erpnext.accounts.benchmarks.gl_map_merge.run
+                --kwargs "{'gl_map_size': 10000}"
+
+Synthetic GL maps are built in memory for a few ratios of distinct account heads,
+nothing is written to the database.
+"""
+
+import frappe
+from frappe.utils import flt
+
+import erpnext
+from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import (
+	get_accounting_dimensions,
+)
+from erpnext.accounts.general_ledger import check_if_in_list, merge_similar_entries
+from erpnext.stock.benchmarks.utils import measure, print_results
+
+
+def run(gl_map_size=10000, distinct_heads=(10, 1000, 10000), skip_legacy_above=None):
+	results = []
+	company = erpnext.get_default_company()
+	for heads in distinct_heads:
+		label = f"{gl_map_size} entries, {heads} heads"
+
+		if not skip_legacy_above or heads <= skip_legacy_above:
+			gl_map = make_gl_map(company, gl_map_size, heads)
+			with measure(f"scan merged list ({label})", results):
+				legacy = merge_by_scanning(gl_map)
+
+		gl_map = make_gl_map(company, gl_map_size, heads)
+		with measure(f"keyed lookup ({label})", results):
+			merged = merge_similar_entries(gl_map)
+
+		if not skip_legacy_above or heads <= skip_legacy_above:
+			assert len(legacy) == len(merged)
+
+	print_results(results)
+	return results
+
+
+def make_gl_map(company, size, distinct_heads):
+	accounts = frappe.get_all(
+		"Account", filters={"company": company, "is_group": 0}, pluck="name", limit=10
+	) or ["_Benchmark Account"]
+	cost_center = frappe.get_cached_value("Company", company, "cost_center")
+
+	return [
+		frappe._dict(
+			company=company,
+			account=accounts[i % len(accounts)],
+			cost_center=cost_center,
+			voucher_detail_no=f"_BENCHMARK-{i % distinct_heads}",
+			debit=100.0 + i % 7,
+			debit_in_account_currency=100.0 + i % 7,
+			credit=0.0,
+			credit_in_account_currency=0.0,
+		)
+		for i in range(size)
+	]
+
+
+def merge_by_scanning(gl_map):
+	"""Merge as `merge_similar_entries` used to, comparing each entry with all merged ones."""
+	merged_gl_map = []
+	accounting_dimensions = get_accounting_dimensions()
+
+	for entry in gl_map:
+		same_head = check_if_in_list(entry, merged_gl_map, accounting_dimensions)
+		if same_head:
+			same_head.debit = flt(same_head.debit) + flt(entry.debit)
+			same_head.credit = flt(same_head.credit) + flt(entry.credit)
+		else:
+			merged_gl_map.append(entry)
+
+	return merged_gl_map
@@ -3,7 +3,9 @@
 
 import frappe
 from frappe.model.document import Document
+from frappe.query_builder import Order
 from frappe.utils import cint, cstr
+from pypika.terms import ExistsCriterion
 
 from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import (
 	get_accounting_dimensions,
@@ -125,3 +127,29 @@ def get_previous_closing_entries(company, closing_date, accounting_dimensions):
 		entries = query.run(as_dict=1)
 
 	return entries
+
+
+def get_last_period_closing_voucher(company, before_date):
+	"""Latest Period Closing Voucher of `company` posted before `before_date`, to read balances
+	till its posting date from Account Closing Balance.
+
+	Vouchers without closing balances (still being processed in the background, or failed)
+	are skipped, balances are then read from an earlier voucher and the General Ledger."""
+	pcv = frappe.qb.DocType("Period Closing Voucher")
+	closing_balance = frappe.qb.DocType("Account Closing Balance")
+	vouchers = (
+		frappe.qb.from_(pcv)
+		.select(pcv.name, pcv.posting_date)
+		.where((pcv.docstatus == 1) & (pcv.company == company) & (pcv.posting_date < before_date))
+		.where(
+			ExistsCriterion(
+				frappe.qb.from_(closing_balance)
+				.select(closing_balance.name)
+				.where(closing_balance.period_closing_voucher == pcv.name)
+			)
+		)
+		.orderby(pcv.posting_date, order=Order.desc)
+		.limit(1)
+	).run(as_dict=True)
+
+	return vouchers[0] if vouchers else None
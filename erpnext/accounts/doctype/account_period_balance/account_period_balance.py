@@ -0,0 +1,195 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.query_builder.functions import Sum
+from frappe.utils import cstr, flt, get_first_day, getdate, now
+
+KEY_FIELDS = ["company", "account", "cost_center", "party_type", "party"]
+BALANCE_FIELDS = ["debit", "credit", "debit_in_account_currency", "credit_in_account_currency"]
+
+
+class AccountPeriodBalance(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Account Period Balance", ["account", "period_start_date"], "account_period")
+	frappe.db.add_index("Account Period Balance", ["party_type", "party"], "party_type_party")
+
+
+def update_period_balances(gl_entries, sign=1):
+	"""Add amounts of non cancelled GL entries to the balance of the month they are posted in.
+
+	Pass `sign=-1` for entries being cancelled or deleted. Concurrent postings may create
+	more than one row per account, month etc., balances are always read as a sum."""
+	balances = {}
+	for gle in gl_entries:
+		if gle.get("is_cancelled"):
+			continue
+
+		balance = balances.setdefault(get_key(gle), dict.fromkeys(BALANCE_FIELDS, 0.0))
+		for field in BALANCE_FIELDS:
+			balance[field] += sign * flt(gle.get(field))
+
+	balances = {key: balance for key, balance in balances.items() if any(balance.values())}
+	if not balances:
+		return
+
+	existing = get_existing_balances(balances)
+	apb = frappe.qb.DocType("Account Period Balance")
+	new_balances = {}
+	for key, balance in balances.items():
+		if key not in existing:
+			new_balances[key] = balance
+			continue
+
+		query = frappe.qb.update(apb).where(apb.name == existing[key])
+		for field in BALANCE_FIELDS:
+			query = query.set(apb[field], apb[field] + balance[field])
+		query.run()
+
+	insert_period_balances(new_balances)
+
+
+def get_key(row):
+	return (
+		*[cstr(row.get(field)) for field in KEY_FIELDS],
+		getdate(row.get("period_start_date") or get_first_day(row.get("posting_date"))),
+	)
+
+
+def get_existing_balances(balances):
+	apb = frappe.qb.DocType("Account Period Balance")
+	rows = (
+		frappe.qb.from_(apb)
+		.select(apb.name, apb.period_start_date, *[apb[field] for field in KEY_FIELDS])
+		.where(
+			apb.company.isin({key[0] for key in balances})
+			& apb.account.isin({key[1] for key in balances})
+			& apb.period_start_date.isin({key[-1] for key in balances})
+		)
+	).run(as_dict=True)
+
+	return {get_key(row): row.name for row in rows}
+
+
+def insert_period_balances(balances):
+	if not balances:
+		return
+
+	fields = ["name", "creation", "modified", "owner", "modified_by", "docstatus"]
+	fields += [*KEY_FIELDS, "period_start_date", "account_currency", *BALANCE_FIELDS]
+
+	timestamp = now()
+	values = [
+		(
+			frappe.generate_hash(length=10),
+			timestamp,
+			timestamp,
+			frappe.session.user,
+			frappe.session.user,
+			0,
+			*[value or None for value in key[:-1]],
+			key[-1],
+			frappe.get_cached_value("Account", key[1], "account_currency"),
+			*[balance[field] for field in BALANCE_FIELDS],
+		)
+		for key, balance in balances.items()
+	]
+
+	frappe.db.bulk_insert("Account Period Balance", fields, values)
+
+
+def get_voucher_balances(voucher_type, voucher_nos):
+	"""Amounts of the non cancelled GL entries of vouchers, to be removed from period balances."""
+	gle = frappe.qb.DocType("GL Entry")
+	return (
+		frappe.qb.from_(gle)
+		.select(
+			*[gle[field] for field in KEY_FIELDS],
+			gle.posting_date,
+			*[Sum(gle[field]).as_(field) for field in BALANCE_FIELDS],
+		)
+		.where(
+			(gle.voucher_type == voucher_type) & gle.voucher_no.isin(voucher_nos) & (gle.is_cancelled == 0)
+		)
+		.groupby(*[gle[field] for field in KEY_FIELDS], gle.posting_date)
+	).run(as_dict=True)
+
+
+def remove_voucher_balances(voucher_type, voucher_nos):
+	update_period_balances(get_voucher_balances(voucher_type, voucher_nos), sign=-1)
+
+
+def get_balance_before(
+	period_start_date,
+	account=None,
+	party_type=None,
+	party=None,
+	company=None,
+	in_account_currency=True,
+):
+	"""Balance of GL entries posted before `period_start_date`, the first day of a month."""
+	apb = frappe.qb.DocType("Account Period Balance")
+	if in_account_currency:
+		balance = Sum(apb.debit_in_account_currency) - Sum(apb.credit_in_account_currency)
+	else:
+		balance = Sum(apb.debit) - Sum(apb.credit)
+
+	query = frappe.qb.from_(apb).select(balance).where(apb.period_start_date < period_start_date)
+
+	if account:
+		lft, rgt, is_group = frappe.db.get_value("Account", account, ["lft", "rgt", "is_group"])
+		if is_group:
+			acc = frappe.qb.DocType("Account")
+			query = query.where(
+				apb.account.isin(
+					frappe.qb.from_(acc).select(acc.name).where((acc.lft >= lft) & (acc.rgt <= rgt))
+				)
+			)
+		else:
+			query = query.where(apb.account == account)
+
+	if party_type and party:
+		query = query.where((apb.party_type == party_type) & (apb.party == party))
+
+	if company:
+		query = query.where(apb.company == company)
+
+	return flt(query.run()[0][0])
+
+
+def rebuild_period_balances(company=None):
+	"""Recompute period balances from the General Ledger, of all companies if none is given."""
+	companies = [company] if company else frappe.get_all("Company", pluck="name")
+	for company in companies:
+		frappe.db.delete("Account Period Balance", {"company": company})
+
+		rows = frappe.db.sql(
+			"""
+			select {key_fields},
+				extract(year from posting_date) as year, extract(month from posting_date) as month,
+				{balance_fields}
+			from `tabGL Entry`
+			where company = %s and is_cancelled = 0
+			group by {key_fields}, extract(year from posting_date), extract(month from posting_date)
+			""".format(
+				key_fields=", ".join(KEY_FIELDS),
+				balance_fields=", ".join(f"sum({field}) as {field}" for field in BALANCE_FIELDS),
+			),
+			(company,),
+			as_dict=True,
+		)
+
+		balances = {}
+		for row in rows:
+			row.period_start_date = getdate(f"{int(row.year)}-{int(row.month):02d}-01")
+			balance = balances.setdefault(get_key(row), dict.fromkeys(BALANCE_FIELDS, 0.0))
+			for field in BALANCE_FIELDS:
+				balance[field] += flt(row[field])
+
+		insert_period_balances(balances)
+		if not frappe.flags.in_test:
+			frappe.db.commit()
@@ -0,0 +1,63 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+import frappe
+from frappe.query_builder.functions import Sum
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, add_months, flt, get_first_day, nowdate
+
+from erpnext.accounts.doctype.account_period_balance.account_period_balance import (
+	get_balance_before,
+	rebuild_period_balances,
+)
+from erpnext.accounts.doctype.journal_entry.test_journal_entry import make_journal_entry
+from erpnext.accounts.utils import get_balance_on
+
+COMPANY = "_Test Company"
+BANK = "_Test Bank - _TC"
+
+
+class TestAccountPeriodBalance(FrappeTestCase):
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def get_ledger_balance(self, date):
+		gle = frappe.qb.DocType("GL Entry")
+		return flt(
+			frappe.qb.from_(gle)
+			.select(Sum(gle.debit) - Sum(gle.credit))
+			.where((gle.account == BANK) & (gle.posting_date <= date) & (gle.is_cancelled == 0))
+			.run()[0][0]
+		)
+
+	def assert_balances(self):
+		period_start_date = get_first_day(nowdate())
+		self.assertAlmostEqual(
+			get_balance_before(period_start_date, BANK, company=COMPANY),
+			self.get_ledger_balance(add_days(period_start_date, -1)),
+			places=6,
+		)
+		for date in (nowdate(), add_months(nowdate(), -2)):
+			self.assertAlmostEqual(
+				get_balance_on(BANK, date, company=COMPANY), self.get_ledger_balance(date), places=6
+			)
+
+	def test_period_balances(self):
+		backdated_je = make_journal_entry(
+			"_Test Account Cost for Goods Sold - _TC",
+			BANK,
+			100,
+			posting_date=add_months(nowdate(), -2),
+			submit=True,
+		)
+		make_journal_entry("_Test Account Cost for Goods Sold - _TC", BANK, 50, submit=True)
+		self.assert_balances()
+
+		backdated_je.cancel()
+		self.assert_balances()
+
+		balance = get_balance_before(get_first_day(nowdate()), BANK, company=COMPANY)
+		rebuild_period_balances(COMPANY)
+		self.assertAlmostEqual(
+			get_balance_before(get_first_day(nowdate()), BANK, company=COMPANY), balance, places=6
+		)
@@ -1,6 +1,7 @@
 # Copyright (c) 2015, Frappe Technologies Pvt. Ltd. and Contributors
 # License: GNU General Public License v3. See license.txt
 
+from collections import defaultdict
 
 import frappe
 from frappe import _
@@ -127,10 +128,13 @@ class GLEntry(Document):
 
 			frappe.throw(msg, title=_("Missing Cost Center"))
 
-	def validate_dimensions_for_pl_and_bs(self):
+	def validate_dimensions_for_pl_and_bs(self, dimensions=None):
 		account_type = frappe.get_cached_value("Account", self.account, "report_type")
 
-		for dimension in get_checks_for_pl_and_bs_accounts():
+		if dimensions is None:
+			dimensions = get_checks_for_pl_and_bs_accounts()
+
+		for dimension in dimensions:
 			if (
 				account_type == "Profit and Loss"
 				and self.company == dimension.company
@@ -157,8 +161,10 @@ class GLEntry(Document):
 						)
 					)
 
-	def validate_allowed_dimensions(self):
-		dimension_filter_map = get_dimension_filter_map()
+	def validate_allowed_dimensions(self, dimension_filter_map=None):
+		if dimension_filter_map is None:
+			dimension_filter_map = get_dimension_filter_map()
+
 		for key, value in dimension_filter_map.items():
 			dimension = key[0]
 			account = key[1]
@@ -205,15 +211,17 @@ class GLEntry(Document):
 				)
 			)
 
-	def validate_account_details(self, adv_adj):
+	def validate_account_details(self, adv_adj, account_details=None):
 		"""Account must be ledger, active and not freezed"""
 
-		ret = frappe.db.sql(
-			"""select is_group, docstatus, company
-			from tabAccount where name=%s""",
-			self.account,
-			as_dict=1,
-		)[0]
+		ret = account_details
+		if not ret:
+			ret = frappe.db.sql(
+				"""select is_group, docstatus, company
+				from tabAccount where name=%s""",
+				self.account,
+				as_dict=1,
+			)[0]
 
 		if ret.is_group == 1:
 			frappe.throw(
@@ -259,7 +267,7 @@ class GLEntry(Document):
 	def validate_party(self):
 		validate_party_frozen_disabled(self.party_type, self.party)
 
-	def validate_currency(self):
+	def validate_currency(self, validate_party_currency=True):
 		company_currency = erpnext.get_company_currency(self.company)
 		account_currency = get_account_currency(self.account)
 
@@ -274,7 +282,7 @@ class GLEntry(Document):
 				InvalidAccountCurrency,
 			)
 
-		if self.party_type and self.party:
+		if validate_party_currency and self.party_type and self.party:
 			validate_party_gle_currency(self.party_type, self.party, self.company, self.account_currency)
 
 	def validate_and_set_fiscal_year(self):
@@ -287,6 +295,162 @@ class GLEntry(Document):
 		frappe.throw(msg)
 
 
+def insert_gl_entries(gl_map, adv_adj=False, update_outstanding="Yes", from_repost=False):
+	"""Validate and insert GL Entries of `gl_map` with multi-row statements.
+
+	Rows and validations are the same as of submitting each GL Entry. Master data is
+	validated once per account, cost center and party instead of once per row, checks
+	reading the ledger (balance type, outstanding amounts) run once all rows are inserted."""
+	entries = []
+	for args in gl_map:
+		gle = frappe.new_doc("GL Entry")
+		gle.update(args)
+		gle.flags.from_repost = from_repost
+		gle.flags.adv_adj = adv_adj
+		gle.flags.update_outstanding = update_outstanding or "Yes"
+		gle.docstatus = 1
+		gle.autoname()
+		gle.set_user_and_timestamp()
+		entries.append(gle)
+
+	validate_links(entries)
+	validate_gl_entries(entries, adv_adj)
+
+	fields = list(entries[0].get_valid_dict(convert_dates_to_str=True))
+	values = []
+	for gle in entries:
+		row = gle.get_valid_dict(convert_dates_to_str=True)
+		values.append(tuple(row.get(field) for field in fields))
+
+	frappe.db.bulk_insert("GL Entry", fields, values)
+
+	validated = [gle for gle in entries if not skip_ledger_validations(gle)]
+	for account in {gle.account for gle in validated}:
+		validate_balance_type(account, adv_adj)
+
+	outstanding_to_update = {
+		(gle.account, gle.party_type, gle.party, gle.against_voucher_type, gle.against_voucher)
+		for gle in validated
+		if gle.against_voucher_type in ["Journal Entry", "Sales Invoice", "Purchase Invoice", "Fees"]
+		and gle.against_voucher
+		and gle.flags.update_outstanding == "Yes"
+		and not frappe.flags.is_reverse_depr_entry
+		and frappe.get_cached_value("Account", gle.account, "account_type")
+		not in ["Receivable", "Payable"]
+	}
+	for args in outstanding_to_update:
+		update_outstanding_amt(*args)
+
+	return entries
+
+
+def validate_links(entries):
+	"""Check that linked records exist, once per record instead of once per row."""
+	meta = frappe.get_meta("GL Entry")
+	link_fields = meta.get_link_fields() + meta.get_dynamic_link_fields()
+
+	labels = {}
+	for gle in entries:
+		for df in link_fields:
+			doctype = gle.get(df.options) if df.fieldtype == "Dynamic Link" else df.options
+			if doctype and gle.get(df.fieldname):
+				labels.setdefault((doctype, gle.get(df.fieldname)), df.label)
+
+	names_by_doctype = defaultdict(set)
+	for doctype, name in labels:
+		names_by_doctype[doctype].add(name)
+
+	invalid = []
+	for doctype, names in names_by_doctype.items():
+		existing = {
+			name.lower()
+			for name in frappe.get_all(doctype, filters={"name": ("in", list(names))}, pluck="name")
+		}
+		invalid += [
+			f"{_(labels[(doctype, name)])}: {name}"
+			for name in sorted(names)
+			if name.lower() not in existing
+		]
+
+	if invalid:
+		frappe.throw(
+			_("Could not find {0}").format(", ".join(invalid)),
+			frappe.LinkValidationError,
+			title=_("Links Validation"),
+		)
+
+
+def validate_gl_entries(entries, adv_adj=False):
+	"""Run the validations of `GLEntry.validate` and `GLEntry.on_update` for many entries."""
+	fiscal_years = {}
+	for gle in entries:
+		gle.flags.ignore_submit_comment = True
+		if not gle.fiscal_year:
+			key = (gle.posting_date, gle.company)
+			if key not in fiscal_years:
+				fiscal_years[key] = get_fiscal_year(gle.posting_date, company=gle.company)[0]
+			gle.fiscal_year = fiscal_years[key]
+
+		gle.pl_must_have_cost_center()
+
+	entries = [gle for gle in entries if not skip_ledger_validations(gle)]
+	if not entries:
+		return
+
+	account_details = {
+		d.name: d
+		for d in frappe.get_all(
+			"Account",
+			filters={"name": ("in", list({gle.account for gle in entries}))},
+			fields=["name", "is_group", "docstatus", "company"],
+		)
+	}
+	dimensions = get_checks_for_pl_and_bs_accounts()
+	dimension_filter_map = get_dimension_filter_map()
+
+	party_currencies = {}
+	for gle in entries:
+		gle.check_mandatory()
+		gle.validate_cost_center()
+		gle.check_pl_account()
+		gle.validate_currency(validate_party_currency=False)
+		if gle.party_type and gle.party:
+			party_currencies.setdefault((gle.party_type, gle.party, gle.company), []).append(
+				gle.account_currency
+			)
+
+		gle.validate_account_details(adv_adj, account_details.get(gle.account))
+		gle.validate_dimensions_for_pl_and_bs(dimensions)
+		gle.validate_allowed_dimensions(dimension_filter_map)
+
+	for party_type, party in {(gle.party_type, gle.party) for gle in entries}:
+		validate_party_frozen_disabled(party_type, party)
+
+	for (party_type, party, company), currencies in party_currencies.items():
+		validate_party_gle_currency(party_type, party, company, currencies[0])
+
+		# rows of a party are validated against its first row as if inserted one by one
+		if len(set(currencies)) > 1:
+			frappe.throw(
+				_(
+					"{0} {1} has accounting entries in currency {2} for company {3}. Please select a receivable or payable account with currency {2}."
+				).format(
+					frappe.bold(party_type),
+					frappe.bold(party),
+					frappe.bold(currencies[0]),
+					frappe.bold(company),
+				),
+				InvalidAccountCurrency,
+			)
+
+	for account in {gle.account for gle in entries}:
+		validate_frozen_account(account, adv_adj)
+
+
+def skip_ledger_validations(gle):
+	return gle.flags.from_repost or gle.voucher_type == "Period Closing Voucher"
+
+
 def validate_balance_type(account, adv_adj=False):
 	if not adv_adj and account:
 		balance_must_be = frappe.get_cached_value("Account", account, "balance_must_be")
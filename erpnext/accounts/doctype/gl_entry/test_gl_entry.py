@@ -3,12 +3,14 @@
 
 
 import unittest
+from unittest.mock import patch
 
 import frappe
 from frappe.model.naming import parse_naming_series
 
-from erpnext.accounts.doctype.gl_entry.gl_entry import rename_gle_sle_docs
+from erpnext.accounts.doctype.gl_entry.gl_entry import insert_gl_entries, rename_gle_sle_docs
 from erpnext.accounts.doctype.journal_entry.test_journal_entry import make_journal_entry
+from erpnext.accounts.general_ledger import merge_similar_entries
 
 
 class TestGLEntry(unittest.TestCase):
@@ -79,3 +81,69 @@ class TestGLEntry(unittest.TestCase):
 			"SELECT current from tabSeries where name = %s", naming_series
 		)[0][0]
 		self.assertEqual(old_naming_series_current_value + 2, new_naming_series_current_value)
+
+	def test_bulk_insert_of_entries(self):
+		def get_gl_entries(voucher_no):
+			entries = frappe.get_all(
+				"GL Entry",
+				fields=["*"],
+				filters={"voucher_type": "Journal Entry", "voucher_no": voucher_no},
+				order_by="account",
+			)
+			for entry in entries:
+				for field in ("name", "creation", "modified", "voucher_no", "voucher_detail_no"):
+					entry.pop(field)
+			return entries
+
+		args = ("_Test Account Cost for Goods Sold - _TC", "_Test Bank - _TC", 100)
+		je = make_journal_entry(*args, "_Test Cost Center - _TC", submit=True)
+
+		with patch("erpnext.accounts.general_ledger.BULK_INSERT_THRESHOLD", 1):
+			bulk_je = make_journal_entry(*args, "_Test Cost Center - _TC", submit=True)
+
+		self.assertEqual(len(get_gl_entries(bulk_je.name)), 2)
+		self.assertEqual(get_gl_entries(bulk_je.name), get_gl_entries(je.name))
+
+		# validations still apply
+		frappe.db.set_value("Account", "_Test Bank - _TC", "freeze_account", "Yes")
+		try:
+			with patch("erpnext.accounts.general_ledger.BULK_INSERT_THRESHOLD", 1):
+				frozen_je = make_journal_entry(*args, "_Test Cost Center - _TC")
+				self.assertRaises(frappe.ValidationError, frozen_je.submit)
+		finally:
+			frappe.db.set_value("Account", "_Test Bank - _TC", "freeze_account", "No")
+
+		gl_map = frappe.get_all("GL Entry", fields=["*"], filters={"voucher_no": bulk_je.name})
+		for gle in gl_map:
+			gle.pop("name")
+			gle.cost_center = "_Test Missing Cost Center - _TC"
+		self.assertRaises(frappe.LinkValidationError, insert_gl_entries, gl_map)
+
+	def test_merge_similar_entries(self):
+		def make_entry(account, debit, **kwargs):
+			return frappe._dict(
+				company="_Test Company",
+				account=account,
+				cost_center="_Test Cost Center - _TC",
+				debit=debit,
+				debit_in_account_currency=debit,
+				**kwargs,
+			)
+
+		gl_map = [
+			make_entry("_Test Account Cost for Goods Sold - _TC", 100),
+			make_entry("_Test Bank - _TC", 10),
+			make_entry("_Test Account Cost for Goods Sold - _TC", 50, project=""),
+			make_entry("_Test Account Cost for Goods Sold - _TC", 20, project="_Test Project"),
+			make_entry("_Test Bank - _TC", 5),
+		]
+
+		merged = merge_similar_entries(gl_map)
+		self.assertEqual(
+			[(d.account, d.get("project"), d.debit, d.debit_in_account_currency) for d in merged],
+			[
+				("_Test Account Cost for Goods Sold - _TC", None, 150, 150),
+				("_Test Bank - _TC", None, 15, 15),
+				("_Test Account Cost for Goods Sold - _TC", "_Test Project", 20, 20),
+			],
+		)
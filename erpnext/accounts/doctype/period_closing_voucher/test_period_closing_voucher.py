@@ -10,6 +10,7 @@ from frappe.utils import today
 from erpnext.accounts.doctype.finance_book.test_finance_book import create_finance_book
 from erpnext.accounts.doctype.journal_entry.test_journal_entry import make_journal_entry
 from erpnext.accounts.doctype.sales_invoice.test_sales_invoice import create_sales_invoice
+from erpnext.accounts.report.general_ledger.general_ledger import execute as general_ledger
 from erpnext.accounts.utils import get_fiscal_year, now
 
 
@@ -299,6 +300,49 @@ class TestPeriodClosingVoucher(unittest.TestCase):
 		self.assertEqual(cc2_closing_balance.credit, 500)
 		self.assertEqual(cc2_closing_balance.credit_in_account_currency, 500)
 
+	def test_general_ledger_opening_from_closing_balance(self):
+		frappe.db.sql("delete from `tabGL Entry` where company='Test PCV Company'")
+		frappe.db.sql("delete from `tabPeriod Closing Voucher` where company='Test PCV Company'")
+		frappe.db.sql("delete from `tabAccount Closing Balance` where company='Test PCV Company'")
+
+		company = create_company()
+		cost_center = create_cost_center("Test Cost Center 1")
+
+		def make_jv(posting_date, amount):
+			jv = make_journal_entry(
+				posting_date=posting_date,
+				amount=amount,
+				account1="Cash - TPC",
+				account2="Sales - TPC",
+				cost_center=cost_center,
+				save=False,
+			)
+			jv.company = company
+			jv.save()
+			jv.submit()
+
+		def get_general_ledger():
+			filters = frappe._dict(
+				company=company,
+				from_date="2021-04-01",
+				to_date="2021-04-30",
+				account=["Cash - TPC"],
+				group_by="Group by Voucher (Consolidated)",
+			)
+			data = general_ledger(filters)[1]
+			return [(row.get("account"), row.get("debit"), row.get("credit")) for row in data]
+
+		make_jv("2021-03-15", 400)
+		self.make_period_closing_voucher(posting_date="2021-03-31")
+		make_jv("2021-04-10", 100)
+
+		expected = get_general_ledger()
+		self.assertEqual(expected[0][1:], (400, 0))
+
+		# same opening as summed up from GL Entries
+		frappe.db.sql("delete from `tabAccount Closing Balance` where company='Test PCV Company'")
+		self.assertEqual(get_general_ledger(), expected)
+
 	def make_period_closing_voucher(self, posting_date=None, submit=True):
 		surplus_account = create_account()
 		cost_center = create_cost_center("Test Cost Center 1")
@@ -21,6 +21,10 @@ from erpnext.stock.doctype.serial_no.serial_no import (
 	get_pos_reserved_serial_nos,
 	get_serial_nos,
 )
+from erpnext.stock.doctype.serial_no_ledger_entry.serial_no_ledger_entry import (
+	cancel_serial_no_ledger_entries,
+	make_pos_serial_no_ledger_entries,
+)
 
 
 class POSInvoice(SalesInvoice):
@@ -70,6 +74,7 @@ class POSInvoice(SalesInvoice):
 			self.apply_loyalty_points()
 		self.check_phone_payments()
 		self.set_status(update=True)
+		make_pos_serial_no_ledger_entries(self)
 
 		if self.coupon_code:
 			from erpnext.accounts.doctype.pricing_rule.utils import update_coupon_code_count
@@ -106,6 +111,8 @@ class POSInvoice(SalesInvoice):
 			against_psi_doc.delete_loyalty_point_entry()
 			against_psi_doc.make_loyalty_point_entry()
 
+		cancel_serial_no_ledger_entries(self.doctype, self.name)
+
 		if self.coupon_code:
 			from erpnext.accounts.doctype.pricing_rule.utils import update_coupon_code_count
 
@@ -303,19 +310,14 @@ class POSInvoice(SalesInvoice):
 			if d.get("serial_no"):
 				serial_nos = get_serial_nos(d.serial_no)
 				for sr in serial_nos:
-					serial_no_exists = frappe.db.sql(
-						"""
-						SELECT name
-						FROM `tabPOS Invoice Item`
-						WHERE
-							parent = %s
-							and (serial_no = %s
-								or serial_no like %s
-								or serial_no like %s
-								or serial_no like %s
-							)
-					""",
-						(self.return_against, sr, sr + "\n%", "%\n" + sr, "%\n" + sr + "\n%"),
+					serial_no_exists = frappe.db.exists(
+						"Serial No Ledger Entry",
+						{
+							"voucher_type": "POS Invoice",
+							"voucher_no": self.return_against,
+							"serial_no": sr,
+							"is_cancelled": 0,
+						},
 					)
 
 					if not serial_no_exists:
@@ -626,28 +628,33 @@ class POSInvoice(SalesInvoice):
 
 
 @frappe.whitelist()
-def get_stock_availability(item_code, warehouse):
+def get_stock_availability(item_code, warehouse, use_cache=False):
+	"""Available qty of an item in a warehouse, less the qty reserved by unconsolidated POS invoices.
+
+	`use_cache` reads cached bin quantities, which may be stale for a while. Only meant for
+	showing availability, validations must read the bins."""
+	use_cache = cint(use_cache)
 	if frappe.db.get_value("Item", item_code, "is_stock_item"):
 		is_stock_item = True
-		bin_qty = get_bin_qty(item_code, warehouse)
+		bin_qty = get_bin_qty(item_code, warehouse, use_cache)
 		pos_sales_qty = get_pos_reserved_qty(item_code, warehouse)
 		return bin_qty - pos_sales_qty, is_stock_item
 	else:
 		is_stock_item = True
 		if frappe.db.exists("Product Bundle", item_code):
-			return get_bundle_availability(item_code, warehouse), is_stock_item
+			return get_bundle_availability(item_code, warehouse, use_cache), is_stock_item
 		else:
 			is_stock_item = False
 			# Is a service item or non_stock item
 			return 0, is_stock_item
 
 
-def get_bundle_availability(bundle_item_code, warehouse):
+def get_bundle_availability(bundle_item_code, warehouse, use_cache=False):
 	product_bundle = frappe.get_doc("Product Bundle", bundle_item_code)
 
 	bundle_bin_qty = 1000000
 	for item in product_bundle.items:
-		item_bin_qty = get_bin_qty(item.item_code, warehouse)
+		item_bin_qty = get_bin_qty(item.item_code, warehouse, use_cache)
 		item_pos_reserved_qty = get_pos_reserved_qty(item.item_code, warehouse)
 		available_qty = item_bin_qty - item_pos_reserved_qty
 
@@ -661,7 +668,13 @@ def get_bundle_availability(bundle_item_code, warehouse):
 	return bundle_bin_qty - pos_sales_qty
 
 
-def get_bin_qty(item_code, warehouse):
+def get_bin_qty(item_code, warehouse, use_cache=False):
+	if use_cache:
+		from erpnext.stock.doctype.bin.bin import get_cached_bin_qty
+
+		bin_qty = get_cached_bin_qty(item_code).get(warehouse)
+		return bin_qty.actual_qty or 0 if bin_qty else 0
+
 	bin_qty = frappe.db.sql(
 		"""select actual_qty from `tabBin`
 		where item_code = %s and warehouse = %s
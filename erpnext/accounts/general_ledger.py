@@ -10,6 +10,10 @@ from frappe.model.meta import get_field_precision
 from frappe.utils import cint, cstr, flt, formatdate, getdate, now
 
 import erpnext
+from erpnext.accounts.doctype.account_period_balance.account_period_balance import (
+	remove_voucher_balances,
+	update_period_balances,
+)
 from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import (
 	get_accounting_dimensions,
 )
@@ -17,6 +21,22 @@ from erpnext.accounts.doctype.budget.budget import validate_expense_against_budg
 from erpnext.accounts.utils import create_payment_ledger_entry
 
 
+# GL maps with at least these many entries are validated once and inserted in bulk
+BULK_INSERT_THRESHOLD = 100
+
+# GL entries are merged if these fields, the account and the accounting dimensions match
+ACCOUNT_HEAD_FIELDNAMES = [
+	"voucher_detail_no",
+	"party",
+	"against_voucher",
+	"cost_center",
+	"against_voucher_type",
+	"party_type",
+	"project",
+	"finance_book",
+]
+
+
 class ClosedAccountingPeriod(frappe.ValidationError):
 	pass
 
@@ -173,12 +193,14 @@ def get_cost_center_allocation_data(company, posting_date):
 
 def merge_similar_entries(gl_map, precision=None):
 	merged_gl_map = []
-	accounting_dimensions = get_accounting_dimensions()
+	merged_entries = {}
+	account_head_fieldnames = get_account_head_fieldnames(get_accounting_dimensions())
 
 	for entry in gl_map:
 		# if there is already an entry in this account then just add it
 		# to that entry
-		same_head = check_if_in_list(entry, merged_gl_map, accounting_dimensions)
+		key = get_account_head_key(entry, account_head_fieldnames)
+		same_head = merged_entries.get(key)
 		if same_head:
 			same_head.debit = flt(same_head.debit) + flt(entry.debit)
 			same_head.debit_in_account_currency = flt(same_head.debit_in_account_currency) + flt(
@@ -189,6 +211,7 @@ def merge_similar_entries(gl_map, precision=None):
 				entry.credit_in_account_currency
 			)
 		else:
+			merged_entries[key] = entry
 			merged_gl_map.append(entry)
 
 	company = gl_map[0].company if gl_map else erpnext.get_default_company()
@@ -213,20 +236,17 @@ def merge_similar_entries(gl_map, precision=None):
 	return merged_gl_map
 
 
+def get_account_head_fieldnames(dimensions=None):
+	"""Fields other than account that must match for GL entries to be merged."""
+	return ACCOUNT_HEAD_FIELDNAMES + (dimensions or [])
+
+
+def get_account_head_key(gle, account_head_fieldnames):
+	return (gle.account, *[cstr(gle.get(fieldname)) for fieldname in account_head_fieldnames])
+
+
 def check_if_in_list(gle, gl_map, dimensions=None):
-	account_head_fieldnames = [
-		"voucher_detail_no",
-		"party",
-		"against_voucher",
-		"cost_center",
-		"against_voucher_type",
-		"party_type",
-		"project",
-		"finance_book",
-	]
-
-	if dimensions:
-		account_head_fieldnames = account_head_fieldnames + dimensions
+	account_head_fieldnames = get_account_head_fieldnames(dimensions)
 
 	for e in gl_map:
 		same_head = True
@@ -304,8 +324,30 @@ def save_entries(gl_map, adv_adj, update_outstanding, from_repost=False):
 		if gl_map[0]["voucher_type"] != "Period Closing Voucher":
 			validate_against_pcv(is_opening, gl_map[0]["posting_date"], gl_map[0]["company"])
 
-	for entry in gl_map:
-		make_entry(entry, adv_adj, update_outstanding, from_repost)
+	if use_bulk_insert(gl_map):
+		make_entries_in_bulk(gl_map, adv_adj, update_outstanding, from_repost)
+	else:
+		for entry in gl_map:
+			make_entry(entry, adv_adj, update_outstanding, from_repost)
+
+	update_period_balances(gl_map)
+
+
+def use_bulk_insert(gl_map):
+	# GL Entry hooks of other apps expect a document per entry
+	return len(gl_map) >= BULK_INSERT_THRESHOLD and not frappe.get_hooks("doc_events").get(
+		"GL Entry"
+	)
+
+
+def make_entries_in_bulk(gl_map, adv_adj, update_outstanding, from_repost=False):
+	from erpnext.accounts.doctype.gl_entry.gl_entry import insert_gl_entries
+
+	insert_gl_entries(gl_map, adv_adj, update_outstanding, from_repost)
+
+	if not from_repost and gl_map[0].voucher_type != "Period Closing Voucher":
+		for entry in gl_map:
+			validate_expense_against_budget(entry)
 
 
 def make_entry(args, adv_adj, update_outstanding, from_repost=False):
@@ -598,6 +640,7 @@ def set_as_cancel(voucher_type, voucher_no):
 	"""
 	Set is_cancelled=1 in all original gl entries for the voucher
 	"""
+	remove_voucher_balances(voucher_type, [voucher_no])
 	frappe.db.sql(
 		"""UPDATE `tabGL Entry` SET is_cancelled = 1,
 		modified=%s, modified_by=%s
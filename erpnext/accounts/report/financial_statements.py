@@ -8,8 +8,12 @@ import re
 
 import frappe
 from frappe import _
+from frappe.query_builder.functions import Max, Sum
 from frappe.utils import add_days, add_months, cint, cstr, flt, formatdate, get_first_day, getdate
 
+from erpnext.accounts.doctype.account_closing_balance.account_closing_balance import (
+	get_last_period_closing_voucher,
+)
 from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import (
 	get_accounting_dimensions,
 	get_dimension_with_children,
@@ -188,6 +192,7 @@ def get_data(
 			filters,
 			gl_entries_by_account,
 			ignore_closing_entries=ignore_closing_entries,
+			period_list=period_list,
 		)
 
 	calculate_values(
@@ -416,8 +421,12 @@ def set_gl_entries_by_account(
 	filters,
 	gl_entries_by_account,
 	ignore_closing_entries=False,
+	period_list=None,
 ):
-	"""Returns a dict like { "account": [gl entries], ... }"""
+	"""Returns a dict like { "account": [gl entries], ... }
+
+	Entries are summed up per account, fiscal year and period of `period_list` (or the whole
+	date range) in the query. The posting date of each sum is the latest one it includes."""
 	gl_entries = []
 
 	accounts_list = frappe.db.get_all(
@@ -431,13 +440,7 @@ def set_gl_entries_by_account(
 		# For balance sheet
 		if not from_date:
 			from_date = filters["period_start_date"]
-			last_period_closing_voucher = frappe.db.get_all(
-				"Period Closing Voucher",
-				filters={"docstatus": 1, "company": filters.company, "posting_date": ("<", from_date)},
-				fields=["posting_date", "name"],
-				order_by="posting_date desc",
-				limit=1,
-			)
+			last_period_closing_voucher = get_last_period_closing_voucher(filters.company, from_date)
 			if last_period_closing_voucher:
 				gl_entries += get_accounting_entries(
 					"Account Closing Balance",
@@ -446,9 +449,9 @@ def set_gl_entries_by_account(
 					accounts_list,
 					filters,
 					ignore_closing_entries,
-					last_period_closing_voucher[0].name,
+					last_period_closing_voucher.name,
 				)
-				from_date = add_days(last_period_closing_voucher[0].posting_date, 1)
+				from_date = add_days(last_period_closing_voucher.posting_date, 1)
 				ignore_opening_entries = True
 
 		gl_entries += get_accounting_entries(
@@ -459,6 +462,7 @@ def set_gl_entries_by_account(
 			filters,
 			ignore_closing_entries,
 			ignore_opening_entries=ignore_opening_entries,
+			period_boundaries=get_period_boundaries(from_date, to_date, period_list),
 		)
 
 		if filters and filters.get("presentation_currency"):
@@ -479,23 +483,31 @@ def get_accounting_entries(
 	ignore_closing_entries,
 	period_closing_voucher=None,
 	ignore_opening_entries=False,
+	period_boundaries=None,
 ):
 	gl_entry = frappe.qb.DocType(doctype)
 	query = (
 		frappe.qb.from_(gl_entry)
 		.select(
 			gl_entry.account,
-			gl_entry.debit,
-			gl_entry.credit,
-			gl_entry.debit_in_account_currency,
-			gl_entry.credit_in_account_currency,
+			Sum(gl_entry.debit).as_("debit"),
+			Sum(gl_entry.credit).as_("credit"),
+			Sum(gl_entry.debit_in_account_currency).as_("debit_in_account_currency"),
+			Sum(gl_entry.credit_in_account_currency).as_("credit_in_account_currency"),
 			gl_entry.account_currency,
 		)
 		.where(gl_entry.company == filters.company)
+		.groupby(gl_entry.account, gl_entry.account_currency)
 	)
 
 	if doctype == "GL Entry":
-		query = query.select(gl_entry.posting_date, gl_entry.is_opening, gl_entry.fiscal_year)
+		query = query.select(
+			Max(gl_entry.posting_date).as_("posting_date"), gl_entry.is_opening, gl_entry.fiscal_year
+		)
+		query = query.groupby(gl_entry.is_opening, gl_entry.fiscal_year)
+		if period_boundaries:
+			query = query.groupby(get_period_index(gl_entry.posting_date, period_boundaries))
+
 		query = query.where(gl_entry.is_cancelled == 0)
 		query = query.where(gl_entry.posting_date <= to_date)
 
@@ -503,6 +515,7 @@ def get_accounting_entries(
 			query = query.where(gl_entry.is_opening == "No")
 	else:
 		query = query.select(gl_entry.closing_date.as_("posting_date"))
+		query = query.groupby(gl_entry.closing_date)
 		query = query.where(gl_entry.period_closing_voucher == period_closing_voucher)
 
 	query = apply_additional_conditions(doctype, query, from_date, ignore_closing_entries, filters)
@@ -513,6 +526,33 @@ def get_accounting_entries(
 	return entries
 
 
+def get_period_boundaries(from_date, to_date, period_list=None):
+	"""Dates splitting GL entries into groups that are equally placed against all periods.
+
+	Entries are compared with the start and end of each period and the start of the first
+	year, so entries posted between the same boundaries can be summed up."""
+	boundaries = {add_days(getdate(to_date), 1)}
+	if from_date:
+		boundaries.add(getdate(from_date))
+
+	for period in period_list or []:
+		boundaries.add(getdate(period.from_date))
+		boundaries.add(add_days(getdate(period.to_date), 1))
+		if period.get("year_start_date"):
+			boundaries.add(getdate(period.year_start_date))
+
+	return sorted(boundaries)
+
+
+def get_period_index(posting_date, period_boundaries):
+	"""Number of `period_boundaries` on or before `posting_date`."""
+	period_index = frappe.qb.terms.Case()
+	for index, boundary in enumerate(period_boundaries):
+		period_index = period_index.when(posting_date < boundary, index)
+
+	return period_index.else_(len(period_boundaries))
+
+
 def apply_additional_conditions(doctype, query, from_date, ignore_closing_entries, filters):
 	gl_entry = frappe.qb.DocType(doctype)
 	accounting_dimensions = get_accounting_dimensions(as_list=False)
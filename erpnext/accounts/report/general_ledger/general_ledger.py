@@ -9,6 +9,9 @@ from frappe import _, _dict
 from frappe.utils import cstr, getdate
 
 from erpnext import get_company_currency, get_default_company
+from erpnext.accounts.doctype.account_closing_balance.account_closing_balance import (
+	get_last_period_closing_voucher,
+)
 from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import (
 	get_accounting_dimensions,
 	get_dimension_with_children,
@@ -182,6 +185,14 @@ def get_gl_entries(filters, accounting_dimensions):
 	if accounting_dimensions:
 		dimension_fields = ", ".join(accounting_dimensions) + ","
 
+	period_closing_voucher = None
+	if use_closing_balances(filters):
+		period_closing_voucher = get_last_period_closing_voucher(filters.company, filters.from_date)
+		if period_closing_voucher:
+			filters.closing_date = period_closing_voucher.posting_date
+
+	conditions = get_conditions(filters)
+
 	gl_entries = frappe.db.sql(
 		"""
 		select
@@ -196,13 +207,17 @@ def get_gl_entries(filters, accounting_dimensions):
 	""".format(
 			dimension_fields=dimension_fields,
 			select_fields=select_fields,
-			conditions=get_conditions(filters),
+			conditions=conditions,
 			order_by_statement=order_by_statement,
 		),
 		filters,
 		as_dict=1,
 	)
 
+	if period_closing_voucher:
+		# appended, as the order of accounts in the report is that of their first GL Entry
+		gl_entries += get_closing_balances(filters, period_closing_voucher.name, accounting_dimensions)
+
 	if filters.get("presentation_currency"):
 		return convert_to_presentation_currency(gl_entries, currency_map, filters.get("company"))
 	else:
@@ -241,6 +256,10 @@ def get_conditions(filters):
 
 	conditions.append("(posting_date <=%(to_date)s or is_opening = 'Yes')")
 
+	if filters.get("closing_date"):
+		# balances till the date are read from Account Closing Balance
+		conditions.append("posting_date > %(closing_date)s")
+
 	if filters.get("project"):
 		conditions.append("project in %(project)s")
 
@@ -280,6 +299,82 @@ def get_conditions(filters):
 	return "and {}".format(" and ".join(conditions)) if conditions else ""
 
 
+def use_closing_balances(filters):
+	"""Whether the opening can start from the closing balances of the last Period Closing Voucher,
+	instead of summing up GL entries since the beginning.
+
+	Account Closing Balance has no party or voucher details and is not subject to user permissions."""
+	if not (filters.get("account") or filters.get("group_by") == "Group by Account"):
+		# entries before the from date are not fetched
+		return False
+
+	from frappe.desk.reportview import build_match_conditions
+
+	return not (
+		filters.get("group_by") == "Group by Party"
+		or filters.get("party_type")
+		or filters.get("party")
+		or filters.get("voucher_no")
+		or filters.get("show_cancelled_entries")
+		or build_match_conditions("GL Entry")
+	)
+
+
+def get_closing_balances(filters, period_closing_voucher, accounting_dimensions):
+	"""Closing balances of a Period Closing Voucher as GL entries posted on its date, filtered
+	the same way as GL entries by `get_conditions`."""
+	closing_balance = frappe.qb.DocType("Account Closing Balance")
+	query = (
+		frappe.qb.from_(closing_balance)
+		.select(
+			closing_balance.closing_date.as_("posting_date"),
+			closing_balance.account,
+			closing_balance.cost_center,
+			closing_balance.project,
+			closing_balance.account_currency,
+			closing_balance.debit,
+			closing_balance.credit,
+			closing_balance.debit_in_account_currency,
+			closing_balance.credit_in_account_currency,
+			*[closing_balance[dimension] for dimension in accounting_dimensions],
+		)
+		.where(
+			(closing_balance.company == filters.company)
+			& (closing_balance.period_closing_voucher == period_closing_voucher)
+		)
+		.orderby(closing_balance.account)
+	)
+
+	if filters.get("account"):
+		query = query.where(closing_balance.account.isin(filters.account))
+
+	if filters.get("cost_center"):
+		query = query.where(closing_balance.cost_center.isin(filters.cost_center))
+
+	if filters.get("project"):
+		query = query.where(closing_balance.project.isin(filters.project))
+
+	if filters.get("finance_book"):
+		if filters.get("include_default_book_entries"):
+			query = query.where(
+				closing_balance.finance_book.isin(
+					[cstr(filters.finance_book), cstr(filters.company_fb), ""]
+				)
+				| closing_balance.finance_book.isnull()
+			)
+		else:
+			query = query.where(closing_balance.finance_book.isin([filters.finance_book]))
+
+	if filters.get("include_dimensions"):
+		for dimension in get_accounting_dimensions(as_list=False):
+			if not dimension.disabled and filters.get(dimension.fieldname):
+				query = query.where(
+					closing_balance[dimension.fieldname].isin(filters.get(dimension.fieldname))
+				)
+
+	return query.run(as_dict=True)
+
+
 def get_accounts_with_children(accounts):
 	if not isinstance(accounts, list):
 		accounts = [d.strip() for d in accounts.strip().split(",") if d]
@@ -8,6 +8,9 @@ from frappe.query_builder.functions import Sum
 from frappe.utils import add_days, cstr, flt, formatdate, getdate
 
 import erpnext
+from erpnext.accounts.doctype.account_closing_balance.account_closing_balance import (
+	get_last_period_closing_voucher,
+)
 from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import (
 	get_accounting_dimensions,
 	get_dimension_with_children,
@@ -140,13 +143,7 @@ def get_opening_balances(filters):
 def get_rootwise_opening_balances(filters, report_type):
 	gle = []
 
-	last_period_closing_voucher = frappe.db.get_all(
-		"Period Closing Voucher",
-		filters={"docstatus": 1, "company": filters.company, "posting_date": ("<", filters.from_date)},
-		fields=["posting_date", "name"],
-		order_by="posting_date desc",
-		limit=1,
-	)
+	last_period_closing_voucher = get_last_period_closing_voucher(filters.company, filters.from_date)
 
 	accounting_dimensions = get_accounting_dimensions(as_list=False)
 
@@ -156,12 +153,12 @@ def get_rootwise_opening_balances(filters, report_type):
 			filters,
 			report_type,
 			accounting_dimensions,
-			period_closing_voucher=last_period_closing_voucher[0].name,
+			period_closing_voucher=last_period_closing_voucher.name,
 		)
-		if getdate(last_period_closing_voucher[0].posting_date) < getdate(
+		if getdate(last_period_closing_voucher.posting_date) < getdate(
 			add_days(filters.from_date, -1)
 		):
-			start_date = add_days(last_period_closing_voucher[0].posting_date, 1)
+			start_date = add_days(last_period_closing_voucher.posting_date, 1)
 			gle += get_opening_balance(
 				"GL Entry", filters, report_type, accounting_dimensions, start_date=start_date
 			)
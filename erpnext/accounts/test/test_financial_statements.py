@@ -0,0 +1,75 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_months, flt, nowdate
+
+from erpnext.accounts.doctype.journal_entry.test_journal_entry import make_journal_entry
+from erpnext.accounts.report.financial_statements import (
+	calculate_values,
+	get_period_list,
+	set_gl_entries_by_account,
+)
+from erpnext.accounts.utils import get_fiscal_year
+
+COMPANY = "_Test Company"
+
+
+class TestFinancialStatements(FrappeTestCase):
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def get_values(self, gl_entries_by_account, period_list, accumulated_values):
+		accounts_by_name = {account: frappe._dict() for account in gl_entries_by_account}
+		calculate_values(accounts_by_name, gl_entries_by_account, period_list, accumulated_values, True)
+		return {
+			account: {key: flt(value, 2) for key, value in values.items()}
+			for account, values in accounts_by_name.items()
+		}
+
+	def test_entries_summed_up_per_period(self):
+		for months, amount in ((0, 100), (0, 50), (-1, 30)):
+			make_journal_entry(
+				"_Test Bank - _TC",
+				"Sales - _TC",
+				amount,
+				posting_date=add_months(nowdate(), months),
+				submit=True,
+			)
+
+		fiscal_year = get_fiscal_year(nowdate(), company=COMPANY)[0]
+		period_list = get_period_list(
+			fiscal_year, fiscal_year, None, None, "Fiscal Year", "Monthly", company=COMPANY
+		)
+		from_date, to_date = period_list[0].year_start_date, period_list[-1].to_date
+		lft, rgt = frappe.db.get_value("Account", {"company": COMPANY}, ["min(lft)", "max(rgt)"])
+
+		gl_entries_by_account = {}
+		set_gl_entries_by_account(
+			COMPANY,
+			from_date,
+			to_date,
+			lft,
+			rgt,
+			frappe._dict(company=COMPANY),
+			gl_entries_by_account,
+			period_list=period_list,
+		)
+
+		ledger_entries_by_account = {}
+		for entry in frappe.get_all(
+			"GL Entry",
+			filters={
+				"company": COMPANY,
+				"is_cancelled": 0,
+				"posting_date": ("between", [from_date, to_date]),
+				"finance_book": ("is", "not set"),
+			},
+			fields=["account", "debit", "credit", "posting_date", "fiscal_year"],
+		):
+			ledger_entries_by_account.setdefault(entry.account, []).append(entry)
+
+		self.assertEqual(gl_entries_by_account.keys(), ledger_entries_by_account.keys())
+		for accumulated_values in (0, 1):
+			self.assertEqual(
+				self.get_values(gl_entries_by_account, period_list, accumulated_values),
+				self.get_values(ledger_entries_by_account, period_list, accumulated_values),
+			)
@@ -2,6 +2,7 @@
 # License: GNU General Public License v3. See license.txt
 
 
+from collections import defaultdict
 from json import loads
 from typing import TYPE_CHECKING, List, Optional, Tuple
 
@@ -18,6 +19,7 @@ from frappe.utils import (
 	cstr,
 	flt,
 	formatdate,
+	get_first_day,
 	get_number_format_info,
 	getdate,
 	now,
@@ -30,6 +32,10 @@ import erpnext
 
 # imported to enable erpnext.accounts.utils.get_account_currency
 from erpnext.accounts.doctype.account.account import get_account_currency  # noqa
+from erpnext.accounts.doctype.account_period_balance.account_period_balance import (
+	get_balance_before,
+	remove_voucher_balances,
+)
 from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import get_dimensions
 from erpnext.stock import get_warehouse_account_map
 from erpnext.stock.utils import get_stock_value_on
@@ -269,6 +275,16 @@ def get_balance_on(
 		cond.append("""gle.company = %s """ % (frappe.db.escape(company, percent=False)))
 
 	if account or (party_type and party):
+		opening_balance = 0.0
+		if report_type != "Profit and Loss":
+			# balance till the month of `date` is kept in Account Period Balance,
+			# only entries posted since are summed up
+			period_start_date = get_first_day(date)
+			cond.append("posting_date >= %s" % frappe.db.escape(cstr(period_start_date)))
+			opening_balance = get_balance_before(
+				period_start_date, account, party_type, party, company, in_account_currency
+			)
+
 		if in_account_currency:
 			select_field = "sum(debit_in_account_currency) - sum(credit_in_account_currency)"
 		else:
@@ -283,7 +299,7 @@ def get_balance_on(
 		)[0][0]
 
 		# if bal is None, return 0
-		return flt(bal)
+		return flt(bal) + opening_balance
 
 
 def get_count_on(account, fieldname, date):
@@ -1140,11 +1156,14 @@ def repost_gle_for_stock_vouchers(
 	warehouse_account=None,
 	repost_doc: Optional["RepostItemValuation"] = None,
 ):
+	"""Repost GL entries of stock vouchers which differ from the expected ones.
 
+	Returns the number of vouchers whose GL entries were replaced and of GL entries posted."""
 	from erpnext.accounts.general_ledger import toggle_debit_credit_if_negative
 
+	stats = frappe._dict({"vouchers_reposted": 0, "gl_entries": 0})
 	if not stock_vouchers:
-		return
+		return stats
 
 	if not warehouse_account:
 		warehouse_account = get_warehouse_account_map(company)
@@ -1159,6 +1178,7 @@ def repost_gle_for_stock_vouchers(
 	for stock_vouchers_chunk in create_batch(stock_vouchers, GL_REPOSTING_CHUNK):
 		gle = get_voucherwise_gl_entries(stock_vouchers_chunk, posting_date)
 
+		vouchers_to_clear, gl_entries_to_post = [], []
 		for voucher_type, voucher_no in stock_vouchers_chunk:
 			existing_gle = gle.get((voucher_type, voucher_no), [])
 			voucher_obj = frappe.get_doc(voucher_type, voucher_no)
@@ -1169,10 +1189,17 @@ def repost_gle_for_stock_vouchers(
 				if not existing_gle or not compare_existing_and_expected_gle(
 					existing_gle, expected_gle, precision
 				):
-					_delete_accounting_ledger_entries(voucher_type, voucher_no)
-					voucher_obj.make_gl_entries(gl_entries=expected_gle, from_repost=True)
+					vouchers_to_clear.append((voucher_type, voucher_no))
+					gl_entries_to_post.append((voucher_obj, expected_gle))
 			else:
-				_delete_accounting_ledger_entries(voucher_type, voucher_no)
+				vouchers_to_clear.append((voucher_type, voucher_no))
+
+		# replace ledger entries of the whole chunk at once
+		_delete_accounting_ledger_entries_of_vouchers(vouchers_to_clear)
+		for voucher_obj, expected_gle in gl_entries_to_post:
+			voucher_obj.make_gl_entries(gl_entries=expected_gle, from_repost=True)
+			stats.vouchers_reposted += 1
+			stats.gl_entries += len(expected_gle)
 
 		if not frappe.flags.in_test:
 			frappe.db.commit()
@@ -1183,6 +1210,8 @@ def repost_gle_for_stock_vouchers(
 				cint(repost_doc.gl_reposting_index) + len(stock_vouchers_chunk),
 			)
 
+	return stats
+
 
 def _delete_pl_entries(voucher_type, voucher_no):
 	ple = qb.DocType("Payment Ledger Entry")
@@ -1192,6 +1221,7 @@ def _delete_pl_entries(voucher_type, voucher_no):
 
 
 def _delete_gl_entries(voucher_type, voucher_no):
+	remove_voucher_balances(voucher_type, [voucher_no])
 	gle = qb.DocType("GL Entry")
 	qb.from_(gle).delete().where(
 		(gle.voucher_type == voucher_type) & (gle.voucher_no == voucher_no)
@@ -1206,6 +1236,23 @@ def _delete_accounting_ledger_entries(voucher_type, voucher_no):
 	_delete_pl_entries(voucher_type, voucher_no)
 
 
+def _delete_accounting_ledger_entries_of_vouchers(vouchers: List[Tuple[str, str]]):
+	"""Remove General and Payment Ledger entries of several vouchers, a query per voucher type."""
+	voucher_nos_by_type = defaultdict(list)
+	for voucher_type, voucher_no in vouchers:
+		voucher_nos_by_type[voucher_type].append(voucher_no)
+
+	for voucher_type, voucher_nos in voucher_nos_by_type.items():
+		remove_voucher_balances(voucher_type, voucher_nos)
+
+	for doctype in ("GL Entry", "Payment Ledger Entry"):
+		table = qb.DocType(doctype)
+		for voucher_type, voucher_nos in voucher_nos_by_type.items():
+			qb.from_(table).delete().where(
+				(table.voucher_type == voucher_type) & (table.voucher_no.isin(voucher_nos))
+			).run()
+
+
 def sort_stock_vouchers_by_posting_date(
 	stock_vouchers: List[Tuple[str, str]]
 ) -> List[Tuple[str, str]]:
@@ -12,7 +12,7 @@ from erpnext.controllers.sales_and_purchase_return import get_rate_for_return
 from erpnext.controllers.stock_controller import StockController
 from erpnext.stock.doctype.item.item import set_item_default
 from erpnext.stock.get_item_details import get_bin_details, get_conversion_factor
-from erpnext.stock.utils import get_incoming_rate
+from erpnext.stock.utils import get_incoming_rates
 
 
 class SellingController(StockController):
@@ -414,29 +414,17 @@ class SellingController(StockController):
 			return
 
 		items = self.get("items") + (self.get("packed_items") or [])
+		if not self.get("return_against"):
+			# Get incoming rate based on original item cost based on valuation method
+			items_to_rate = [d for d in items if not (self.get("is_return") and d.incoming_rate)]
+			incoming_rates = get_incoming_rates(
+				[self.get_incoming_rate_args(d) for d in items_to_rate], raise_error_if_no_rate=False
+			)
+			for d, incoming_rate in zip(items_to_rate, incoming_rates):
+				d.incoming_rate = incoming_rate
+
 		for d in items:
 			if not self.get("return_against"):
-				# Get incoming rate based on original item cost based on valuation method
-				qty = flt(d.get("stock_qty") or d.get("actual_qty"))
-
-				if not (self.get("is_return") and d.incoming_rate):
-					d.incoming_rate = get_incoming_rate(
-						{
-							"item_code": d.item_code,
-							"warehouse": d.warehouse,
-							"posting_date": self.get("posting_date") or self.get("transaction_date"),
-							"posting_time": self.get("posting_time") or nowtime(),
-							"qty": qty if cint(self.get("is_return")) else (-1 * qty),
-							"serial_no": d.get("serial_no"),
-							"batch_no": d.get("batch_no"),
-							"company": self.company,
-							"voucher_type": self.doctype,
-							"voucher_no": self.name,
-							"allow_zero_valuation": d.get("allow_zero_valuation"),
-						},
-						raise_error_if_no_rate=False,
-					)
-
 				# For internal transfers use incoming rate as the valuation rate
 				if self.is_internal_transfer():
 					if self.doctype == "Delivery Note" or self.get("update_stock"):
@@ -472,6 +460,22 @@ class SellingController(StockController):
 					self.doctype, self.name, d.item_code, self.return_against, item_row=d
 				)
 
+	def get_incoming_rate_args(self, d):
+		qty = flt(d.get("stock_qty") or d.get("actual_qty"))
+		return {
+			"item_code": d.item_code,
+			"warehouse": d.warehouse,
+			"posting_date": self.get("posting_date") or self.get("transaction_date"),
+			"posting_time": self.get("posting_time") or nowtime(),
+			"qty": qty if cint(self.get("is_return")) else (-1 * qty),
+			"serial_no": d.get("serial_no"),
+			"batch_no": d.get("batch_no"),
+			"company": self.company,
+			"voucher_type": self.doctype,
+			"voucher_no": self.name,
+			"allow_zero_valuation": d.get("allow_zero_valuation"),
+		}
+
 	def update_stock_ledger(self):
 		self.update_reserved_qty()
 
@@ -40,6 +40,18 @@ class BatchExpiredError(frappe.ValidationError):
 	pass
 
 
+# warehouse fields of item rows whose Bins are updated on submit and cancel
+BIN_WAREHOUSE_FIELDS = (
+	"warehouse",
+	"s_warehouse",
+	"t_warehouse",
+	"target_warehouse",
+	"from_warehouse",
+	"rejected_warehouse",
+	"reserve_warehouse",
+)
+
+
 class StockController(AccountsController):
 	def validate(self):
 		super(StockController, self).validate()
@@ -52,6 +64,39 @@ class StockController(AccountsController):
 		self.validate_internal_transfer()
 		self.validate_putaway_capacity()
 
+	def run_post_save_methods(self):
+		if self._action in ("submit", "cancel"):
+			self.lock_bins_upfront()
+
+		super(StockController, self).run_post_save_methods()
+
+	def lock_bins_upfront(self):
+		"""Lock the Bins of all item rows sorted, if enabled in Stock Settings.
+
+		Runs before `on_submit` and `on_cancel`, so before reserved and ordered qty updates
+		write to any Bin in row order."""
+		from erpnext.stock.doctype.bin.bin import lock_bins
+
+		if not frappe.db.get_single_value("Stock Settings", "lock_bins_upfront", cache=True):
+			return
+
+		self.flags.locked_item_warehouses = self.get_bin_item_warehouses()
+		lock_bins(self.flags.locked_item_warehouses, self.doctype)
+
+	def get_bin_item_warehouses(self):
+		item_warehouses = set()
+		for table in ("items", "packed_items", "supplied_items"):
+			for row in self.get(table) or []:
+				item_code = row.get("rm_item_code") or row.get("item_code")
+				if not item_code:
+					continue
+
+				for field in BIN_WAREHOUSE_FIELDS:
+					if row.get(field):
+						item_warehouses.add((item_code, row.get(field)))
+
+		return item_warehouses
+
 	def make_gl_entries(self, gl_entries=None, from_repost=False):
 		if self.docstatus == 2:
 			make_reverse_gl_entries(voucher_type=self.doctype, voucher_no=self.name)
@@ -465,8 +510,21 @@ class StockController(AccountsController):
 					row.db_set(dimension.source_fieldname, sl_dict[dimension.target_fieldname])
 
 	def make_sl_entries(self, sl_entries, allow_negative_stock=False, via_landed_cost_voucher=False):
+		from erpnext.stock.doctype.bin.bin import lock_bins
 		from erpnext.stock.stock_ledger import make_sl_entries
 
+		if sl_entries and frappe.db.get_single_value("Stock Settings", "lock_bins_upfront", cache=True):
+			# Bins of item rows are locked before submit and cancel already
+			locked = self.flags.locked_item_warehouses or set()
+			lock_bins(
+				[
+					(sle.item_code, sle.warehouse)
+					for sle in sl_entries
+					if (sle.item_code, sle.warehouse) not in locked
+				],
+				self.doctype,
+			)
+
 		make_sl_entries(sl_entries, allow_negative_stock, via_landed_cost_voucher)
 
 	def make_gl_entries_on_cancel(self):
@@ -421,6 +421,8 @@ scheduler_events = {
 	],
 	"monthly_long": [
 		"erpnext.accounts.deferred_revenue.process_deferred_accounting",
+		"erpnext.stock.doctype.stock_valuation_checkpoint.stock_valuation_checkpoint.create_checkpoints",
+		"erpnext.stock.doctype.stock_closing_balance.stock_closing_balance.create_closing_balances",
 		"erpnext.loan_management.doctype.process_loan_interest_accrual.process_loan_interest_accrual.process_loan_interest_accrual_for_demand_loans",
 	],
 }
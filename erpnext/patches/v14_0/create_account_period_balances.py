@@ -0,0 +1,10 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# License: MIT. See LICENSE
+
+from erpnext.accounts.doctype.account_period_balance.account_period_balance import (
+	rebuild_period_balances,
+)
+
+
+def execute():
+	rebuild_period_balances()
@@ -0,0 +1,10 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# License: MIT. See LICENSE
+
+from erpnext.stock.doctype.serial_no_ledger_entry.serial_no_ledger_entry import (
+	rebuild_serial_no_ledger_entries,
+)
+
+
+def execute():
+	rebuild_serial_no_ledger_entries()
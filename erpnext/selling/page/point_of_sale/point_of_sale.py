@@ -54,7 +54,7 @@ def search_by_term(search_term, warehouse, price_list):
 				}
 			)
 
-	item_stock_qty, is_stock_item = get_stock_availability(item_code, warehouse)
+	item_stock_qty, is_stock_item = get_stock_availability(item_code, warehouse, use_cache=True)
 	item_stock_qty = item_stock_qty // item.get("conversion_factor", 1)
 	item.update({"actual_qty": item_stock_qty})
 
@@ -163,7 +163,7 @@ def get_items(start, page_length, price_list, item_group, pos_profile, search_te
 	for item in items_data:
 		uoms = frappe.get_doc("Item", item.item_code).get("uoms", [])
 
-		item.actual_qty, _ = get_stock_availability(item.item_code, warehouse)
+		item.actual_qty, _ = get_stock_availability(item.item_code, warehouse, use_cache=True)
 		item.uom = item.stock_uom
 
 		item_price = frappe.get_all(
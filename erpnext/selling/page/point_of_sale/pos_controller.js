@@ -693,6 +693,7 @@ erpnext.PointOfSale.Controller = class {
 			args: {
 				'item_code': item_code,
 				'warehouse': warehouse,
+				'use_cache': 1,
 			},
 			callback(res) {
 				if (!me.item_stock_map[item_code])
@@ -0,0 +1,78 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+"""Measure a backdated repost on a large synthetic ledger with and without valuation checkpoints.
+
+        bench --site <site> execute erpnext.stock.benchmarks.checkpoint_repost.run
+                --kwargs "{'sle_count': 1000000}"
+"""
+
+import frappe
+from frappe.utils import add_days, add_months, get_first_day, get_last_day, getdate
+
+from erpnext.stock.benchmarks.utils import (
+	cleanup_benchmark_item,
+	get_benchmark_warehouse,
+	insert_synthetic_ledger,
+	make_benchmark_item,
+	measure,
+	print_results,
+)
+from erpnext.stock.doctype.stock_valuation_checkpoint.stock_valuation_checkpoint import (
+	make_checkpoint,
+)
+from erpnext.stock.stock_ledger import get_previous_sle_of_current_voucher, update_entries_after
+
+
+def run(sle_count=1_000_000, company=None, repost_days=3):
+	warehouse = get_benchmark_warehouse(company)
+	item_code = make_benchmark_item().name
+	results = []
+
+	try:
+		last_posting_date = insert_synthetic_ledger(item_code, warehouse, sle_count)
+		repost_from = add_days(last_posting_date, -repost_days)
+		args = frappe._dict(
+			{
+				"item_code": item_code,
+				"warehouse": warehouse,
+				"posting_date": repost_from,
+				"posting_time": "00:00:00",
+			}
+		)
+
+		with measure("previous state lookup (ledger scan)", results):
+			get_previous_sle_of_current_voucher(args.copy())
+
+		with measure("repost tail (ledger scan)", results):
+			update_entries_after(args.copy(), allow_negative_stock=True)
+		frappe.db.rollback()
+
+		with measure("create monthly checkpoints", results):
+			create_monthly_checkpoints(item_code, warehouse, repost_from)
+		frappe.db.commit()
+
+		with measure("previous state lookup (checkpoint)", results):
+			get_previous_sle_of_current_voucher(args.copy(), from_checkpoint=True)
+
+		with measure("repost tail (checkpoint)", results):
+			update_entries_after(args.copy(), allow_negative_stock=True)
+		frappe.db.rollback()
+	finally:
+		cleanup_benchmark_item(item_code)
+
+	print_results(results)
+	return results
+
+
+def create_monthly_checkpoints(item_code, warehouse, upto_date):
+	first_date = frappe.db.get_value(
+		"Stock Ledger Entry", {"item_code": item_code, "warehouse": warehouse}, "min(posting_date)"
+	)
+
+	checkpoint_date = get_last_day(first_date)
+	while checkpoint_date < get_first_day(upto_date):
+		make_checkpoint(item_code, warehouse, checkpoint_date)
+		checkpoint_date = get_last_day(add_months(checkpoint_date, 1))
+
+	return getdate(checkpoint_date)
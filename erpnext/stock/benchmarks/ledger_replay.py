@@ -0,0 +1,154 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+"""Measure posting, backdated reposting and cancellation on synthetic stock ledgers.
+
+        bench --site <site> execute erpnext.stock.benchmarks.ledger_replay.run
+                --kwargs "{'entries': 1000, 'profiles': ['fifo', 'serial']}"
+
+Every profile builds its own ledger of `entries` stock entries through the regular submit
+path (`make_sl_entries`), one per day, issuing or transferring every third day. Then
+a receipt is inserted in the middle of the ledger and cancelled again, both reposted
+through Repost Item Valuation (`repost_future_sle`, `update_entries_after`).
+"""
+
+import frappe
+from frappe.utils import add_days, getdate
+
+from erpnext.stock.benchmarks.utils import (
+	cleanup_benchmark_item,
+	cleanup_benchmark_vouchers,
+	get_benchmark_warehouse,
+	make_benchmark_item,
+	measure,
+	print_results,
+)
+from erpnext.stock.doctype.repost_item_valuation.repost_item_valuation import repost
+from erpnext.stock.doctype.serial_no.serial_no import get_serial_nos
+from erpnext.stock.doctype.stock_entry.stock_entry_utils import make_stock_entry
+from erpnext.stock.stock_ledger import get_valuation_rate
+
+PROFILES = {
+	"fifo": {"valuation_method": "FIFO"},
+	"moving_average": {"valuation_method": "Moving Average"},
+	"lifo": {"valuation_method": "LIFO"},
+	"batch": {
+		"valuation_method": "FIFO",
+		"has_batch_no": 1,
+		"create_new_batch": 1,
+		"batch_number_series": "BENCH-BATCH-.#####",
+	},
+	"serial": {
+		"valuation_method": "FIFO",
+		"has_serial_no": 1,
+		"serial_no_series": "BENCH-SN-.#####",
+	},
+	"transfer": {"valuation_method": "FIFO"},
+}
+
+
+def run(
+	entries=500,
+	profiles=None,
+	company=None,
+	start_date="2020-01-01",
+	valuation_rate_lookups=100,
+	trace_memory=True,
+):
+	results = []
+	for profile in profiles or PROFILES:
+		results.extend(
+			run_profile(profile, entries, company, start_date, valuation_rate_lookups, trace_memory)
+		)
+
+	print_results(results)
+	return results
+
+
+def run_profile(profile, entries, company, start_date, valuation_rate_lookups, trace_memory):
+	company = company or frappe.defaults.get_defaults().company
+	ledger = BenchmarkLedger(profile, company, start_date)
+	results = []
+
+	try:
+		with measure(f"{profile}: submit {entries} entries", results, trace_memory):
+			for day in range(entries):
+				ledger.make_entry(day)
+
+		with measure(f"{profile}: submit entry at the end", results, trace_memory):
+			ledger.make_entry(entries)
+
+		backdated = ledger.make_entry(entries // 2, backdated=True)
+		with measure(f"{profile}: repost backdated entry", results, trace_memory):
+			ledger.repost(backdated)
+
+		with measure(f"{profile}: {valuation_rate_lookups} valuation rate lookups", results):
+			for _ in range(valuation_rate_lookups):
+				get_valuation_rate(
+					ledger.item_code,
+					ledger.warehouse,
+					backdated.doctype,
+					backdated.name,
+					company=company,
+					batch_no=ledger.batch_no,
+				)
+
+		backdated.cancel()
+		with measure(f"{profile}: repost cancelled entry", results, trace_memory):
+			ledger.repost(backdated)
+	finally:
+		frappe.db.rollback()
+		cleanup_benchmark_vouchers(ledger.item_code)
+		cleanup_benchmark_item(ledger.item_code)
+
+	return results
+
+
+class BenchmarkLedger:
+	def __init__(self, profile, company, start_date):
+		self.profile = profile
+		self.company = company
+		self.start_date = getdate(start_date)
+		self.item_code = make_benchmark_item(**PROFILES[profile]).name
+		self.warehouse = get_benchmark_warehouse(company)
+		self.target_warehouse = None
+		if profile == "transfer":
+			self.target_warehouse = frappe.db.get_value(
+				"Warehouse",
+				{"company": company, "is_group": 0, "name": ("!=", self.warehouse)},
+				"name",
+			)
+
+		self.batch_no = None
+		self.serial_nos = []
+
+	def make_entry(self, day, backdated=False):
+		"""Receive 10 units, every third day issue (or transfer) 5 units instead."""
+		args = {
+			"item_code": self.item_code,
+			"company": self.company,
+			"posting_date": add_days(self.start_date, day),
+			"posting_time": "12:00:00" if backdated else "10:00:00",
+		}
+
+		if day % 3 != 2 or backdated:
+			se = make_stock_entry(to_warehouse=self.warehouse, qty=10, rate=100 + day % 7, **args)
+			self.serial_nos.extend(get_serial_nos(se.items[0].serial_no))
+			self.batch_no = se.items[0].batch_no or self.batch_no
+			return se
+
+		if self.profile == "serial":
+			args["serial_no"] = "\n".join(self.serial_nos[:5])
+			self.serial_nos = self.serial_nos[5:]
+		elif self.profile == "batch":
+			args["batch_no"] = self.batch_no
+
+		return make_stock_entry(
+			from_warehouse=self.warehouse, to_warehouse=self.target_warehouse, qty=5, **args
+		)
+
+	def repost(self, voucher):
+		riv = frappe.get_last_doc(
+			"Repost Item Valuation", {"voucher_type": voucher.doctype, "voucher_no": voucher.name}
+		)
+		repost(riv)
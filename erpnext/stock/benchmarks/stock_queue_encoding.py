@@ -0,0 +1,58 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+"""Compare storage and CPU cost of JSON and compact stock queues.
+
+        bench --site <site> execute erpnext.stock.benchmarks.stock_queue_encoding.run
+                --kwargs "{'sample_size': 100000}"
+
+Synthetic queues of a few sizes are measured first, followed by a sample of
+stock queues read from the Stock Ledger Entries of the site, if any.
+"""
+
+import frappe
+
+from erpnext.stock.benchmarks.utils import measure, print_results
+from erpnext.stock.valuation import decode_stock_queue, encode_stock_queue
+
+
+def run(queue_sizes=(1, 10, 100, 1000), sample_size=100000, repeat=1000):
+	results = []
+	for queue_size in queue_sizes:
+		queue = [[float(10 + i % 7), 100.0 + i * 0.37] for i in range(queue_size)]
+		compare_encodings(f"{queue_size} bins", [queue] * repeat, results)
+
+	sample = get_stored_queues(sample_size)
+	if sample:
+		compare_encodings(f"{len(sample)} stored queues", sample, results)
+
+	print_results(results)
+	return results
+
+
+def compare_encodings(label, queues, results):
+	for compact in (False, True):
+		encoding = "compact" if compact else "json"
+
+		with measure(f"encode {label} ({encoding})", results):
+			encoded = [encode_stock_queue(queue, compact) for queue in queues]
+
+		with measure(f"decode {label} ({encoding})", results):
+			for value in encoded:
+				decode_stock_queue(value)
+
+		results[-1].stored_kb = round(sum(len(value) for value in encoded) / 1024, 1)
+		print(f"{label} ({encoding}): {results[-1].stored_kb} KiB stored")
+
+
+def get_stored_queues(sample_size):
+	return [
+		decode_stock_queue(stock_queue)
+		for stock_queue in frappe.get_all(
+			"Stock Ledger Entry",
+			filters={"is_cancelled": 0},
+			pluck="stock_queue",
+			order_by="creation desc",
+			limit=sample_size,
+		)
+	]
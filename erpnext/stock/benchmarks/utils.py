@@ -0,0 +1,223 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+"""Helpers shared by stock ledger benchmarks.
+
+Benchmarks are meant to be run against a development site, e.g.:
+
+        bench --site <site> execute erpnext.stock.benchmarks.checkpoint_repost.run
+
+They create their own items and delete every record they inserted once done.
+"""
+
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import add_days, flt, getdate, now
+
+from erpnext.stock.valuation import FIFOValuation, LIFOValuation
+
+
+class QueryCounter:
+	"""Count queries issued through `frappe.db.sql` while active."""
+
+	def __init__(self):
+		self.count = 0
+
+	def __enter__(self):
+		original_sql = frappe.db.sql
+
+		def sql(*args, **kwargs):
+			self.count += 1
+			return original_sql(*args, **kwargs)
+
+		frappe.db.sql = sql
+		return self
+
+	def __exit__(self, *exc):
+		del frappe.db.sql
+
+
+@contextmanager
+def measure(label, results, trace_memory=False):
+	"""Record wall time, query count and optionally peak memory of the enclosed block."""
+	if trace_memory:
+		tracemalloc.start()
+
+	start = time.perf_counter()
+	with QueryCounter() as counter:
+		yield
+
+	result = frappe._dict(
+		{
+			"label": label,
+			"seconds": round(time.perf_counter() - start, 4),
+			"queries": counter.count,
+		}
+	)
+
+	if trace_memory:
+		result.peak_memory_kb = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+		tracemalloc.stop()
+
+	results.append(result)
+
+
+def print_results(results):
+	for result in results:
+		line = f"{result.label:<60} {result.seconds:>10.4f}s {result.queries:>8} queries"
+		if result.get("peak_memory_kb") is not None:
+			line += f" {result.peak_memory_kb:>12.1f} KiB peak"
+		print(line)
+
+
+def make_benchmark_item(valuation_method="FIFO", **properties):
+	item = frappe.new_doc("Item")
+	item.update(
+		{
+			"item_code": "_Benchmark Item " + frappe.generate_hash(length=8),
+			"item_group": "All Item Groups",
+			"stock_uom": "Nos",
+			"is_stock_item": 1,
+			"valuation_method": valuation_method,
+			"allow_negative_stock": 1,
+		}
+	)
+	item.update(properties)
+	item.flags.ignore_permissions = True
+	item.insert()
+	return item
+
+
+def get_benchmark_warehouse(company=None):
+	company = company or frappe.defaults.get_defaults().company
+	return frappe.db.get_value("Warehouse", {"company": company, "is_group": 0}, "name")
+
+
+def insert_synthetic_ledger(
+	item_code, warehouse, sle_count, start_date="2015-01-01", entries_per_day=500
+):
+	"""Bulk insert a consistent ledger of alternating receipts and issues.
+
+	Running qty, value and queue are computed the same way the repost engine does,
+	so reposting the ledger from any point should leave it unchanged."""
+	company = frappe.get_cached_value("Warehouse", warehouse, "company")
+	valuation_method = frappe.get_cached_value("Item", item_code, "valuation_method") or "FIFO"
+	queue = (LIFOValuation if valuation_method == "LIFO" else FIFOValuation)([])
+
+	fields = [
+		"name",
+		"creation",
+		"modified",
+		"owner",
+		"modified_by",
+		"docstatus",
+		"item_code",
+		"warehouse",
+		"company",
+		"posting_date",
+		"posting_time",
+		"voucher_type",
+		"voucher_no",
+		"actual_qty",
+		"incoming_rate",
+		"outgoing_rate",
+		"qty_after_transaction",
+		"valuation_rate",
+		"stock_value",
+		"stock_value_difference",
+		"stock_queue",
+		"stock_uom",
+		"is_cancelled",
+	]
+
+	timestamp = now()
+	posting_date = getdate(start_date)
+	prev_stock_value = 0.0
+	values = []
+	for i in range(sle_count):
+		if i and not i % entries_per_day:
+			posting_date = add_days(posting_date, 1)
+
+		if i % 3 == 2:
+			actual_qty, rate = -15, 0.0
+			queue.remove_stock(qty=15)
+		else:
+			actual_qty, rate = 10, 100.0 + (i % 7)
+			queue.add_stock(qty=10, rate=rate)
+
+		qty, stock_value = queue.get_total_stock_and_value()
+		values.append(
+			(
+				frappe.generate_hash(length=10),
+				timestamp,
+				timestamp,
+				"Administrator",
+				"Administrator",
+				1,
+				item_code,
+				warehouse,
+				company,
+				posting_date,
+				f"{(i % entries_per_day) // 60:02d}:{(i % entries_per_day) % 60:02d}:00",
+				"Stock Entry",
+				"_BENCHMARK-" + item_code,
+				actual_qty,
+				rate,
+				0.0,
+				qty,
+				flt(stock_value / qty) if qty else 0.0,
+				stock_value,
+				stock_value - prev_stock_value,
+				json.dumps(queue.state),
+				"Nos",
+				0,
+			)
+		)
+		prev_stock_value = stock_value
+
+		if len(values) >= 10_000:
+			frappe.db.bulk_insert("Stock Ledger Entry", fields, values)
+			values = []
+
+	if values:
+		frappe.db.bulk_insert("Stock Ledger Entry", fields, values)
+
+	frappe.db.commit()
+	return posting_date
+
+
+def cleanup_benchmark_vouchers(item_code):
+	"""Delete stock entries of a benchmark item along with their ledgers and reposts."""
+	vouchers = frappe.get_all(
+		"Stock Ledger Entry",
+		filters={"item_code": item_code, "voucher_type": "Stock Entry"},
+		pluck="voucher_no",
+		distinct=True,
+	)
+	if vouchers:
+		frappe.db.delete("GL Entry", {"voucher_type": "Stock Entry", "voucher_no": ("in", vouchers)})
+		reposts = frappe.get_all(
+			"Repost Item Valuation",
+			filters={"voucher_type": "Stock Entry", "voucher_no": ("in", vouchers)},
+			pluck="name",
+		)
+		if reposts:
+			frappe.db.delete("Repost Item Valuation Component", {"parent": ("in", reposts)})
+			frappe.db.delete("Repost Item Valuation", {"name": ("in", reposts)})
+		frappe.db.delete("Stock Entry Detail", {"parent": ("in", vouchers)})
+		frappe.db.delete("Stock Entry", {"name": ("in", vouchers)})
+
+	frappe.db.delete("Serial No", {"item_code": item_code})
+	frappe.db.delete("Batch", {"item": item_code})
+	frappe.db.commit()
+
+
+def cleanup_benchmark_item(item_code):
+	for doctype in ("Stock Ledger Entry", "Stock Valuation Checkpoint", "Bin"):
+		frappe.db.delete(doctype, {"item_code": item_code})
+	frappe.delete_doc("Item", item_code, force=True, ignore_permissions=True)
+	frappe.db.commit()
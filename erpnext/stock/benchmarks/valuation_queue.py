@@ -0,0 +1,60 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+"""Compare FIFO queue implementations on queues of realistic sizes.
+
+        bench --site <site> execute erpnext.stock.benchmarks.valuation_queue.run
+                --kwargs "{'queue_sizes': [100, 1000, 10000]}"
+
+Each run keeps the queue at roughly its initial size: every receipt at a new rate
+is followed by an issue, one in four issues being made at an existing rate (e.g. returns).
+Only queue operations are timed, computing totals is linear for every implementation.
+"""
+
+import random
+
+from erpnext.stock.benchmarks.utils import measure, print_results
+from erpnext.stock.valuation import DequeFIFOValuation, FIFOValuation
+
+IMPLEMENTATIONS = {
+	"list": FIFOValuation,
+	"deque": lambda state: DequeFIFOValuation(state, index_rates=False),
+	"deque with rate index": DequeFIFOValuation,
+}
+
+
+def run(queue_sizes=(100, 1000, 10000), transactions=20000, seed=42):
+	results = []
+	for queue_size in queue_sizes:
+		state = [[10.0, 100.0 + i * 0.01] for i in range(queue_size)]
+		operations = get_operations(queue_size, transactions, seed)
+
+		for implementation, valuation_class in IMPLEMENTATIONS.items():
+			queue = valuation_class([list(stock_bin) for stock_bin in state])
+			with measure(f"{implementation} ({queue_size} bins)", results):
+				replay(queue, operations)
+
+	print_results(results)
+	return results
+
+
+def get_operations(queue_size, transactions, seed):
+	rng = random.Random(seed)
+	operations = []
+	for i in range(transactions):
+		operations.append((10.0, 200.0 + i * 0.01, 0.0))
+
+		outgoing_rate = 0.0
+		if not i % 4:
+			outgoing_rate = 100.0 + rng.randrange(queue_size) * 0.01
+		operations.append((-rng.choice((5.0, 10.0, 15.0)), 0.0, outgoing_rate))
+
+	return operations
+
+
+def replay(queue, operations):
+	for qty, rate, outgoing_rate in operations:
+		if qty > 0:
+			queue.add_stock(qty=qty, rate=rate)
+		else:
+			queue.remove_stock(qty=-qty, outgoing_rate=outgoing_rate)
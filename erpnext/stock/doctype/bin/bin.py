@@ -1,12 +1,18 @@
 # Copyright (c) 2015, Frappe Technologies Pvt. Ltd. and Contributors
 # License: GNU General Public License v3. See license.txt
 
+import time
+from contextlib import contextmanager
 
 import frappe
 from frappe.model.document import Document
 from frappe.query_builder import Case, Order
 from frappe.query_builder.functions import Coalesce, CombineDatetime, Sum
-from frappe.utils import flt
+from frappe.utils import cint, flt, now
+
+BIN_LOCK_WAIT_KEY = "erpnext:bin_lock_wait"
+BIN_QTY_CACHE_KEY = "erpnext:bin_qty"
+BIN_QTY_CACHE_TTL = 300
 
 
 class Bin(Document):
@@ -15,6 +21,16 @@ class Bin(Document):
 			self.stock_uom = frappe.get_cached_value("Item", self.item_code, "stock_uom")
 		self.set_projected_qty()
 
+	def on_update(self):
+		clear_bin_qty_cache(self.item_code)
+
+	def on_trash(self):
+		clear_bin_qty_cache(self.item_code)
+
+	def clear_cache(self):
+		clear_bin_qty_cache(self.item_code)
+		super().clear_cache()
+
 	def set_projected_qty(self):
 		self.projected_qty = (
 			flt(self.actual_qty)
@@ -41,6 +57,7 @@ class Bin(Document):
 			"reserved_qty_for_production", flt(self.reserved_qty_for_production), update_modified=True
 		)
 		self.db_set("projected_qty", self.projected_qty, update_modified=True)
+		clear_bin_qty_cache(self.item_code)
 
 	def update_reserved_qty_for_sub_contracting(self, subcontract_doctype="Subcontracting Order"):
 		# reserved qty
@@ -123,27 +140,29 @@ class Bin(Document):
 		self.db_set("reserved_qty_for_sub_contract", reserved_qty_for_sub_contract, update_modified=True)
 		self.set_projected_qty()
 		self.db_set("projected_qty", self.projected_qty, update_modified=True)
+		clear_bin_qty_cache(self.item_code)
 
 
 def on_doctype_update():
 	frappe.db.add_unique("Bin", ["item_code", "warehouse"], constraint_name="unique_item_warehouse")
 
 
+BIN_QTY_FIELDS = [
+	"actual_qty",
+	"ordered_qty",
+	"reserved_qty",
+	"indented_qty",
+	"planned_qty",
+	"reserved_qty_for_production",
+	"reserved_qty_for_sub_contract",
+]
+
+# qty changes passed in `args` of `update_qty`
+BIN_QTY_DELTA_FIELDS = ["ordered_qty", "reserved_qty", "indented_qty", "planned_qty"]
+
+
 def get_bin_details(bin_name):
-	return frappe.db.get_value(
-		"Bin",
-		bin_name,
-		[
-			"actual_qty",
-			"ordered_qty",
-			"reserved_qty",
-			"indented_qty",
-			"planned_qty",
-			"reserved_qty_for_production",
-			"reserved_qty_for_sub_contract",
-		],
-		as_dict=1,
-	)
+	return frappe.db.get_value("Bin", bin_name, BIN_QTY_FIELDS, as_dict=1)
 
 
 def update_qty(bin_name, args):
@@ -174,6 +193,14 @@ def update_qty(bin_name, args):
 		if last_sle_qty:
 			actual_qty = last_sle_qty[0][0]
 
+	with bin_lock_wait(args.get("voucher_type"), [bin_name]):
+		frappe.db.set_value(
+			"Bin", bin_name, get_updated_qty(bin_details, actual_qty, args), update_modified=True
+		)
+	clear_bin_qty_cache(args.get("item_code"))
+
+
+def get_updated_qty(bin_details, actual_qty, args):
 	ordered_qty = flt(bin_details.ordered_qty) + flt(args.get("ordered_qty"))
 	reserved_qty = flt(bin_details.reserved_qty) + flt(args.get("reserved_qty"))
 	indented_qty = flt(bin_details.indented_qty) + flt(args.get("indented_qty"))
@@ -190,16 +217,245 @@ def update_qty(bin_name, args):
 		- flt(bin_details.reserved_qty_for_sub_contract)
 	)
 
-	frappe.db.set_value(
-		"Bin",
-		bin_name,
+	return {
+		"actual_qty": actual_qty,
+		"ordered_qty": ordered_qty,
+		"reserved_qty": reserved_qty,
+		"indented_qty": indented_qty,
+		"planned_qty": planned_qty,
+		"projected_qty": projected_qty,
+	}
+
+
+def update_qty_in_bulk(bin_updates, batch_size=500):
+	"""`update_qty` for all bins touched by a voucher, `bin_updates` is a list of (bin name, args).
+
+	Qty changes to the same bin are summed up and actual qty is taken as of the last update.
+	Bins are locked sorted by (item_code, warehouse), like `lock_bins`, and written with one
+	statement per `batch_size` bins."""
+	from erpnext.controllers.stock_controller import future_sle_exists
+	from erpnext.stock.stock_ledger import bulk_update_rows
+
+	bin_args = {}
+	for bin_name, args in bin_updates:
+		args = frappe._dict(args)
+		if bin_name in bin_args:
+			previous_args = bin_args[bin_name]
+			for field in BIN_QTY_DELTA_FIELDS:
+				args[field] = flt(previous_args.get(field)) + flt(args.get(field))
+		bin_args[bin_name] = args
+
+	bin_names = sorted(bin_args, key=lambda d: (bin_args[d].item_code, bin_args[d].warehouse))
+	voucher_type = bin_updates[0][1].get("voucher_type") if bin_updates else None
+	for i in range(0, len(bin_names), batch_size):
+		batch = bin_names[i : i + batch_size]
+
+		bin_table = frappe.qb.DocType("Bin")
+		with bin_lock_wait(voucher_type, batch):
+			bin_details = (
+				frappe.qb.from_(bin_table)
+				.select(
+					bin_table.name,
+					bin_table.item_code,
+					bin_table.warehouse,
+					*[bin_table[field] for field in BIN_QTY_FIELDS],
+				)
+				.where(bin_table.name.isin(batch))
+				.orderby(bin_table.item_code)
+				.orderby(bin_table.warehouse)
+				.for_update()
+			).run(as_dict=True)
+
+		# actual qty is not up to date in case of backdated transaction
+		last_sle_qty = get_last_sle_qty(
+			[(d.item_code, d.warehouse) for d in bin_details if future_sle_exists(bin_args[d.name])]
+		)
+
+		timestamp = now()
+		updates = {}
+		for d in bin_details:
+			actual_qty = d.actual_qty or 0.0
+			if (d.item_code, d.warehouse) in last_sle_qty:
+				actual_qty = last_sle_qty[(d.item_code, d.warehouse)]
+
+			updates[d.name] = get_updated_qty(d, actual_qty, bin_args[d.name])
+			updates[d.name].update({"modified": timestamp, "modified_by": frappe.session.user})
+
+		if updates:
+			bulk_update_rows("Bin", updates, list(next(iter(updates.values()))))
+			clear_bin_qty_cache([d.item_code for d in bin_details])
+
+
+def get_last_sle_qty(item_warehouses):
+	"""Qty after the last stock ledger entry of each (item_code, warehouse), 0 if none."""
+	if not item_warehouses:
+		return {}
+
+	last_sle_qty = dict.fromkeys(item_warehouses, 0.0)
+	data = frappe.db.sql(
+		"""
+		select item_code, warehouse, qty_after_transaction from (
+			select item_code, warehouse, qty_after_transaction,
+				row_number() over (partition by item_code, warehouse
+					order by timestamp(posting_date, posting_time) desc, creation desc) as row_no
+			from `tabStock Ledger Entry`
+			where item_code in %(item_codes)s
+				and warehouse in %(warehouses)s
+				and is_cancelled = 0
+		) sle
+		where row_no = 1""",
 		{
-			"actual_qty": actual_qty,
-			"ordered_qty": ordered_qty,
-			"reserved_qty": reserved_qty,
-			"indented_qty": indented_qty,
-			"planned_qty": planned_qty,
-			"projected_qty": projected_qty,
+			"item_codes": list({item_code for item_code, warehouse in item_warehouses}),
+			"warehouses": list({warehouse for item_code, warehouse in item_warehouses}),
 		},
-		update_modified=True,
 	)
+	for item_code, warehouse, qty_after_transaction in data:
+		if (item_code, warehouse) in last_sle_qty:
+			last_sle_qty[(item_code, warehouse)] = qty_after_transaction
+
+	return last_sle_qty
+
+
+def lock_bins(item_warehouses, voucher_type=None):
+	"""Lock the existing bins of `item_warehouses` one by one, sorted by (item_code, warehouse).
+
+	Transactions taking their bin locks in the same order wait for each other instead of
+	deadlocking, as none can hold a lock another one needs before its own."""
+	for item_code, warehouse in sorted(set(item_warehouses)):
+		with bin_lock_wait(voucher_type) as locked_bins:
+			bin_name = frappe.db.get_value(
+				"Bin", {"item_code": item_code, "warehouse": warehouse}, "name", for_update=True
+			)
+			if bin_name:
+				locked_bins.append(bin_name)
+
+
+@contextmanager
+def bin_lock_wait(voucher_type=None, bin_names=None):
+	"""Record the time spent in the block as lock wait on `bin_names` and `voucher_type`,
+	if enabled in Stock Settings. Bins can also be appended to the yielded list.
+
+	A statement locking several bins counts as a wait on each of them.
+	Deadlocks are counted as well."""
+	bin_names = list(bin_names or [])
+	if not cint(frappe.db.get_single_value("Stock Settings", "record_bin_lock_wait", cache=True)):
+		yield bin_names
+		return
+
+	start = time.monotonic()
+	try:
+		yield bin_names
+	except frappe.QueryDeadlockError:
+		record_bin_lock_wait(voucher_type, bin_names, time.monotonic() - start, deadlock=True)
+		raise
+
+	record_bin_lock_wait(voucher_type, bin_names, time.monotonic() - start)
+
+
+def record_bin_lock_wait(voucher_type, bin_names, seconds, deadlock=False):
+	fields = [f"bin:{bin_name}" for bin_name in bin_names]
+	if voucher_type:
+		fields.append(f"voucher_type:{voucher_type}")
+
+	cache = frappe.cache()
+	pipeline = cache.pipeline()
+	for field in fields:
+		pipeline.hincrby(cache.make_key(f"{BIN_LOCK_WAIT_KEY}:waits"), field, 1)
+		pipeline.hincrbyfloat(cache.make_key(f"{BIN_LOCK_WAIT_KEY}:wait_time"), field, seconds)
+		if deadlock:
+			pipeline.hincrby(cache.make_key(f"{BIN_LOCK_WAIT_KEY}:deadlocks"), field, 1)
+	pipeline.execute()
+
+
+@frappe.whitelist()
+def get_bin_lock_metrics(limit=20):
+	"""Bin lock waits recorded per voucher type and for the `limit` most waited on bins."""
+	frappe.only_for("System Manager")
+
+	cache = frappe.cache()
+	metrics = {}
+	for metric in ("waits", "wait_time", "deadlocks"):
+		values = cache.hgetall(cache.make_key(f"{BIN_LOCK_WAIT_KEY}:{metric}")) or {}
+		metrics[metric] = {frappe.safe_decode(k): flt(frappe.safe_decode(v)) for k, v in values.items()}
+
+	voucher_types, bins = [], []
+	for field, waits in metrics["waits"].items():
+		kind, name = field.split(":", 1)
+		row = frappe._dict(
+			waits=cint(waits),
+			wait_time=metrics["wait_time"].get(field, 0.0),
+			deadlocks=cint(metrics["deadlocks"].get(field)),
+		)
+		row.average_wait_time = row.wait_time / row.waits if row.waits else 0.0
+
+		if kind == "bin":
+			row.bin = name
+			bins.append(row)
+		else:
+			row.voucher_type = name
+			voucher_types.append(row)
+
+	bins = sorted(bins, key=lambda d: d.wait_time, reverse=True)[: cint(limit)]
+	for row in bins:
+		row.item_code, row.warehouse = frappe.db.get_value(
+			"Bin", row.bin, ["item_code", "warehouse"]
+		) or (None, None)
+
+	return {
+		"voucher_types": sorted(voucher_types, key=lambda d: d.wait_time, reverse=True),
+		"bins": bins,
+	}
+
+
+@frappe.whitelist()
+def reset_bin_lock_metrics():
+	frappe.only_for("System Manager")
+
+	cache = frappe.cache()
+	for metric in ("waits", "wait_time", "deadlocks"):
+		cache.delete(cache.make_key(f"{BIN_LOCK_WAIT_KEY}:{metric}"))
+
+
+def get_cached_bin_qty(item_code):
+	"""Actual, projected and reserved qty of `item_code` per warehouse, cached in Redis.
+
+	The cache of an item is cleared on every bin write of the item, and again once the writing
+	transaction commits. Entries also expire after `BIN_QTY_CACHE_TTL` seconds."""
+	key = f"{BIN_QTY_CACHE_KEY}:{item_code}"
+	bin_qty = frappe.cache().get_value(key)
+	if bin_qty is None:
+		bin_qty = {
+			d.warehouse: d
+			for d in frappe.get_all(
+				"Bin",
+				filters={"item_code": item_code},
+				fields=["warehouse", "actual_qty", "projected_qty", "reserved_qty"],
+			)
+		}
+		frappe.cache().set_value(key, bin_qty, expires_in_sec=BIN_QTY_CACHE_TTL)
+
+	return bin_qty
+
+
+def get_cached_bin_qty_of_warehouses(item_code, warehouses):
+	"""Sum of actual, projected and reserved qty of `item_code` in `warehouses`."""
+	bin_qty = get_cached_bin_qty(item_code)
+
+	total = frappe._dict(projected_qty=0.0, actual_qty=0.0, reserved_qty=0.0)
+	for warehouse in warehouses:
+		if warehouse in bin_qty:
+			for field in total:
+				total[field] += flt(bin_qty[warehouse][field])
+
+	return total
+
+
+def clear_bin_qty_cache(item_codes):
+	if isinstance(item_codes, str):
+		item_codes = [item_codes]
+
+	keys = [f"{BIN_QTY_CACHE_KEY}:{item_code}" for item_code in set(item_codes) if item_code]
+	if keys:
+		frappe.cache().delete_value(keys)
+		# concurrent readers may refill the cache with the qty from before the write
+		frappe.db.after_commit.add(lambda: frappe.cache().delete_value(keys))
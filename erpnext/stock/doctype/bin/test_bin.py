@@ -2,10 +2,20 @@
 # See license.txt
 
 import frappe
-from frappe.tests.utils import FrappeTestCase
+from frappe.tests.utils import FrappeTestCase, change_settings
+from frappe.utils import add_days, nowdate
 
+from erpnext.stock.doctype.bin.bin import (
+	get_bin_lock_metrics,
+	get_cached_bin_qty,
+	reset_bin_lock_metrics,
+	update_qty_in_bulk,
+)
 from erpnext.stock.doctype.item.test_item import make_item
-from erpnext.stock.utils import _create_bin
+from erpnext.stock.doctype.stock_entry.stock_entry_utils import make_stock_entry
+from erpnext.stock.get_item_details import get_bin_details
+from erpnext.stock.stock_balance import update_bin_qty
+from erpnext.stock.utils import _create_bin, get_or_make_bin
 
 
 class TestBin(FrappeTestCase):
@@ -32,3 +42,112 @@ class TestBin(FrappeTestCase):
 		indexes = frappe.db.sql("show index from tabBin where Non_unique = 0", as_dict=1)
 		if not any(index.get("Key_name") == "unique_item_warehouse" for index in indexes):
 			self.fail(f"Expected unique index on item-warehouse")
+
+	def test_bulk_update_of_bins(self):
+		warehouse = "_Test Warehouse - _TC"
+		items = [make_item(properties={"is_stock_item": 1}).name for _ in range(3)]
+
+		se = make_stock_entry(
+			item_code=items[0], to_warehouse=warehouse, qty=5, rate=10, do_not_save=True
+		)
+		for item_code in items[1:] + items[:1]:
+			se.append(
+				"items",
+				{
+					"item_code": item_code,
+					"t_warehouse": warehouse,
+					"qty": 2,
+					"basic_rate": 10,
+					"conversion_factor": 1,
+					"uom": "Nos",
+					"stock_uom": "Nos",
+				},
+			)
+		se.submit()
+
+		for item_code, qty in zip(items, (7, 2, 2)):
+			bin_details = frappe.db.get_value(
+				"Bin", {"item_code": item_code, "warehouse": warehouse}, ["actual_qty", "projected_qty"]
+			)
+			self.assertEqual(bin_details, (qty, qty))
+
+		# backdated entry, actual qty is read from the ledger
+		make_stock_entry(
+			item_code=items[1],
+			to_warehouse=warehouse,
+			qty=1,
+			rate=10,
+			posting_date=add_days(nowdate(), -1),
+		)
+		self.assertEqual(
+			frappe.db.get_value("Bin", {"item_code": items[1], "warehouse": warehouse}, "actual_qty"), 3
+		)
+
+		# qty changes to the same bin are summed up
+		bin_name = get_or_make_bin(items[2], warehouse)
+		args = dict(item_code=items[2], warehouse=warehouse, voucher_type="Test", voucher_no="Test")
+		update_qty_in_bulk(
+			[(bin_name, dict(args, ordered_qty=4)), (bin_name, dict(args, ordered_qty=1, reserved_qty=2))]
+		)
+		self.assertEqual(
+			frappe.db.get_value("Bin", bin_name, ["ordered_qty", "reserved_qty", "projected_qty"]),
+			(5, 2, 5),
+		)
+
+	@change_settings("Stock Settings", {"lock_bins_upfront": 1, "record_bin_lock_wait": 1})
+	def test_bin_lock_wait_metrics(self):
+		warehouse = "_Test Warehouse - _TC"
+		item_code = make_item(properties={"is_stock_item": 1}).name
+		make_stock_entry(item_code=item_code, to_warehouse=warehouse, qty=5, rate=10)
+
+		reset_bin_lock_metrics()
+		make_stock_entry(item_code=item_code, to_warehouse=warehouse, qty=5, rate=10)
+
+		metrics = get_bin_lock_metrics()
+		stock_entry = next(d for d in metrics["voucher_types"] if d.voucher_type == "Stock Entry")
+		self.assertGreaterEqual(stock_entry.waits, 3)  # locked up front, posted and bin updated
+
+		bin_name = get_or_make_bin(item_code, warehouse)
+		bin_metrics = next(d for d in metrics["bins"] if d.bin == bin_name)
+		self.assertEqual((bin_metrics.item_code, bin_metrics.warehouse), (item_code, warehouse))
+		self.assertEqual(bin_metrics.waits, stock_entry.waits)
+		self.assertEqual(bin_metrics.deadlocks, 0)
+
+		reset_bin_lock_metrics()
+		self.assertEqual(get_bin_lock_metrics(), {"voucher_types": [], "bins": []})
+
+	def test_bin_item_warehouses_locked_upfront(self):
+		item_code = make_item(properties={"is_stock_item": 1}).name
+		se = make_stock_entry(
+			item_code=item_code,
+			from_warehouse="_Test Warehouse - _TC",
+			to_warehouse="_Test Warehouse 1 - _TC",
+			qty=1,
+			do_not_save=True,
+		)
+		self.assertEqual(
+			se.get_bin_item_warehouses(),
+			{(item_code, "_Test Warehouse - _TC"), (item_code, "_Test Warehouse 1 - _TC")},
+		)
+
+	def test_bin_qty_cache(self):
+		item_code = make_item(properties={"is_stock_item": 1}).name
+		make_stock_entry(item_code=item_code, to_warehouse="_Test Warehouse - _TC", qty=5, rate=10)
+		make_stock_entry(item_code=item_code, to_warehouse="_Test Warehouse 1 - _TC", qty=3, rate=10)
+
+		details = get_bin_details(item_code, "All Warehouses - _TC", "_Test Company", True)
+		self.assertEqual((details["actual_qty"], details["company_total_stock"]), (8, 8))
+		self.assertIsNotNone(frappe.cache().get_value(f"erpnext:bin_qty:{item_code}"))
+
+		# cache is cleared on stock ledger postings and other bin updates
+		make_stock_entry(item_code=item_code, from_warehouse="_Test Warehouse - _TC", qty=2)
+		self.assertEqual(get_cached_bin_qty(item_code)["_Test Warehouse - _TC"].actual_qty, 3)
+
+		update_bin_qty(item_code, "_Test Warehouse - _TC", {"reserved_qty": 1})
+		details = get_bin_details(item_code, "_Test Warehouse - _TC")
+		self.assertEqual((details["projected_qty"], details["reserved_qty"]), (2, 1))
+
+		# refilled by a concurrent reader before the write commits, cleared again on commit
+		get_cached_bin_qty(item_code)
+		frappe.db.after_commit.run()
+		self.assertIsNone(frappe.cache().get_value(f"erpnext:bin_qty:{item_code}"))
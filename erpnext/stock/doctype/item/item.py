@@ -490,7 +490,10 @@ class Item(Document):
 					)
 
 	def delete_old_bins(self, old_name):
+		from erpnext.stock.doctype.bin.bin import clear_bin_qty_cache
+
 		frappe.db.delete("Bin", {"item_code": old_name})
+		clear_bin_qty_cache(old_name)
 
 	def validate_duplicate_item_in_stock_reconciliation(self, old_name, new_name):
 		records = frappe.db.sql(
@@ -1,13 +1,26 @@
 # Copyright (c) 2020, Frappe Technologies Pvt. Ltd. and contributors
 # For license information, please see license.txt
 
+import json
+import time
+
 import frappe
 from frappe import _
 from frappe.exceptions import QueryDeadlockError, QueryTimeoutError
 from frappe.model.document import Document
 from frappe.query_builder import DocType, Interval
 from frappe.query_builder.functions import Now
-from frappe.utils import cint, get_link_to_form, get_weekday, getdate, now, nowtime
+from frappe.utils import (
+	cint,
+	get_datetime,
+	get_link_to_form,
+	get_time,
+	get_weekday,
+	getdate,
+	now,
+	nowtime,
+)
+from frappe.utils.background_jobs import is_job_queued
 from frappe.utils.user import get_users_with_role
 from rq.timeouts import JobTimeoutException
 
@@ -15,12 +28,16 @@ import erpnext
 from erpnext.accounts.utils import get_future_stock_vouchers, repost_gle_for_stock_vouchers
 from erpnext.stock.stock_ledger import (
 	get_affected_transactions,
+	get_independent_item_warehouse_chains,
 	get_items_to_be_repost,
 	repost_future_sle,
 )
 
 RecoverableErrors = (JobTimeoutException, QueryDeadlockError, QueryTimeoutError)
 
+# Number of item-warehouses listed in Slowest Item-Warehouses
+SLOWEST_ITEM_WAREHOUSES = 10
+
 
 class RepostItemValuation(Document):
 	@staticmethod
@@ -123,7 +140,26 @@ class RepostItemValuation(Document):
 		self.distinct_item_and_warehouse = None
 		self.items_to_be_repost = None
 		self.gl_reposting_index = 0
+		self.reposting_components = []
+		self.components_completed = 0
+		self.reset_metrics()
 		self.db_update()
+		frappe.db.delete(
+			"Repost Item Valuation Component", {"parent": self.name, "parenttype": self.doctype}
+		)
+
+	def reset_metrics(self):
+		self.reposting_started_on = None
+		self.slowest_item_warehouses = None
+		for field in (
+			"sles_processed",
+			"sl_reposting_time",
+			"queries_issued",
+			"gl_vouchers_reposted",
+			"gl_entries_reposted",
+			"gl_reposting_time",
+		):
+			self.set(field, 0)
 
 	def deduplicate_similar_repost(self):
 		"""Deduplicate similar reposts based on item-warehouse-posting combination."""
@@ -167,11 +203,25 @@ def repost(doc):
 		frappe.db.MAX_WRITES_PER_TRANSACTION *= 4
 
 		doc.set_status("In Progress")
+		if not doc.reposting_started_on:
+			doc.db_set("reposting_started_on", now())
 		if not frappe.flags.in_test:
 			frappe.db.commit()
 
-		repost_sl_entries(doc)
-		repost_gl_entries(doc)
+		if not repost_sl_entries(doc):
+			# independent chains are still being reposted in background jobs,
+			# the job which claims their completion continues with the GL reposting.
+			return
+
+		start, query_count = time.monotonic(), get_query_count()
+		stats = repost_gl_entries(doc)
+		update_reposting_metrics(
+			doc.name,
+			gl_reposting_time=time.monotonic() - start,
+			queries_issued=get_query_count() - query_count,
+			gl_vouchers_reposted=stats.vouchers_reposted if stats else 0,
+			gl_entries_reposted=stats.gl_entries if stats else 0,
+		)
 
 		doc.set_status("Completed")
 
@@ -190,7 +240,10 @@ def repost(doc):
 			message += "<br>" + "Traceback: <br>" + traceback
 		frappe.db.set_value(doc.doctype, doc.name, "error_log", message)
 
-		if not isinstance(e, RecoverableErrors):
+		if isinstance(e, RecoverableErrors):
+			# let the next run claim the completion of reposting components again
+			frappe.db.set_value(doc.doctype, doc.name, "components_completed", 0, update_modified=False)
+		else:
 			notify_error_to_stock_managers(doc, message)
 			doc.set_status("Failed")
 	finally:
@@ -199,6 +252,17 @@ def repost(doc):
 
 
 def repost_sl_entries(doc):
+	"""Repost stock ledger entries, returns False while reposting continues in background jobs."""
+	if (
+		not doc.get("reposting_components")
+		and not doc.current_index
+		and frappe.db.get_single_value("Stock Reposting Settings", "parallel_reposting")
+	):
+		make_reposting_components(doc)
+
+	if doc.get("reposting_components"):
+		return repost_components(doc) and claim_components_completion(doc.name)
+
 	if doc.based_on == "Transaction":
 		repost_future_sle(
 			voucher_type=doc.voucher_type,
@@ -209,30 +273,195 @@ def repost_sl_entries(doc):
 		)
 	else:
 		repost_future_sle(
-			args=[
-				frappe._dict(
-					{
-						"item_code": doc.item_code,
-						"warehouse": doc.warehouse,
-						"posting_date": doc.posting_date,
-						"posting_time": doc.posting_time,
-					}
-				)
-			],
+			args=get_item_and_warehouse_args(doc),
 			allow_negative_stock=doc.allow_negative_stock,
 			via_landed_cost_voucher=doc.via_landed_cost_voucher,
 			doc=doc,
 		)
 
+	return True
+
+
+def get_item_and_warehouse_args(doc):
+	return [
+		frappe._dict(
+			{
+				"item_code": doc.item_code,
+				"warehouse": doc.warehouse,
+				"posting_date": doc.posting_date,
+				"posting_time": doc.posting_time,
+			}
+		)
+	]
+
+
+def make_reposting_components(doc):
+	"""Split reposting into chains of item-warehouses which do not depend on each other."""
+	if doc.based_on == "Transaction":
+		args = get_items_to_be_repost(doc.voucher_type, doc.voucher_no, doc=doc)
+	else:
+		args = get_item_and_warehouse_args(doc)
+
+	chains = get_independent_item_warehouse_chains(args)
+	if len(chains) < 2:
+		return
+
+	for chain in chains:
+		row = doc.append(
+			"reposting_components",
+			{"status": "Queued", "current_index": 0, "items_to_be_repost": json.dumps(chain, default=str)},
+		)
+		row.docstatus = doc.docstatus
+		row.db_insert()
+
+	if not frappe.flags.in_test:
+		frappe.db.commit()
+
+
+def repost_components(doc):
+	"""Enqueue a background job per pending component, returns True if all of them are completed."""
+	for row in doc.reposting_components:
+		if row.status == "Completed":
+			continue
+
+		job_name = f"repost_item_valuation_component::{row.name}"
+		if is_job_queued(job_name, queue="long"):
+			continue
+
+		frappe.enqueue(
+			repost_component,
+			queue="long",
+			timeout=7200,
+			job_name=job_name,
+			repost_item_valuation=doc.name,
+			component=row.name,
+			continue_repost=not frappe.flags.in_test,
+			now=frappe.flags.in_test,
+		)
+
+	return are_all_components_completed(doc.name)
+
+
+def repost_component(repost_item_valuation, component, continue_repost=True):
+	"""Repost one chain of item-warehouses of a Repost Item Valuation."""
+	doc = frappe.get_doc("Repost Item Valuation", repost_item_valuation)
+	rows = doc.get("reposting_components", {"name": component})
+	if not rows or rows[0].status == "Completed" or doc.status not in ("Queued", "In Progress"):
+		return
+
+	row = rows[0]
+
+	try:
+		row.db_set("status", "In Progress")
+		if not frappe.flags.in_test:
+			frappe.db.commit()
+
+		repost_future_sle(
+			allow_negative_stock=doc.allow_negative_stock,
+			via_landed_cost_voucher=doc.via_landed_cost_voucher,
+			doc=row,
+		)
+		row.db_set("status", "Completed")
+
+	except Exception as e:
+		if frappe.flags.in_test:
+			raise
+
+		frappe.db.rollback()
+		message = frappe.message_log.pop() if frappe.message_log else ""
+		message += "<br>" + "Traceback: <br>" + frappe.get_traceback()
+		doc.log_error("Unable to repost item valuation")
+		frappe.db.set_value(doc.doctype, doc.name, "error_log", message)
+
+		if isinstance(e, RecoverableErrors):
+			row.db_set("status", "Queued")
+		else:
+			row.db_set("status", "Failed")
+			notify_error_to_stock_managers(doc, message)
+			doc.set_status("Failed")
+
+		frappe.db.commit()
+		return
+
+	frappe.db.commit()
+
+	if continue_repost:
+		continue_repost_after_components(repost_item_valuation)
+
+
+def continue_repost_after_components(repost_item_valuation):
+	"""Continue with GL reposting once all components are reposted."""
+	doc = frappe.get_doc("Repost Item Valuation", repost_item_valuation)
+	if doc.status == "In Progress" and are_all_components_completed(repost_item_valuation):
+		# `repost` only continues if this job wins the claim of the completion
+		repost(doc)
+		if doc.status != "Completed":
+			return
+
+		doc.deduplicate_similar_repost()
+		coalesce_queued_reposts(doc)
+		if not frappe.flags.in_test:
+			# continue with the queued reposts instead of waiting for the scheduler
+			execute_repost_item_valuation()
+
+
+def claim_components_completion(repost_item_valuation):
+	"""Mark all components as reposted, returns True only for the one job which gets to continue.
+
+	Components finishing concurrently and the scheduled `repost_entries` may all find every
+	component completed. The row is locked until the claim is committed, the others wait for
+	it and then find the completion already claimed."""
+	status, components_completed = frappe.db.get_value(
+		"Repost Item Valuation",
+		repost_item_valuation,
+		["status", "components_completed"],
+		for_update=True,
+	)
+	if status != "In Progress" or cint(components_completed):
+		return False
+
+	frappe.db.set_value(
+		"Repost Item Valuation",
+		repost_item_valuation,
+		"components_completed",
+		1,
+		update_modified=False,
+	)
+	return True
+
+
+def are_all_components_completed(repost_item_valuation):
+	statuses = frappe.get_all(
+		"Repost Item Valuation Component",
+		filters={"parent": repost_item_valuation, "parenttype": "Repost Item Valuation"},
+		pluck="status",
+	)
+	return all(status == "Completed" for status in statuses)
+
 
 def repost_gl_entries(doc):
 	if not cint(erpnext.is_perpetual_inventory_enabled(doc.company)):
 		return
 
-	# directly modified transactions
-	directly_dependent_transactions = _get_directly_dependent_vouchers(doc)
-	repost_affected_transaction = get_affected_transactions(doc)
-	repost_gle_for_stock_vouchers(
+	if frappe.db.get_single_value("Stock Reposting Settings", "incremental_gl_reposting"):
+		# only transactions whose stock value difference changed while reposting
+		fieldname = "changed_transactions"
+		directly_dependent_transactions = []
+		if doc.based_on == "Transaction":
+			directly_dependent_transactions.append((doc.voucher_type, doc.voucher_no))
+	else:
+		# directly modified transactions
+		fieldname = "affected_transactions"
+		directly_dependent_transactions = _get_directly_dependent_vouchers(doc)
+
+	repost_affected_transaction = get_affected_transactions(doc, fieldname)
+	for component in frappe.get_all(
+		"Repost Item Valuation Component",
+		filters={"parent": doc.name, "parenttype": doc.doctype},
+		fields=[fieldname],
+	):
+		repost_affected_transaction.update(get_affected_transactions(component, fieldname))
+	return repost_gle_for_stock_vouchers(
 		directly_dependent_transactions + list(repost_affected_transaction),
 		doc.posting_date,
 		doc.company,
@@ -306,7 +535,13 @@ def repost_entries():
 		doc = frappe.get_doc("Repost Item Valuation", row.name)
 		if doc.status in ("Queued", "In Progress"):
 			repost(doc)
+			if not are_all_components_completed(doc.name):
+				# components are still being reposted in background jobs, later reposts
+				# may touch the same item-warehouses and have to wait for them.
+				break
+
 			doc.deduplicate_similar_repost()
+			coalesce_queued_reposts(doc)
 
 	riv_entries = get_repost_item_valuation_entries()
 	if riv_entries:
@@ -324,6 +559,86 @@ def get_repost_item_valuation_entries():
 	)
 
 
+def coalesce_queued_reposts(doc):
+	"""Remove item-warehouses already reposted by `doc` from the reposts queued before it started.
+
+	An item-warehouse reposted from an earlier or the same posting datetime doesn't need to be
+	replayed again, so each chain is reposted once per run. Item and Warehouse based reposts
+	left with nothing to repost are skipped, Transaction based ones still repost the GL entries
+	of their voucher.
+	"""
+	if doc.status != "Completed" or not doc.reposting_started_on:
+		return
+
+	reposted = get_reposted_item_warehouses(doc)
+	if not reposted:
+		return
+
+	queued_reposts = frappe.get_all(
+		"Repost Item Valuation",
+		filters={
+			"status": "Queued",
+			"docstatus": 1,
+			"current_index": 0,
+			"name": ("!=", doc.name),
+			# ledger entries posted after the repost started may not have been replayed
+			"creation": ("<", doc.reposting_started_on),
+		},
+		fields=[
+			"name",
+			"based_on",
+			"item_code",
+			"warehouse",
+			"posting_date",
+			"posting_time",
+			"voucher_type",
+			"voucher_no",
+			"items_to_be_repost",
+		],
+	)
+
+	for queued in queued_reposts:
+		if queued.based_on == "Transaction":
+			args = get_items_to_be_repost(queued.voucher_type, queued.voucher_no, doc=queued)
+		else:
+			args = get_item_and_warehouse_args(queued)
+
+		pending = [d for d in args if not is_item_warehouse_reposted(d, reposted)]
+		if not args or len(pending) == len(args):
+			continue
+
+		if pending:
+			values = {"items_to_be_repost": json.dumps(pending, default=str)}
+		elif queued.based_on == "Transaction":
+			values = {"items_to_be_repost": json.dumps(args, default=str), "current_index": len(args)}
+		else:
+			values = {"status": "Skipped"}
+
+		frappe.db.set_value("Repost Item Valuation", queued.name, values, update_modified=False)
+
+
+def get_reposted_item_warehouses(doc):
+	"""Earliest posting datetime each item-warehouse was reposted from by `doc`."""
+	reposted = {}
+	for progress in [doc, *doc.get("reposting_components", [])]:
+		for args in json.loads(progress.items_to_be_repost or "[]"):
+			key = (args["item_code"], args["warehouse"])
+			timestamp = get_posting_timestamp(args)
+			if key not in reposted or timestamp < reposted[key]:
+				reposted[key] = timestamp
+
+	return reposted
+
+
+def is_item_warehouse_reposted(args, reposted):
+	timestamp = reposted.get((args.get("item_code"), args.get("warehouse")))
+	return timestamp is not None and timestamp <= get_posting_timestamp(args)
+
+
+def get_posting_timestamp(args):
+	return get_datetime(f"{getdate(args.get('posting_date'))} {get_time(args.get('posting_time'))}")
+
+
 def in_configured_timeslot(repost_settings=None, current_time=None):
 	"""Check if current time is in configured timeslot for reposting."""
 
@@ -347,6 +662,107 @@ def in_configured_timeslot(repost_settings=None, current_time=None):
 		return now_time >= start_time or now_time <= end_time
 
 
+def get_query_count():
+	"""Number of statements executed by the current database session, only available on MariaDB."""
+	if frappe.db.db_type != "mariadb":
+		return 0
+
+	return cint(frappe.db.sql("show session status like 'Questions'")[0][1])
+
+
+def update_reposting_metrics(repost_item_valuation, **increments):
+	"""Add to the counters of a Repost Item Valuation.
+
+	Counters are incremented in the database, as parallel reposting jobs update them concurrently."""
+	riv = frappe.qb.DocType("Repost Item Valuation")
+	query = frappe.qb.update(riv).where(riv.name == repost_item_valuation)
+	for field, value in increments.items():
+		query = query.set(riv[field], riv[field] + value)
+
+	query.run()
+
+
+def record_item_warehouse_metrics(repost_item_valuation, timings):
+	"""Keep track of the item-warehouses which took the longest to repost.
+
+	`timings` maps (item_code, warehouse) to the (sles, seconds) taken by one reposting job.
+	They are merged once per job, under a row lock, as parallel jobs record them concurrently."""
+	slowest = {
+		(row["item_code"], row["warehouse"]): row
+		for row in json.loads(
+			frappe.db.get_value(
+				"Repost Item Valuation",
+				repost_item_valuation,
+				"slowest_item_warehouses",
+				for_update=True,
+			)
+			or "[]"
+		)
+	}
+
+	for (item_code, warehouse), (sles, seconds) in timings.items():
+		row = slowest.setdefault(
+			(item_code, warehouse),
+			{"item_code": item_code, "warehouse": warehouse, "sles": 0, "seconds": 0},
+		)
+		row["sles"] += sles
+		row["seconds"] = round(row["seconds"] + seconds, 3)
+
+	slowest = sorted(slowest.values(), key=lambda row: row["seconds"], reverse=True)
+	slowest = slowest[:SLOWEST_ITEM_WAREHOUSES]
+	frappe.db.set_value(
+		"Repost Item Valuation",
+		repost_item_valuation,
+		"slowest_item_warehouses",
+		json.dumps(slowest, indent=1),
+		update_modified=False,
+	)
+
+
+@frappe.whitelist()
+def get_reposting_metrics(name):
+	"""Progress, throughput and estimated time to complete stock ledger reposting."""
+	frappe.has_permission("Repost Item Valuation", "read", name, throw=True)
+	doc = frappe.get_doc("Repost Item Valuation", name)
+
+	reposted, to_repost, affected_transactions = 0, 0, set()
+	for progress in [doc, *doc.reposting_components]:
+		reposted += cint(progress.current_index)
+		to_repost += len(json.loads(progress.items_to_be_repost or "[]"))
+		affected_transactions.update(get_affected_transactions(progress))
+
+	if doc.status == "Completed":
+		reposted = to_repost = max(reposted, to_repost)
+
+	# item-warehouses found while reposting are added to the ones to repost,
+	# the estimate is based on the average time taken per item-warehouse so far.
+	eta = None
+	if doc.status in ("Queued", "In Progress") and reposted and to_repost > reposted:
+		eta = doc.sl_reposting_time / reposted * (to_repost - reposted)
+
+	sles_per_second = 0
+	if doc.sl_reposting_time:
+		sles_per_second = round(doc.sles_processed / doc.sl_reposting_time, 2)
+
+	return {
+		"status": doc.status,
+		"reposting_started_on": doc.reposting_started_on,
+		"item_warehouses_reposted": reposted,
+		"item_warehouses_to_repost": to_repost,
+		"sles_processed": doc.sles_processed,
+		"sles_per_second": sles_per_second,
+		"vouchers_affected": len(affected_transactions),
+		"gl_reposting_index": doc.gl_reposting_index,
+		"gl_vouchers_reposted": doc.gl_vouchers_reposted,
+		"gl_entries_reposted": doc.gl_entries_reposted,
+		"sl_reposting_time": doc.sl_reposting_time,
+		"gl_reposting_time": doc.gl_reposting_time,
+		"queries_issued": doc.queries_issued,
+		"estimated_seconds_to_complete_sl_reposting": eta,
+		"slowest_item_warehouses": json.loads(doc.slowest_item_warehouses or "[]"),
+	}
+
+
 @frappe.whitelist()
 def execute_repost_item_valuation():
 	"""Execute repost item valuation via scheduler."""
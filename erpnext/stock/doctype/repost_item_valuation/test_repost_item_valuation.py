@@ -5,7 +5,7 @@
 from unittest.mock import MagicMock, call
 
 import frappe
-from frappe.tests.utils import FrappeTestCase
+from frappe.tests.utils import FrappeTestCase, change_settings
 from frappe.utils import add_days, add_to_date, now, nowdate, today
 
 from erpnext.accounts.doctype.sales_invoice.test_sales_invoice import create_sales_invoice
@@ -14,9 +14,13 @@ from erpnext.controllers.stock_controller import create_item_wise_repost_entries
 from erpnext.stock.doctype.item.test_item import make_item
 from erpnext.stock.doctype.purchase_receipt.test_purchase_receipt import make_purchase_receipt
 from erpnext.stock.doctype.repost_item_valuation.repost_item_valuation import (
+	claim_components_completion,
+	get_reposting_metrics,
 	in_configured_timeslot,
+	repost_entries,
 )
 from erpnext.stock.doctype.stock_entry.stock_entry_utils import make_stock_entry
+from erpnext.stock.stock_ledger import get_affected_transactions
 from erpnext.stock.tests.test_utils import StockTestMixin
 from erpnext.stock.utils import PendingRepostingError
 
@@ -376,3 +380,164 @@ class TestRepostItemValuation(FrappeTestCase, StockTestMixin):
 
 		accounts_settings.acc_frozen_upto = ""
 		accounts_settings.save()
+
+	@change_settings("Stock Reposting Settings", {"parallel_reposting": 1})
+	def test_parallel_reposting_of_independent_items(self):
+		items = [self.make_item(properties={"is_stock_item": 1}).name for _ in range(2)]
+		warehouse = "_Test Warehouse - _TC"
+
+		for item in items:
+			make_stock_entry(item_code=item, to_warehouse=warehouse, qty=10, rate=100)
+
+		se = make_stock_entry(
+			item_code=items[0],
+			to_warehouse=warehouse,
+			qty=5,
+			rate=10,
+			posting_date=add_days(today(), -1),
+			do_not_save=True,
+		)
+		row = se.items[0].as_dict()
+		row.update({"name": None, "idx": None, "item_code": items[1]})
+		se.append("items", row)
+		se.save()
+		se.submit()
+
+		riv = frappe.get_doc("Repost Item Valuation", {"voucher_no": se.name})
+		self.assertEqual(riv.status, "Completed")
+		self.assertEqual(len(riv.reposting_components), 2)
+		self.assertTrue(all(row.status == "Completed" for row in riv.reposting_components))
+
+		for item in items:
+			stock_value = frappe.db.get_value(
+				"Stock Ledger Entry",
+				{"item_code": item, "warehouse": warehouse, "is_cancelled": 0, "posting_date": today()},
+				"stock_value",
+			)
+			self.assertEqual(stock_value, 1050)
+
+		# only one job gets to continue with GL reposting after the components
+		self.assertTrue(riv.components_completed)
+		riv.db_set({"status": "In Progress", "components_completed": 0})
+		self.assertTrue(claim_components_completion(riv.name))
+		self.assertFalse(claim_components_completion(riv.name))
+
+	def test_reposting_metrics(self):
+		item = self.make_item(properties={"is_stock_item": 1}).name
+		warehouse = "_Test Warehouse - _TC"
+
+		make_stock_entry(item_code=item, to_warehouse=warehouse, qty=10, rate=100)
+		make_stock_entry(item_code=item, from_warehouse=warehouse, qty=5)
+		se = make_stock_entry(
+			item_code=item, to_warehouse=warehouse, qty=5, rate=50, posting_date=add_days(today(), -1)
+		)
+
+		riv = frappe.get_doc("Repost Item Valuation", {"voucher_no": se.name})
+		self.assertTrue(riv.reposting_started_on)
+		self.assertEqual(riv.sles_processed, 3)
+
+		metrics = get_reposting_metrics(riv.name)
+		self.assertEqual(metrics["status"], "Completed")
+		self.assertEqual(metrics["item_warehouses_reposted"], metrics["item_warehouses_to_repost"])
+		self.assertEqual(metrics["sles_processed"], 3)
+		self.assertGreaterEqual(metrics["vouchers_affected"], 2)
+		self.assertIsNone(metrics["estimated_seconds_to_complete_sl_reposting"])
+		self.assertEqual(metrics["slowest_item_warehouses"][0]["item_code"], item)
+
+		riv.restart_reposting()
+		riv.reload()
+		self.assertEqual(riv.sles_processed, 0)
+		self.assertFalse(riv.reposting_started_on)
+
+	def test_coalescing_of_queued_reposts(self):
+		item = self.make_item(properties={"is_stock_item": 1}).name
+		warehouse = "_Test Warehouse - _TC"
+
+		receipt = make_stock_entry(item_code=item, to_warehouse=warehouse, qty=10, rate=100)
+
+		frappe.flags.dont_execute_stock_reposts = True
+		first = make_stock_entry(
+			item_code=item, to_warehouse=warehouse, qty=5, rate=10, posting_date=add_days(today(), -2)
+		)
+		second = make_stock_entry(
+			item_code=item, to_warehouse=warehouse, qty=5, rate=20, posting_date=add_days(today(), -1)
+		)
+		item_wh_riv = frappe.get_doc(
+			doctype="Repost Item Valuation",
+			based_on="Item and Warehouse",
+			item_code=item,
+			warehouse=warehouse,
+			posting_date=add_days(today(), -1),
+			posting_time="00:00:00",
+		).submit()
+		other_wh_riv = frappe.get_doc(
+			doctype="Repost Item Valuation",
+			based_on="Item and Warehouse",
+			item_code=item,
+			warehouse="Stores - _TC",
+			posting_date=add_days(today(), -1),
+			posting_time="00:00:00",
+		).submit()
+		frappe.flags.dont_execute_stock_reposts = False
+
+		repost_entries()
+
+		first_riv = frappe.get_doc("Repost Item Valuation", {"voucher_no": first.name})
+		self.assertEqual(first_riv.status, "Completed")
+		self.assertEqual(first_riv.sles_processed, 3)
+
+		# same item-warehouse was already reposted from an earlier date
+		second_riv = frappe.get_doc("Repost Item Valuation", {"voucher_no": second.name})
+		self.assertEqual(second_riv.status, "Completed")
+		self.assertEqual(second_riv.sles_processed, 0)
+		self.assertEqual(second_riv.current_index, 1)
+
+		item_wh_riv.reload()
+		self.assertEqual(item_wh_riv.status, "Skipped")
+		other_wh_riv.reload()
+		self.assertEqual(other_wh_riv.status, "Completed")
+
+		stock_value = frappe.db.get_value(
+			"Stock Ledger Entry", {"voucher_no": receipt.name, "is_cancelled": 0}, "stock_value"
+		)
+		self.assertEqual(stock_value, 1150)
+
+	@change_settings("Stock Reposting Settings", {"incremental_gl_reposting": 1})
+	def test_incremental_gl_reposting(self):
+		item = self.make_item(properties={"is_stock_item": 1, "valuation_method": "FIFO"}).name
+		company = "_Test Company with perpetual inventory"
+		warehouse = "Stores - TCP1"
+
+		receipt = make_stock_entry(
+			item_code=item,
+			company=company,
+			qty=10,
+			rate=10,
+			target=warehouse,
+			posting_date=add_days(today(), -2),
+		)
+		consumption = make_stock_entry(item_code=item, company=company, qty=1, source=warehouse)
+
+		backdated_receipt = make_stock_entry(
+			item_code=item,
+			company=company,
+			qty=1,
+			rate=50,
+			target=warehouse,
+			posting_date=add_days(today(), -3),
+		)
+
+		riv = frappe.get_doc("Repost Item Valuation", {"voucher_no": backdated_receipt.name})
+		self.assertEqual(riv.status, "Completed")
+
+		# only the consumption's stock value difference changed
+		changed = get_affected_transactions(riv, "changed_transactions")
+		self.assertEqual(changed, {(consumption.doctype, consumption.name)})
+		self.assertNotIn((receipt.doctype, receipt.name), changed)
+		self.assertEqual(riv.gl_vouchers_reposted, 1)
+
+		self.assertGLEs(
+			consumption,
+			[{"credit": 50, "debit": 0}],
+			gle_filters={"account": "Stock In Hand - TCP1"},
+		)
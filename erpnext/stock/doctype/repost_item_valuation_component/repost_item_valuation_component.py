@@ -0,0 +1,9 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+
+from frappe.model.document import Document
+
+
+class RepostItemValuationComponent(Document):
+	pass
@@ -8,6 +8,7 @@ from typing import List, Optional, Union
 import frappe
 from frappe import ValidationError, _
 from frappe.model.naming import make_autoname
+from frappe.query_builder import Order
 from frappe.query_builder.functions import Coalesce
 from frappe.utils import (
 	add_days,
@@ -206,55 +207,47 @@ class SerialNo(StockController):
 		if not serial_no:
 			serial_no = self.name
 
-		for sle in frappe.db.sql(
-			"""
-			SELECT voucher_type, voucher_no,
-				posting_date, posting_time, incoming_rate, actual_qty, serial_no
-			FROM
-				`tabStock Ledger Entry`
-			WHERE
-				item_code=%s AND company = %s
-				AND is_cancelled = 0
-				AND (serial_no = %s
-					OR serial_no like %s
-					OR serial_no like %s
-					OR serial_no like %s
-				)
-			ORDER BY
-				posting_date desc, posting_time desc, creation desc""",
-			(
-				self.item_code,
-				self.company,
-				serial_no,
-				serial_no + "\n%",
-				"%\n" + serial_no,
-				"%\n" + serial_no + "\n%",
-			),
-			as_dict=1,
-		):
-			if serial_no.upper() in get_serial_nos(sle.serial_no):
-				if cint(sle.actual_qty) > 0:
-					sle_dict.setdefault("incoming", []).append(sle)
-				else:
-					sle_dict.setdefault("outgoing", []).append(sle)
+		sle = frappe.qb.DocType("Stock Ledger Entry")
+		snle = frappe.qb.DocType("Serial No Ledger Entry")
+		for sle in (
+			frappe.qb.from_(snle)
+			.inner_join(sle)
+			.on(sle.name == snle.stock_ledger_entry)
+			.select(
+				sle.voucher_type,
+				sle.voucher_no,
+				sle.posting_date,
+				sle.posting_time,
+				sle.incoming_rate,
+				sle.actual_qty,
+				sle.serial_no,
+			)
+			.where(
+				(snle.serial_no == serial_no)
+				& (snle.item_code == self.item_code)
+				& (snle.company == self.company)
+				& (snle.is_cancelled == 0)
+			)
+			.orderby(sle.posting_date, sle.posting_time, sle.creation, order=Order.desc)
+		).run(as_dict=True):
+			if cint(sle.actual_qty) > 0:
+				sle_dict.setdefault("incoming", []).append(sle)
+			else:
+				sle_dict.setdefault("outgoing", []).append(sle)
 
 		return sle_dict
 
 	def on_trash(self):
-		sl_entries = frappe.db.sql(
-			"""select serial_no from `tabStock Ledger Entry`
-			where serial_no like %s and item_code=%s and is_cancelled=0""",
-			("%%%s%%" % self.name, self.item_code),
-			as_dict=True,
+		sle_exists = frappe.db.exists(
+			"Serial No Ledger Entry",
+			{
+				"serial_no": self.name,
+				"item_code": self.item_code,
+				"stock_ledger_entry": ("is", "set"),
+				"is_cancelled": 0,
+			},
 		)
 
-		# Find the exact match
-		sle_exists = False
-		for d in sl_entries:
-			if self.name.upper() in get_serial_nos(d.serial_no):
-				sle_exists = True
-				break
-
 		if sle_exists:
 			frappe.throw(
 				_("Cannot delete Serial No {0}, as it is used in stock transactions").format(self.name)
@@ -827,32 +820,25 @@ def get_pos_reserved_serial_nos(filters):
 	if isinstance(filters, str):
 		filters = json.loads(filters)
 
-	POSInvoice = frappe.qb.DocType("POS Invoice")
-	POSInvoiceItem = frappe.qb.DocType("POS Invoice Item")
+	snle = frappe.qb.DocType("Serial No Ledger Entry")
 	query = (
-		frappe.qb.from_(POSInvoice)
-		.from_(POSInvoiceItem)
-		.select(POSInvoice.is_return, POSInvoiceItem.serial_no)
+		frappe.qb.from_(snle)
+		.select(snle.serial_no, snle.actual_qty)
 		.where(
-			(POSInvoice.name == POSInvoiceItem.parent)
-			& (POSInvoice.docstatus == 1)
-			& (POSInvoiceItem.docstatus == 1)
-			& (POSInvoiceItem.item_code == filters.get("item_code"))
-			& (POSInvoiceItem.warehouse == filters.get("warehouse"))
-			& (POSInvoiceItem.serial_no.isnotnull())
-			& (POSInvoiceItem.serial_no != "")
+			(snle.item_code == filters.get("item_code"))
+			& (snle.warehouse == filters.get("warehouse"))
+			& (snle.voucher_type == "POS Invoice")
+			& (snle.is_cancelled == 0)
 		)
 	)
 
-	pos_transacted_sr_nos = query.run(as_dict=True)
-
 	reserved_sr_nos = set()
 	returned_sr_nos = set()
-	for d in pos_transacted_sr_nos:
-		if d.is_return == 0:
-			[reserved_sr_nos.add(x) for x in get_serial_nos(d.serial_no)]
-		elif d.is_return == 1:
-			[returned_sr_nos.add(x) for x in get_serial_nos(d.serial_no)]
+	for d in query.run(as_dict=True):
+		if d.actual_qty < 0:
+			reserved_sr_nos.add(d.serial_no)
+		else:
+			returned_sr_nos.add(d.serial_no)
 
 	reserved_sr_nos = list(reserved_sr_nos - returned_sr_nos)
 
@@ -7,6 +7,7 @@
 
 import frappe
 from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days
 
 from erpnext.stock.doctype.delivery_note.test_delivery_note import create_delivery_note
 from erpnext.stock.doctype.item.test_item import make_item
@@ -209,6 +210,39 @@ class TestSerialNo(FrappeTestCase):
 		self.assertEqual(sn_doc.warehouse, "_Test Warehouse - _TC")
 		self.assertEqual(sn_doc.purchase_document_no, se.name)
 
+	def test_incoming_rate_of_serial_no_transferred_to_other_company(self):
+		se = make_serialized_item(target_warehouse="_Test Warehouse - _TC")
+		serial_nos = get_serial_nos(se.get("items")[0].serial_no)
+		dn = create_delivery_note(
+			item_code="_Test Serialized Item With Series", qty=1, serial_no=serial_nos[0]
+		)
+
+		wh = create_warehouse("_Test Warehouse", company="_Test Company 1")
+		make_purchase_receipt(
+			item_code="_Test Serialized Item With Series",
+			qty=1,
+			rate=5000,
+			serial_no=serial_nos[0],
+			company="_Test Company 1",
+			warehouse=wh,
+		)
+
+		# backdated receipt reposts the delivery, its serial no belongs to the other company now
+		make_stock_entry(
+			item_code="_Test Serialized Item With Series",
+			target="_Test Warehouse - _TC",
+			qty=1,
+			basic_rate=300,
+			posting_date=add_days(se.posting_date, -1),
+		)
+
+		filters = {"voucher_type": "Stock Entry", "voucher_no": se.name, "is_cancelled": 0}
+		incoming_rate = frappe.db.get_value("Stock Ledger Entry", filters, "incoming_rate")
+		filters.update(voucher_type="Delivery Note", voucher_no=dn.name)
+		self.assertEqual(
+			frappe.db.get_value("Stock Ledger Entry", filters, "stock_value_difference"), -incoming_rate
+		)
+
 	def test_auto_creation_of_serial_no(self):
 		"""
 		Test if auto created Serial No excludes existing serial numbers
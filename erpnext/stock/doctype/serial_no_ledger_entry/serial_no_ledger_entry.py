@@ -0,0 +1,192 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.query_builder.functions import IfNull
+from frappe.utils import flt, now
+
+FIELDS = [
+	"serial_no",
+	"item_code",
+	"warehouse",
+	"company",
+	"actual_qty",
+	"voucher_type",
+	"voucher_no",
+	"voucher_detail_no",
+	"stock_ledger_entry",
+	"posting_date",
+	"posting_time",
+]
+
+
+class SerialNoLedgerEntry(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Serial No Ledger Entry", ["item_code", "warehouse"], "item_warehouse")
+	frappe.db.add_index("Serial No Ledger Entry", ["voucher_type", "voucher_no"], "voucher")
+
+
+def make_serial_no_ledger_entries(sle):
+	"""Link each serial no of a submitted Stock Ledger Entry to it."""
+	if not sle.serial_no or sle.is_cancelled:
+		# entries reversing a cancelled voucher, its serial nos are marked as cancelled already
+		return
+
+	insert_serial_no_ledger_entries(get_entries_for_sle(sle))
+
+
+def make_pos_serial_no_ledger_entries(doc):
+	"""Link serial nos reserved (or returned) by a POS Invoice, which has no stock ledger entries."""
+	insert_serial_no_ledger_entries(get_entries_for_pos_invoice(doc, doc.get("items")))
+
+
+def get_entries_for_sle(sle):
+	from erpnext.stock.doctype.serial_no.serial_no import get_serial_nos
+
+	return [
+		frappe._dict(
+			serial_no=serial_no,
+			item_code=sle.item_code,
+			warehouse=sle.warehouse,
+			company=sle.company,
+			actual_qty=1 if flt(sle.actual_qty) > 0 else -1,
+			voucher_type=sle.voucher_type,
+			voucher_no=sle.voucher_no,
+			voucher_detail_no=sle.voucher_detail_no,
+			stock_ledger_entry=sle.name,
+			posting_date=sle.posting_date,
+			posting_time=sle.posting_time,
+			creation=sle.creation,
+		)
+		for serial_no in get_serial_nos(sle.serial_no)
+	]
+
+
+def get_entries_for_pos_invoice(doc, items):
+	from erpnext.stock.doctype.serial_no.serial_no import get_serial_nos
+
+	return [
+		frappe._dict(
+			serial_no=serial_no,
+			item_code=d.item_code,
+			warehouse=d.warehouse,
+			company=doc.company,
+			actual_qty=1 if doc.is_return else -1,
+			voucher_type="POS Invoice",
+			voucher_no=doc.name,
+			voucher_detail_no=d.name,
+			posting_date=doc.posting_date,
+			posting_time=doc.posting_time,
+		)
+		for d in items
+		if d.serial_no
+		for serial_no in get_serial_nos(d.serial_no)
+	]
+
+
+def cancel_serial_no_ledger_entries(voucher_type, voucher_no):
+	snle = frappe.qb.DocType("Serial No Ledger Entry")
+	(
+		frappe.qb.update(snle)
+		.set(snle.is_cancelled, 1)
+		.set(snle.modified, now())
+		.set(snle.modified_by, frappe.session.user)
+		.where(
+			(snle.voucher_type == voucher_type)
+			& (snle.voucher_no == voucher_no)
+			& (snle.is_cancelled == 0)
+		)
+	).run()
+
+
+def insert_serial_no_ledger_entries(rows):
+	if not rows:
+		return
+
+	fields = ["name", "creation", "modified", "owner", "modified_by", "docstatus", "is_cancelled"]
+	fields += FIELDS
+
+	timestamp = now()
+	values = [
+		(
+			frappe.generate_hash(length=10),
+			row.get("creation") or timestamp,
+			timestamp,
+			frappe.session.user,
+			frappe.session.user,
+			0,
+			0,
+			*[row.get(field) for field in FIELDS],
+		)
+		for row in rows
+	]
+
+	frappe.db.bulk_insert("Serial No Ledger Entry", fields, values)
+
+
+def rebuild_serial_no_ledger_entries(batch_size=1000):
+	"""Recreate the serial no links of all submitted Stock Ledger Entries and POS Invoices.
+
+	Entries are walked in batches by name and committed after every batch, running it
+	again starts over."""
+	frappe.db.delete("Serial No Ledger Entry")
+
+	sle = frappe.qb.DocType("Stock Ledger Entry")
+	fields = ["name", "creation", "item_code", "warehouse", "company", "actual_qty", "serial_no"]
+	fields += ["voucher_type", "voucher_no", "voucher_detail_no", "posting_date", "posting_time"]
+	for entries in walk_in_batches(
+		frappe.qb.from_(sle)
+		.select(*[sle[field] for field in fields])
+		.where((sle.is_cancelled == 0) & (IfNull(sle.serial_no, "") != "")),
+		sle,
+		batch_size,
+	):
+		insert_serial_no_ledger_entries([row for entry in entries for row in get_entries_for_sle(entry)])
+
+	pos_invoice = frappe.qb.DocType("POS Invoice")
+	pos_invoice_item = frappe.qb.DocType("POS Invoice Item")
+	for items in walk_in_batches(
+		frappe.qb.from_(pos_invoice_item)
+		.inner_join(pos_invoice)
+		.on(pos_invoice.name == pos_invoice_item.parent)
+		.select(
+			pos_invoice_item.name,
+			pos_invoice_item.item_code,
+			pos_invoice_item.warehouse,
+			pos_invoice_item.serial_no,
+			pos_invoice.name.as_("parent"),
+			pos_invoice.company,
+			pos_invoice.is_return,
+			pos_invoice.posting_date,
+			pos_invoice.posting_time,
+		)
+		.where((pos_invoice.docstatus == 1) & (IfNull(pos_invoice_item.serial_no, "") != "")),
+		pos_invoice_item,
+		batch_size,
+	):
+		insert_serial_no_ledger_entries(
+			[
+				row
+				for d in items
+				for row in get_entries_for_pos_invoice(frappe._dict(d, name=d.parent), [d])
+			]
+		)
+
+
+def walk_in_batches(query, table, batch_size):
+	last_name = ""
+	while True:
+		rows = (
+			query.where(table.name > last_name).orderby(table.name).limit(batch_size).run(as_dict=True)
+		)
+		if not rows:
+			break
+
+		last_name = rows[-1].name
+		yield rows
+		if not frappe.flags.in_test:
+			frappe.db.commit()
@@ -0,0 +1,78 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, nowdate, nowtime
+
+from erpnext.stock.doctype.serial_no.serial_no import get_serial_nos
+from erpnext.stock.doctype.serial_no_ledger_entry.serial_no_ledger_entry import (
+	rebuild_serial_no_ledger_entries,
+)
+from erpnext.stock.doctype.stock_entry.stock_entry_utils import make_stock_entry
+from erpnext.stock.tests.test_utils import StockTestMixin
+from erpnext.stock.utils import get_serial_nos_data_after_transactions
+
+WAREHOUSE = "_Test Warehouse - _TC"
+
+
+class TestSerialNoLedgerEntry(FrappeTestCase, StockTestMixin):
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def get_entries(self, item_code):
+		return frappe.get_all(
+			"Serial No Ledger Entry",
+			filters={"item_code": item_code, "is_cancelled": 0},
+			fields=["serial_no", "actual_qty", "voucher_no", "stock_ledger_entry"],
+			order_by="serial_no, actual_qty",
+		)
+
+	def test_serial_no_ledger_entries(self):
+		item_code = self.make_item(
+			properties={"is_stock_item": 1, "has_serial_no": 1, "serial_no_series": "SNLE-.####"}
+		).name
+
+		receipt = make_stock_entry(
+			item_code=item_code,
+			to_warehouse=WAREHOUSE,
+			qty=3,
+			rate=100,
+			posting_date=add_days(nowdate(), -1),
+		)
+		serial_nos = get_serial_nos(receipt.items[0].serial_no)
+		issue = make_stock_entry(
+			item_code=item_code, from_warehouse=WAREHOUSE, qty=1, serial_no=serial_nos[0]
+		)
+
+		entries = self.get_entries(item_code)
+		self.assertEqual(
+			[(d.serial_no, d.actual_qty, d.voucher_no) for d in entries],
+			[
+				(serial_nos[0], -1, issue.name),
+				(serial_nos[0], 1, receipt.name),
+				(serial_nos[1], 1, receipt.name),
+				(serial_nos[2], 1, receipt.name),
+			],
+		)
+
+		args = dict(
+			item_code=item_code,
+			warehouse=WAREHOUSE,
+			posting_date=add_days(nowdate(), 1),
+			posting_time=nowtime(),
+		)
+		self.assertEqual(
+			sorted(get_serial_nos(get_serial_nos_data_after_transactions(args))), serial_nos[1:]
+		)
+
+		issue.cancel()
+		self.assertEqual(len(self.get_entries(item_code)), 3)
+		self.assertEqual(
+			sorted(get_serial_nos(get_serial_nos_data_after_transactions(args))), serial_nos
+		)
+
+		# existing ledgers are backfilled the same way
+		entries = self.get_entries(item_code)
+		rebuild_serial_no_ledger_entries()
+		self.assertEqual(self.get_entries(item_code), entries)
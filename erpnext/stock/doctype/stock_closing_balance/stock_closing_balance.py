@@ -0,0 +1,246 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+from collections import defaultdict
+
+import frappe
+from frappe.model.document import Document
+from frappe.query_builder import Criterion
+from frappe.utils import add_months, flt, get_last_day, getdate, now, nowdate
+
+from erpnext.stock.doctype.stock_valuation_checkpoint.stock_valuation_checkpoint import (
+	get_last_sle_on_or_before,
+)
+
+BALANCE_FIELDS = ["qty_after_transaction", "valuation_rate", "stock_value"]
+
+
+class StockClosingBalance(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Stock Closing Balance", ["company", "closing_date"], "company_closing_date")
+	frappe.db.add_index(
+		"Stock Closing Balance", ["item_code", "warehouse", "closing_date"], "item_warehouse_date"
+	)
+
+
+def get_closing_date(company, before_date=None):
+	"""Returns the latest closing date of `company`, strictly before `before_date` if given."""
+	filters = {"company": company}
+	if before_date:
+		filters["closing_date"] = ("<", before_date)
+
+	closing_date = frappe.db.get_value("Stock Closing Balance", filters, "max(closing_date)")
+	return getdate(closing_date) if closing_date else None
+
+
+def get_closing_balances(company, closing_date, apply_filters=None):
+	"""Balance of each item-warehouse with stock at the end of `closing_date`.
+
+	`apply_filters(query, table)` can restrict the item-warehouses fetched. Stale balances
+	are read from the ledger, so the result is always up to date."""
+	scb = frappe.qb.DocType("Stock Closing Balance")
+	query = (
+		frappe.qb.from_(scb)
+		.select(scb.item_code, scb.warehouse, scb.is_stale, *[scb[field] for field in BALANCE_FIELDS])
+		.where((scb.company == company) & (scb.closing_date == closing_date))
+	)
+	if apply_filters:
+		query = apply_filters(query, scb)
+
+	balances = {}
+	for row in query.run(as_dict=True):
+		if row.is_stale:
+			row.update(get_balance_from_ledger(row.item_code, row.warehouse, closing_date))
+		balances[(row.item_code, row.warehouse)] = row
+
+	return balances
+
+
+def get_balance_from_ledger(item_code, warehouse, closing_date):
+	last_sle = get_last_sle_on_or_before(item_code, warehouse, closing_date) or {}
+	return {field: flt(last_sle.get(field)) for field in BALANCE_FIELDS}
+
+
+def invalidate_closing_balances(item_warehouses):
+	"""Mark closing balances of item-warehouses on or after (backdated) postings as stale.
+
+	`item_warehouses` maps (item_code, warehouse) to the earliest posting date of the entries
+	posted. Item-warehouses without a closing balance (no stock at the time) get a stale one,
+	as they may have stock now."""
+	item_warehouses_by_company = defaultdict(dict)
+	for (item_code, warehouse), posting_date in item_warehouses.items():
+		company = frappe.get_cached_value("Warehouse", warehouse, "company")
+		item_warehouses_by_company[company][(item_code, warehouse)] = getdate(posting_date)
+
+	for company, posting_dates in item_warehouses_by_company.items():
+		closing_dates = frappe.get_all(
+			"Stock Closing Balance",
+			filters={"company": company, "closing_date": (">=", min(posting_dates.values()))},
+			pluck="closing_date",
+			distinct=True,
+		)
+		if not closing_dates:
+			continue
+
+		scb = frappe.qb.DocType("Stock Closing Balance")
+		condition = (scb.company == company) & Criterion.any(
+			[
+				(scb.item_code == item_code)
+				& (scb.warehouse == warehouse)
+				& (scb.closing_date >= posting_date)
+				for (item_code, warehouse), posting_date in posting_dates.items()
+			]
+		)
+		frappe.qb.update(scb).set(scb.is_stale, 1).where(condition & (scb.is_stale == 0)).run()
+
+		existing = {
+			(row.item_code, row.warehouse, getdate(row.closing_date))
+			for row in frappe.qb.from_(scb)
+			.select(scb.item_code, scb.warehouse, scb.closing_date)
+			.where(condition)
+			.run(as_dict=True)
+		}
+		insert_closing_balances(
+			company,
+			[
+				frappe._dict(item_code=item_code, warehouse=warehouse, closing_date=closing_date, is_stale=1)
+				for (item_code, warehouse), posting_date in posting_dates.items()
+				for closing_date in sorted(set(map(getdate, closing_dates)))
+				if closing_date >= posting_date and (item_code, warehouse, closing_date) not in existing
+			],
+		)
+
+
+def create_closing_balances(closing_date=None):
+	"""Snapshot the balance of all item-warehouses at the end of the month ending on `closing_date`.
+
+	Called monthly via hooks.py for the month that just ended."""
+	closing_date = getdate(closing_date or get_last_day(add_months(nowdate(), -1)))
+
+	for company in frappe.get_all("Company", pluck="name"):
+		if not frappe.db.exists(
+			"Stock Closing Balance", {"company": company, "closing_date": closing_date}
+		):
+			make_closing_balances(company, closing_date)
+
+	refresh_stale_closing_balances()
+
+
+def make_closing_balances(company, closing_date):
+	"""Carry forward the previous closing balances of `company`, only item-warehouses
+	transacted since (or left stale) are read from the ledger.
+
+	FIFO slots of the Stock Ageing report are kept along, for non serialized items."""
+	previous_closing_date = get_closing_date(company, closing_date)
+
+	balances = {}
+	if previous_closing_date:
+		balances = get_closing_balances(company, previous_closing_date)
+
+	for item_code, warehouse in get_item_warehouses_transacted(
+		company, previous_closing_date, closing_date
+	):
+		balances[(item_code, warehouse)] = get_balance_from_ledger(item_code, warehouse, closing_date)
+
+	fifo_slots = get_fifo_slots(company, closing_date, use_closing_balances=True)
+	insert_closing_balances(
+		company,
+		[
+			frappe._dict(
+				{"item_code": item_code, "warehouse": warehouse, "closing_date": closing_date},
+				**{field: balance[field] for field in BALANCE_FIELDS},
+				fifo_slots=fifo_slots.get((item_code, warehouse)),
+			)
+			for (item_code, warehouse), balance in balances.items()
+			if flt(balance["qty_after_transaction"]) or flt(balance["stock_value"])
+		],
+	)
+
+
+def get_fifo_slots(
+	company, closing_date, item_code=None, warehouse=None, use_closing_balances=False
+):
+	"""Encoded FIFO slots of non serialized item-warehouses at the end of `closing_date`."""
+	from erpnext.stock.report.stock_ageing.stock_ageing import FIFOSlots, encode_fifo_slots
+
+	filters = frappe._dict(
+		company=company,
+		to_date=closing_date,
+		item_code=item_code,
+		warehouse=warehouse,
+		show_warehouse_wise_stock=True,
+	)
+	item_details = FIFOSlots(
+		filters, use_closing_balances=use_closing_balances, serialized_items=False
+	).generate()
+
+	return {key: encode_fifo_slots(details["fifo_queue"]) for key, details in item_details.items()}
+
+
+def get_item_warehouses_transacted(company, after_date, upto_date):
+	sle = frappe.qb.DocType("Stock Ledger Entry")
+	query = (
+		frappe.qb.from_(sle)
+		.select(sle.item_code, sle.warehouse)
+		.distinct()
+		.where((sle.company == company) & (sle.posting_date <= upto_date) & (sle.is_cancelled == 0))
+	)
+	if after_date:
+		query = query.where(sle.posting_date > after_date)
+
+	return query.run()
+
+
+def insert_closing_balances(company, rows):
+	if not rows:
+		return
+
+	fields = ["name", "creation", "modified", "owner", "modified_by", "docstatus"]
+	fields += ["company", "item_code", "warehouse", "closing_date", "is_stale", *BALANCE_FIELDS]
+	fields += ["fifo_slots"]
+
+	timestamp = now()
+	values = [
+		(
+			frappe.generate_hash(length=10),
+			timestamp,
+			timestamp,
+			frappe.session.user,
+			frappe.session.user,
+			0,
+			company,
+			row.item_code,
+			row.warehouse,
+			row.closing_date,
+			row.get("is_stale", 0),
+			*[flt(row.get(field)) for field in BALANCE_FIELDS],
+			row.get("fifo_slots"),
+		)
+		for row in rows
+	]
+
+	frappe.db.bulk_insert("Stock Closing Balance", fields, values)
+
+
+def refresh_stale_closing_balances():
+	"""Recompute closing balances left stale by backdated postings."""
+	if frappe.db.exists(
+		"Repost Item Valuation", {"status": ("in", ["Queued", "In Progress"]), "docstatus": 1}
+	):
+		# ledger values are not final until pending reposts are processed
+		return
+
+	for row in frappe.get_all(
+		"Stock Closing Balance",
+		filters={"is_stale": 1},
+		fields=["name", "company", "item_code", "warehouse", "closing_date"],
+	):
+		values = get_balance_from_ledger(row.item_code, row.warehouse, row.closing_date)
+		values["fifo_slots"] = get_fifo_slots(
+			row.company, row.closing_date, row.item_code, row.warehouse
+		).get((row.item_code, row.warehouse))
+		values["is_stale"] = 0
+		frappe.db.set_value("Stock Closing Balance", row.name, values, update_modified=False)
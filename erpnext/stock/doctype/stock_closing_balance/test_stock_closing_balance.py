@@ -0,0 +1,190 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, add_months, get_last_day, nowdate
+
+from erpnext.stock.doctype.stock_closing_balance.stock_closing_balance import (
+	make_closing_balances,
+	refresh_stale_closing_balances,
+)
+from erpnext.stock.doctype.stock_entry.stock_entry_utils import make_stock_entry
+from erpnext.stock.report.stock_ageing.stock_ageing import (
+	FIFOSlots,
+	decode_fifo_slots,
+	encode_fifo_slots,
+)
+from erpnext.stock.report.stock_balance.stock_balance import execute as stock_balance
+from erpnext.stock.report.stock_balance.stock_balance import get_item_warehouse_filter
+from erpnext.stock.tests.test_utils import StockTestMixin
+
+COMPANY = "_Test Company"
+WAREHOUSE = "_Test Warehouse - _TC"
+
+
+class TestStockClosingBalance(FrappeTestCase, StockTestMixin):
+	def setUp(self):
+		frappe.db.delete("Stock Closing Balance")
+		self.item = self.make_item(properties={"is_stock_item": 1, "valuation_method": "FIFO"}).name
+		self.first_closing = get_last_day(add_months(nowdate(), -3))
+		self.second_closing = get_last_day(add_months(nowdate(), -2))
+
+		for qty, rate, posting_date in (
+			(10, 100, add_days(self.first_closing, -5)),
+			(5, 200, add_days(self.first_closing, -1)),
+		):
+			make_stock_entry(
+				item_code=self.item, to_warehouse=WAREHOUSE, qty=qty, rate=rate, posting_date=posting_date
+			)
+		make_stock_entry(
+			item_code=self.item,
+			from_warehouse=WAREHOUSE,
+			qty=5,
+			posting_date=add_days(self.second_closing, -3),
+		)
+
+		make_closing_balances(COMPANY, self.first_closing)
+		make_closing_balances(COMPANY, self.second_closing)
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def get_closing_balance(self, closing_date, warehouse=WAREHOUSE):
+		return frappe.db.get_value(
+			"Stock Closing Balance",
+			{"item_code": self.item, "warehouse": warehouse, "closing_date": closing_date},
+			["qty_after_transaction", "stock_value", "is_stale"],
+			as_dict=True,
+		)
+
+	def get_stock_balance(self, from_date):
+		filters = frappe._dict(
+			company=COMPANY, item_code=self.item, from_date=from_date, to_date=nowdate()
+		)
+		return [frappe._dict(row) for row in stock_balance(filters)[1]]
+
+	def test_closing_balances(self):
+		self.assertEqual(
+			self.get_closing_balance(self.first_closing),
+			{"qty_after_transaction": 15, "stock_value": 2000, "is_stale": 0},
+		)
+		self.assertEqual(
+			self.get_closing_balance(self.second_closing),
+			{"qty_after_transaction": 10, "stock_value": 1500, "is_stale": 0},
+		)
+
+		rows = self.get_stock_balance(add_days(self.first_closing, 1))
+		self.assertEqual(len(rows), 1)
+		self.assertEqual((rows[0].opening_qty, rows[0].opening_val), (15, 2000))
+		self.assertEqual((rows[0].out_qty, rows[0].out_val), (5, 500))
+		self.assertEqual((rows[0].bal_qty, rows[0].bal_val), (10, 1500))
+
+	def test_backdated_entry_invalidates_closing_balances(self):
+		make_stock_entry(
+			item_code=self.item,
+			to_warehouse=WAREHOUSE,
+			qty=5,
+			rate=50,
+			posting_date=add_days(self.first_closing, -3),
+		)
+		make_stock_entry(
+			item_code=self.item,
+			to_warehouse="Stores - _TC",
+			qty=1,
+			rate=10,
+			posting_date=add_days(self.first_closing, -3),
+		)
+
+		self.assertTrue(self.get_closing_balance(self.first_closing).is_stale)
+		self.assertTrue(self.get_closing_balance(self.second_closing).is_stale)
+		# item-warehouse without stock at the time of closing
+		self.assertTrue(self.get_closing_balance(self.second_closing, "Stores - _TC").is_stale)
+
+		# stale balances are read from the ledger
+		rows = self.get_stock_balance(add_days(self.second_closing, 1))
+		row = next(row for row in rows if row.warehouse == WAREHOUSE)
+		self.assertEqual((row.opening_qty, row.opening_val), (15, 1750))
+
+		refresh_stale_closing_balances()
+		self.assertEqual(
+			self.get_closing_balance(self.second_closing),
+			{"qty_after_transaction": 15, "stock_value": 1750, "is_stale": 0},
+		)
+		self.assertEqual(self.get_closing_balance(self.second_closing, "Stores - _TC").stock_value, 10)
+
+	def test_repost_invalidates_closing_balances_of_dependent_item_warehouses(self):
+		make_stock_entry(
+			item_code=self.item,
+			from_warehouse=WAREHOUSE,
+			to_warehouse="Stores - _TC",
+			qty=5,
+			posting_date=add_days(self.first_closing, -2),
+		)
+		refresh_stale_closing_balances()
+		self.assertEqual(
+			self.get_closing_balance(self.second_closing, "Stores - _TC"),
+			{"qty_after_transaction": 5, "stock_value": 500, "is_stale": 0},
+		)
+
+		# changes the rate of the transfer, the repost rewrites the ledger of Stores
+		make_stock_entry(
+			item_code=self.item,
+			to_warehouse=WAREHOUSE,
+			qty=5,
+			rate=50,
+			posting_date=add_days(self.first_closing, -10),
+		)
+		self.assertTrue(self.get_closing_balance(self.second_closing, "Stores - _TC").is_stale)
+
+		refresh_stale_closing_balances()
+		self.assertEqual(self.get_closing_balance(self.second_closing, "Stores - _TC").stock_value, 250)
+
+	def get_fifo_slots(self, to_date, use_closing_balances=True):
+		filters = frappe._dict(
+			company=COMPANY, item_code=self.item, to_date=to_date, show_warehouse_wise_stock=True
+		)
+		slots = FIFOSlots(filters, use_closing_balances=use_closing_balances).generate()
+		return slots[(self.item, WAREHOUSE)]["fifo_queue"]
+
+	def test_stock_ageing_of_filtered_items(self):
+		other_item = self.make_item(properties={"is_stock_item": 1}).name
+		make_stock_entry(item_code=other_item, to_warehouse=WAREHOUSE, qty=1, rate=10)
+
+		filters = frappe._dict(company=COMPANY, to_date=nowdate(), show_warehouse_wise_stock=True)
+		slots = FIFOSlots(
+			filters, apply_filters=get_item_warehouse_filter(filters, [self.item])
+		).generate()
+		self.assertEqual(set(slots), {(self.item, WAREHOUSE)})
+
+	def test_stock_ageing_resumes_from_closing(self):
+		fifo_slots = frappe.db.get_value(
+			"Stock Closing Balance",
+			{"item_code": self.item, "warehouse": WAREHOUSE, "closing_date": self.second_closing},
+			"fifo_slots",
+		)
+		self.assertEqual(
+			decode_fifo_slots(fifo_slots),
+			[[5.0, add_days(self.first_closing, -5)], [5.0, add_days(self.first_closing, -1)]],
+		)
+		self.assertEqual(decode_fifo_slots(encode_fifo_slots([])), [])
+
+		make_stock_entry(
+			item_code=self.item,
+			from_warehouse=WAREHOUSE,
+			qty=7,
+			posting_date=add_days(self.second_closing, 1),
+		)
+		self.assertEqual(self.get_fifo_slots(nowdate()), [[3.0, add_days(self.first_closing, -1)]])
+
+		# backdated entries leave the closing stale, slots are then read from the ledger
+		make_stock_entry(
+			item_code=self.item,
+			to_warehouse=WAREHOUSE,
+			qty=2,
+			rate=50,
+			posting_date=add_days(self.first_closing, -3),
+		)
+		self.assertEqual(
+			self.get_fifo_slots(nowdate()), self.get_fifo_slots(nowdate(), use_closing_balances=False)
+		)
@@ -121,6 +121,42 @@ class TestStockEntry(FrappeTestCase):
 			"_Test Item Warehouse Group Wise Reorder", warehouse="_Test Warehouse Group-C1 - _TC"
 		)
 
+	def test_items_below_reorder_level(self):
+		from erpnext.stock.reorder_item import get_items_below_reorder_level
+
+		item_code = make_item(properties={"is_stock_item": 1}).name
+		item = frappe.get_doc("Item", item_code)
+		for warehouse, warehouse_group, reorder_level in (
+			("_Test Warehouse - _TC", None, 5),
+			("_Test Warehouse Group-C1 - _TC", "_Test Warehouse Group - _TC", 20),
+			("Stores - _TC", None, 50),
+		):
+			item.append(
+				"reorder_levels",
+				{
+					"material_request_type": "Purchase",
+					"warehouse": warehouse,
+					"warehouse_group": warehouse_group,
+					"warehouse_reorder_level": reorder_level,
+					"warehouse_reorder_qty": 10,
+				},
+			)
+		item.save()
+
+		for warehouse, qty in (
+			("_Test Warehouse - _TC", 10),
+			("_Test Warehouse Group-C1 - _TC", 6),
+			("_Test Warehouse Group-C2 - _TC", 8),
+		):
+			make_stock_entry(item_code=item_code, target=warehouse, qty=qty, basic_rate=100)
+
+		# projected qty of the group is the total of its warehouses
+		rows = [row for row in get_items_below_reorder_level() if row.item_code == item_code]
+		self.assertEqual(
+			sorted((row.warehouse, row.projected_qty) for row in rows),
+			[("Stores - _TC", 0), ("_Test Warehouse Group-C1 - _TC", 14)],
+		)
+
 	def _test_auto_material_request(
 		self, item_code, material_request_type="Purchase", warehouse="_Test Warehouse - _TC"
 	):
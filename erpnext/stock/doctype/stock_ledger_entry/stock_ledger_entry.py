@@ -58,6 +58,12 @@ class StockLedgerEntry(Document):
 
 			process_serial_no(self)
 
+		from erpnext.stock.doctype.serial_no_ledger_entry.serial_no_ledger_entry import (
+			make_serial_no_ledger_entries,
+		)
+
+		make_serial_no_ledger_entries(self)
+
 	def calculate_batch_qty(self):
 		if self.batch_no:
 			batch_qty = (
@@ -227,3 +233,45 @@ def on_doctype_update():
 	frappe.db.add_index("Stock Ledger Entry", ["voucher_no", "voucher_type"])
 	frappe.db.add_index("Stock Ledger Entry", ["batch_no", "item_code", "warehouse"])
 	frappe.db.add_index("Stock Ledger Entry", ["warehouse", "item_code"], "item_warehouse")
+
+
+def convert_stock_queues(compact=None, batch_size=1000):
+	"""Rewrite stock queues of all Stock Ledger Entries in the format set in Stock Settings.
+
+	Entries are walked in batches by name and committed after every batch,
+	so the conversion can be interrupted and started again anytime."""
+	from erpnext.stock.stock_ledger import bulk_update_rows
+	from erpnext.stock.valuation import decode_stock_queue, encode_stock_queue
+
+	if compact is None:
+		compact = cint(frappe.db.get_single_value("Stock Settings", "use_compact_stock_queue"))
+
+	sle = frappe.qb.DocType("Stock Ledger Entry")
+	last_name = ""
+	while True:
+		entries = (
+			frappe.qb.from_(sle)
+			.select(sle.name, sle.stock_queue)
+			.where(sle.name > last_name)
+			.orderby(sle.name)
+			.limit(batch_size)
+		).run()
+
+		if not entries:
+			break
+
+		last_name = entries[-1][0]
+		rows = {}
+		for name, stock_queue in entries:
+			if not stock_queue or stock_queue == "[]":
+				continue
+
+			# legacy JSON queues always start with "["
+			if stock_queue.startswith("[") != bool(compact):
+				continue
+
+			rows[name] = {"stock_queue": encode_stock_queue(decode_stock_queue(stock_queue), compact)}
+
+		if rows:
+			bulk_update_rows("Stock Ledger Entry", rows, ["stock_queue"])
+		frappe.db.commit()
@@ -23,7 +23,12 @@ from erpnext.stock.doctype.stock_ledger_entry.stock_ledger_entry import BackDate
 from erpnext.stock.doctype.stock_reconciliation.test_stock_reconciliation import (
 	create_stock_reconciliation,
 )
-from erpnext.stock.stock_ledger import get_previous_sle
+from erpnext.stock.stock_ledger import (
+	DeferredUpdates,
+	FutureSLECursor,
+	get_previous_sle,
+	get_stock_ledger_entries,
+)
 from erpnext.stock.tests.test_utils import StockTestMixin
 
 
@@ -1265,6 +1270,80 @@ class TestStockLedgerEntry(FrappeTestCase, StockTestMixin):
 			item_code=item_code, source=warehouse, qty=470.84, rate=100, posting_date=add_days(today(), -1)
 		)
 
+	def test_deferred_ledger_updates(self):
+		item_code = make_item(properties={"is_stock_item": 1}).name
+		warehouse = "_Test Warehouse - _TC"
+
+		entries = [
+			make_stock_entry(item_code=item_code, target=warehouse, qty=qty, rate=10) for qty in (1, 2, 3)
+		]
+		sles = [
+			frappe.db.get_value("Stock Ledger Entry", {"voucher_no": se.name}, "name") for se in entries
+		]
+
+		updates = DeferredUpdates(batch_size=2)
+		updates.add("Stock Ledger Entry", sles[0], {"valuation_rate": 11})
+		updates.add("Stock Ledger Entry", sles[0], {"valuation_rate": 12, "stock_value": 12})
+		self.assertEqual(frappe.db.get_value("Stock Ledger Entry", sles[0], "valuation_rate"), 10)
+
+		# reaching batch size writes all pending rows
+		updates.add("Stock Ledger Entry", sles[1], {"valuation_rate": 21})
+		self.assertEqual(frappe.db.get_value("Stock Ledger Entry", sles[0], "valuation_rate"), 12)
+		self.assertEqual(frappe.db.get_value("Stock Ledger Entry", sles[0], "stock_value"), 12)
+		self.assertEqual(frappe.db.get_value("Stock Ledger Entry", sles[1], "valuation_rate"), 21)
+
+		updates.add("Stock Ledger Entry", sles[2], {"valuation_rate": 31})
+		updates.flush()
+		self.assertEqual(frappe.db.get_value("Stock Ledger Entry", sles[2], "valuation_rate"), 31)
+
+	def test_future_sle_cursor(self):
+		item_code = make_item(properties={"is_stock_item": 1}).name
+		warehouse = "_Test Warehouse - _TC"
+
+		entries = ((-4, "10:00"), (-3, "10:00"), (-3, "10:00"), (-2, "09:00"), (-1, "10:00"))
+		for days, posting_time in entries:
+			make_stock_entry(
+				item_code=item_code,
+				target=warehouse,
+				qty=1,
+				rate=10,
+				posting_date=add_days(today(), days),
+				posting_time=posting_time,
+			)
+		se = make_stock_entry(
+			item_code=item_code,
+			source=warehouse,
+			target="Stores - _TC",
+			qty=1,
+			posting_date=add_days(today(), -1),
+			posting_time="11:00",
+		)
+
+		previous_sle = get_previous_sle(
+			{
+				"item_code": item_code,
+				"warehouse": warehouse,
+				"posting_date": add_days(today(), -4),
+				"posting_time": "10:00",
+			}
+		)
+		expected = get_stock_ledger_entries(
+			previous_sle.copy(), ">", "asc", for_update=True, check_serial_no=False
+		)
+
+		# entries sharing posting datetime are split across chunks
+		cursor = FutureSLECursor(previous_sle, chunk_size=2)
+		entries = []
+		for sle in cursor:
+			entries.append(sle.name)
+			if sle.dependant_sle_voucher_detail_no:
+				dependant_sle = cursor.get_dependant_sle(sle)
+				self.assertEqual(dependant_sle.warehouse, "Stores - _TC")
+				self.assertEqual(dependant_sle.voucher_detail_no, se.items[0].name)
+
+		self.assertEqual(entries, [sle.name for sle in expected])
+		self.assertEqual(len(entries), 5)
+
 
 def create_repack_entry(**args):
 	args = frappe._dict(args)
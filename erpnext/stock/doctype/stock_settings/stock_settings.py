@@ -55,6 +55,7 @@ class StockSettings(Document):
 		self.cant_change_valuation_method()
 		self.validate_clean_description_html()
 		self.validate_pending_reposts()
+		self.validate_stock_queue_format()
 
 	def validate_warehouses(self):
 		warehouse_fields = ["default_warehouse", "sample_retention_warehouse"]
@@ -95,6 +96,17 @@ class StockSettings(Document):
 				now=frappe.flags.in_test,
 			)
 
+	def validate_stock_queue_format(self):
+		if cint(self.use_compact_stock_queue) != cint(self.db_get("use_compact_stock_queue")):
+			# rewrite existing stock queues in the new format
+			frappe.enqueue(
+				"erpnext.stock.doctype.stock_ledger_entry.stock_ledger_entry.convert_stock_queues",
+				queue="long",
+				timeout=7200,
+				compact=cint(self.use_compact_stock_queue),
+				now=frappe.flags.in_test,
+			)
+
 	def validate_pending_reposts(self):
 		if self.stock_frozen_upto:
 			check_pending_reposting(self.stock_frozen_upto)
@@ -0,0 +1,252 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.query_builder import Criterion, Order
+from frappe.utils import add_months, get_first_day, get_last_day, getdate, nowdate
+
+CHECKPOINT_FIELDS = [
+	"name",
+	"item_code",
+	"warehouse",
+	"checkpoint_date",
+	"stock_ledger_entry",
+	"posting_date",
+	"posting_time",
+	"sle_creation",
+	"qty_after_transaction",
+	"valuation_rate",
+	"stock_value",
+	"stock_queue",
+]
+
+
+class StockValuationCheckpoint(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index(
+		"Stock Valuation Checkpoint",
+		["item_code", "warehouse", "checkpoint_date"],
+		"item_warehouse_date",
+	)
+
+
+def get_checkpoint_before(item_code, warehouse, posting_date):
+	"""Returns the latest valid checkpoint taken strictly before `posting_date`."""
+	checkpoints = frappe.get_all(
+		"Stock Valuation Checkpoint",
+		filters={
+			"item_code": item_code,
+			"warehouse": warehouse,
+			"checkpoint_date": ("<", posting_date),
+			"is_stale": 0,
+		},
+		fields=CHECKPOINT_FIELDS,
+		order_by="checkpoint_date desc",
+		limit=1,
+	)
+
+	return checkpoints[0] if checkpoints else None
+
+
+def get_checkpoints_on_or_after(item_code, warehouse, posting_date):
+	return frappe.get_all(
+		"Stock Valuation Checkpoint",
+		filters={
+			"item_code": item_code,
+			"warehouse": warehouse,
+			"checkpoint_date": (">=", posting_date),
+		},
+		fields=["name", "checkpoint_date"],
+		order_by="checkpoint_date asc",
+	)
+
+
+def checkpoint_as_previous_sle(checkpoint):
+	"""Shape a checkpoint like the SLE it was taken from,
+	so that the repost engine can start from it."""
+	return frappe._dict(
+		{
+			"name": checkpoint.stock_ledger_entry,
+			"item_code": checkpoint.item_code,
+			"warehouse": checkpoint.warehouse,
+			"posting_date": checkpoint.posting_date,
+			"posting_time": checkpoint.posting_time,
+			"creation": checkpoint.sle_creation,
+			"qty_after_transaction": checkpoint.qty_after_transaction,
+			"valuation_rate": checkpoint.valuation_rate,
+			"stock_value": checkpoint.stock_value,
+			"stock_queue": checkpoint.stock_queue,
+		}
+	)
+
+
+def get_checkpoint_values(sle):
+	return {
+		"stock_ledger_entry": sle.name,
+		"posting_date": sle.posting_date,
+		"posting_time": sle.posting_time,
+		"sle_creation": sle.creation,
+		"qty_after_transaction": sle.qty_after_transaction,
+		"valuation_rate": sle.valuation_rate,
+		"stock_value": sle.stock_value,
+		"stock_queue": sle.stock_queue,
+		"is_stale": 0,
+	}
+
+
+def update_checkpoint(name, sle):
+	frappe.db.set_value(
+		"Stock Valuation Checkpoint", name, get_checkpoint_values(sle), update_modified=False
+	)
+
+
+def invalidate_checkpoints(item_warehouses):
+	"""Mark checkpoints affected by (backdated) postings as stale, with one statement.
+
+	`item_warehouses` maps (item_code, warehouse) to the earliest posting date of the entries
+	posted. Stale checkpoints are not used as a starting point for reposting until a repost
+	walks past them and refreshes their values."""
+	if not item_warehouses:
+		return
+
+	checkpoint = frappe.qb.DocType("Stock Valuation Checkpoint")
+	(
+		frappe.qb.update(checkpoint)
+		.set(checkpoint.is_stale, 1)
+		.where(
+			Criterion.any(
+				[
+					(checkpoint.item_code == item_code)
+					& (checkpoint.warehouse == warehouse)
+					& (checkpoint.checkpoint_date >= posting_date)
+					for (item_code, warehouse), posting_date in item_warehouses.items()
+				]
+			)
+			& (checkpoint.is_stale == 0)
+		)
+	).run()
+
+
+def make_checkpoint(item_code, warehouse, checkpoint_date):
+	"""Create or refresh the checkpoint of an item-warehouse as of end of `checkpoint_date`.
+
+	Only the ledger since the previous valid checkpoint is looked at."""
+	checkpoint_date = getdate(checkpoint_date)
+	previous_checkpoint = get_checkpoint_before(item_code, warehouse, checkpoint_date)
+
+	last_sle = get_last_sle_on_or_before(
+		item_code,
+		warehouse,
+		checkpoint_date,
+		after_date=previous_checkpoint.checkpoint_date if previous_checkpoint else None,
+	)
+
+	if not last_sle and previous_checkpoint:
+		last_sle = checkpoint_as_previous_sle(previous_checkpoint)
+
+	if not last_sle:
+		return
+
+	existing = frappe.db.get_value(
+		"Stock Valuation Checkpoint",
+		{"item_code": item_code, "warehouse": warehouse, "checkpoint_date": checkpoint_date},
+	)
+	if existing:
+		update_checkpoint(existing, last_sle)
+		return existing
+
+	doc = frappe.new_doc("Stock Valuation Checkpoint")
+	doc.update(
+		{
+			"item_code": item_code,
+			"warehouse": warehouse,
+			"company": frappe.get_cached_value("Warehouse", warehouse, "company"),
+			"checkpoint_date": checkpoint_date,
+		}
+	)
+	doc.update(get_checkpoint_values(last_sle))
+	doc.flags.ignore_permissions = True
+	doc.insert()
+
+	return doc.name
+
+
+def get_last_sle_on_or_before(item_code, warehouse, checkpoint_date, after_date=None):
+	sle = frappe.qb.DocType("Stock Ledger Entry")
+	query = (
+		frappe.qb.from_(sle)
+		.select(
+			sle.name,
+			sle.posting_date,
+			sle.posting_time,
+			sle.creation,
+			sle.qty_after_transaction,
+			sle.valuation_rate,
+			sle.stock_value,
+			sle.stock_queue,
+		)
+		.where(
+			(sle.item_code == item_code)
+			& (sle.warehouse == warehouse)
+			& (sle.is_cancelled == 0)
+			& (sle.posting_date <= checkpoint_date)
+		)
+		.orderby(sle.posting_date, order=Order.desc)
+		.orderby(sle.posting_time, order=Order.desc)
+		.orderby(sle.creation, order=Order.desc)
+		.limit(1)
+	)
+
+	if after_date:
+		query = query.where(sle.posting_date > after_date)
+
+	result = query.run(as_dict=True)
+	return result[0] if result else None
+
+
+def get_item_warehouses_transacted(from_date, to_date):
+	sle = frappe.qb.DocType("Stock Ledger Entry")
+	return (
+		frappe.qb.from_(sle)
+		.select(sle.item_code, sle.warehouse)
+		.distinct()
+		.where(
+			(sle.posting_date >= from_date) & (sle.posting_date <= to_date) & (sle.is_cancelled == 0)
+		)
+	).run()
+
+
+def create_checkpoints(checkpoint_date=None):
+	"""Checkpoint all item-warehouses transacted in the month ending on `checkpoint_date`.
+
+	Called monthly via hooks.py for the month that just ended. Item-warehouses
+	without movement in the month keep using their previous checkpoint."""
+	checkpoint_date = getdate(checkpoint_date or get_last_day(add_months(nowdate(), -1)))
+
+	for item_code, warehouse in get_item_warehouses_transacted(
+		get_first_day(checkpoint_date), checkpoint_date
+	):
+		make_checkpoint(item_code, warehouse, checkpoint_date)
+
+	refresh_stale_checkpoints()
+
+
+def refresh_stale_checkpoints():
+	"""Refresh checkpoints left stale by backdated postings that did not need any reposting."""
+	if frappe.db.exists(
+		"Repost Item Valuation", {"status": ("in", ["Queued", "In Progress"]), "docstatus": 1}
+	):
+		# ledger values are not final until pending reposts are processed
+		return
+
+	for checkpoint in frappe.get_all(
+		"Stock Valuation Checkpoint",
+		filters={"is_stale": 1},
+		fields=["item_code", "warehouse", "checkpoint_date"],
+		order_by="checkpoint_date asc",
+	):
+		make_checkpoint(checkpoint.item_code, checkpoint.warehouse, checkpoint.checkpoint_date)
@@ -0,0 +1,84 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, add_months, get_last_day, nowdate
+
+from erpnext.stock.doctype.stock_entry.stock_entry_utils import make_stock_entry
+from erpnext.stock.doctype.stock_valuation_checkpoint.stock_valuation_checkpoint import (
+	get_checkpoint_before,
+	make_checkpoint,
+)
+from erpnext.stock.stock_ledger import get_previous_sle_of_current_voucher
+from erpnext.stock.tests.test_utils import StockTestMixin
+
+WAREHOUSE = "_Test Warehouse - _TC"
+
+
+class TestStockValuationCheckpoint(FrappeTestCase, StockTestMixin):
+	def setUp(self):
+		self.item = self.make_item(properties={"is_stock_item": 1, "valuation_method": "FIFO"}).name
+		self.checkpoint_date = get_last_day(add_months(nowdate(), -2))
+
+		make_stock_entry(
+			item_code=self.item,
+			to_warehouse=WAREHOUSE,
+			qty=10,
+			rate=100,
+			posting_date=add_days(self.checkpoint_date, -5),
+		)
+		make_stock_entry(
+			item_code=self.item,
+			to_warehouse=WAREHOUSE,
+			qty=5,
+			rate=200,
+			posting_date=add_days(self.checkpoint_date, -1),
+		)
+
+	def get_checkpoint(self):
+		return frappe.get_doc(
+			"Stock Valuation Checkpoint",
+			{"item_code": self.item, "warehouse": WAREHOUSE, "checkpoint_date": self.checkpoint_date},
+		)
+
+	def test_checkpoint_snapshots_ledger(self):
+		make_checkpoint(self.item, WAREHOUSE, self.checkpoint_date)
+		checkpoint = self.get_checkpoint()
+
+		self.assertEqual(checkpoint.qty_after_transaction, 15)
+		self.assertEqual(checkpoint.stock_value, 2000)
+		self.assertEqual(frappe.parse_json(checkpoint.stock_queue), [[10, 100], [5, 200]])
+
+		# previous state after the checkpoint is read from the checkpoint itself
+		previous_sle = get_previous_sle_of_current_voucher(
+			frappe._dict(
+				item_code=self.item,
+				warehouse=WAREHOUSE,
+				posting_date=add_days(self.checkpoint_date, 10),
+				posting_time="00:00",
+			),
+			from_checkpoint=True,
+		)
+		self.assertEqual(previous_sle.name, checkpoint.stock_ledger_entry)
+		self.assertEqual(previous_sle.stock_value, 2000)
+
+	def test_backdated_entry_invalidates_and_repost_refreshes(self):
+		make_checkpoint(self.item, WAREHOUSE, self.checkpoint_date)
+
+		make_stock_entry(
+			item_code=self.item,
+			from_warehouse=WAREHOUSE,
+			qty=4,
+			posting_date=add_days(self.checkpoint_date, -3),
+		)
+
+		# reposts are executed immediately in tests, walking past the checkpoint
+		checkpoint = self.get_checkpoint()
+		self.assertFalse(checkpoint.is_stale)
+		self.assertEqual(checkpoint.qty_after_transaction, 11)
+		self.assertEqual(checkpoint.stock_value, 1600)
+		self.assertEqual(
+			get_checkpoint_before(self.item, WAREHOUSE, add_days(self.checkpoint_date, 1)).name,
+			checkpoint.name,
+		)
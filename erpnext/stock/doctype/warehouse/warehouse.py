@@ -40,6 +40,7 @@ class Warehouse(NestedSet):
 
 	def on_update(self):
 		self.update_nsm_model()
+		clear_child_warehouses_cache()
 
 	def update_nsm_model(self):
 		frappe.utils.nestedset.update_nsm(self)
@@ -71,6 +72,10 @@ class Warehouse(NestedSet):
 		frappe.db.delete("Bin", filters={"warehouse": self.name})
 		self.update_nsm_model()
 		self.unlink_from_items()
+		clear_child_warehouses_cache()
+
+	def after_rename(self, old_name, new_name, merge=False):
+		clear_child_warehouses_cache()
 
 	def warn_about_multiple_warehouse_account(self):
 		"If Warehouse value is split across multiple accounts, warn."
@@ -193,6 +198,17 @@ def get_child_warehouses(warehouse):
 	return children + [warehouse]  # append self for backward compatibility
 
 
+def get_cached_child_warehouses(warehouse):
+	"""`get_child_warehouses` cached until any warehouse is changed."""
+	return frappe.cache().hget(
+		"child_warehouses", warehouse, generator=lambda: get_child_warehouses(warehouse)
+	)
+
+
+def clear_child_warehouses_cache():
+	frappe.cache().delete_key("child_warehouses")
+
+
 def get_warehouses_based_on_account(account, company=None):
 	warehouses = []
 	for d in frappe.get_all("Warehouse", fields=["name", "is_group"], filters={"account": account}):
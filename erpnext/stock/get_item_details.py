@@ -1174,11 +1174,10 @@ def get_conversion_factor(item_code, uom):
 
 @frappe.whitelist()
 def get_projected_qty(item_code, warehouse):
-	return {
-		"projected_qty": frappe.db.get_value(
-			"Bin", {"item_code": item_code, "warehouse": warehouse}, "projected_qty"
-		)
-	}
+	from erpnext.stock.doctype.bin.bin import get_cached_bin_qty
+
+	bin_qty = get_cached_bin_qty(item_code).get(warehouse)
+	return {"projected_qty": bin_qty.projected_qty if bin_qty else None}
 
 
 @frappe.whitelist()
@@ -1186,22 +1185,11 @@ def get_bin_details(item_code, warehouse, company=None, include_child_warehouses
 	bin_details = {"projected_qty": 0, "actual_qty": 0, "reserved_qty": 0}
 
 	if warehouse:
-		from frappe.query_builder.functions import Coalesce, Sum
-
-		from erpnext.stock.doctype.warehouse.warehouse import get_child_warehouses
+		from erpnext.stock.doctype.bin.bin import get_cached_bin_qty_of_warehouses
+		from erpnext.stock.doctype.warehouse.warehouse import get_cached_child_warehouses
 
-		warehouses = get_child_warehouses(warehouse) if include_child_warehouses else [warehouse]
-
-		bin = frappe.qb.DocType("Bin")
-		bin_details = (
-			frappe.qb.from_(bin)
-			.select(
-				Coalesce(Sum(bin.projected_qty), 0).as_("projected_qty"),
-				Coalesce(Sum(bin.actual_qty), 0).as_("actual_qty"),
-				Coalesce(Sum(bin.reserved_qty), 0).as_("reserved_qty"),
-			)
-			.where((bin.item_code == item_code) & (bin.warehouse.isin(warehouses)))
-		).run(as_dict=True)[0]
+		warehouses = get_cached_child_warehouses(warehouse) if include_child_warehouses else [warehouse]
+		bin_details = get_cached_bin_qty_of_warehouses(item_code, warehouses)
 
 	if company:
 		bin_details["company_total_stock"] = get_company_total_stock(item_code, company)
@@ -1210,16 +1198,14 @@ def get_bin_details(item_code, warehouse, company=None, include_child_warehouses
 
 
 def get_company_total_stock(item_code, company):
-	bin = frappe.qb.DocType("Bin")
-	wh = frappe.qb.DocType("Warehouse")
-
-	return (
-		frappe.qb.from_(bin)
-		.inner_join(wh)
-		.on(bin.warehouse == wh.name)
-		.select(Sum(bin.actual_qty))
-		.where((wh.company == company) & (bin.item_code == item_code))
-	).run()[0][0]
+	from erpnext.stock.doctype.bin.bin import get_cached_bin_qty
+
+	actual_qty = [
+		flt(bin_qty.actual_qty)
+		for warehouse, bin_qty in get_cached_bin_qty(item_code).items()
+		if frappe.get_cached_value("Warehouse", warehouse, "company") == company
+	]
+	return sum(actual_qty) if actual_qty else None
 
 
 @frappe.whitelist()
@@ -3,14 +3,18 @@
 
 
 import json
+import time
 from math import ceil
 
 import frappe
 from frappe import _
-from frappe.utils import add_days, cint, flt, nowdate
+from frappe.utils import add_days, cint, create_batch, flt, nowdate
 
 import erpnext
 
+# reorder rows per Material Request, large requests are split into several documents
+MATERIAL_REQUEST_BATCH_SIZE = 500
+
 
 def reorder_item():
 	"""Reorder item if stock reaches reorder level"""
@@ -23,112 +27,93 @@ def reorder_item():
 
 
 def _reorder_item():
+	start = time.monotonic()
 	material_requests = {"Purchase": {}, "Transfer": {}, "Material Issue": {}, "Manufacture": {}}
-	warehouse_company = frappe._dict(
-		frappe.db.sql(
-			"""select name, company from `tabWarehouse`
-		where disabled=0"""
-		)
-	)
 	default_company = (
 		erpnext.get_default_company() or frappe.db.sql("""select name from tabCompany limit 1""")[0][0]
 	)
 
-	items_to_consider = frappe.db.sql_list(
-		"""select name from `tabItem` item
-		where is_stock_item=1 and has_variants=0
-			and disabled=0
-			and (end_of_life is null or end_of_life='0000-00-00' or end_of_life > %(today)s)
-			and (exists (select name from `tabItem Reorder` ir where ir.parent=item.name)
-				or (variant_of is not null and variant_of != ''
-				and exists (select name from `tabItem Reorder` ir where ir.parent=item.variant_of))
-			)""",
-		{"today": nowdate()},
-	)
-
-	if not items_to_consider:
-		return
-
-	item_warehouse_projected_qty = get_item_warehouse_projected_qty(items_to_consider)
-
-	def add_to_material_request(
-		item_code, warehouse, reorder_level, reorder_qty, material_request_type, warehouse_group=None
-	):
-		if warehouse not in warehouse_company:
-			# a disabled warehouse
-			return
+	reorder_rows = get_items_below_reorder_level()
+	for d in reorder_rows:
+		reorder_level = flt(d.warehouse_reorder_level)
+		reorder_qty = flt(d.warehouse_reorder_qty)
 
-		reorder_level = flt(reorder_level)
-		reorder_qty = flt(reorder_qty)
+		deficiency = reorder_level - flt(d.projected_qty)
+		if deficiency > reorder_qty:
+			reorder_qty = deficiency
 
-		# projected_qty will be 0 if Bin does not exist
-		if warehouse_group:
-			projected_qty = flt(item_warehouse_projected_qty.get(item_code, {}).get(warehouse_group))
-		else:
-			projected_qty = flt(item_warehouse_projected_qty.get(item_code, {}).get(warehouse))
-
-		if (reorder_level or reorder_qty) and projected_qty < reorder_level:
-			deficiency = reorder_level - projected_qty
-			if deficiency > reorder_qty:
-				reorder_qty = deficiency
-
-			company = warehouse_company.get(warehouse) or default_company
-
-			material_requests[material_request_type].setdefault(company, []).append(
-				{"item_code": item_code, "warehouse": warehouse, "reorder_qty": reorder_qty}
-			)
-
-	for item_code in items_to_consider:
-		item = frappe.get_doc("Item", item_code)
-
-		if item.variant_of and not item.get("reorder_levels"):
-			item.update_template_tables()
-
-		if item.get("reorder_levels"):
-			for d in item.get("reorder_levels"):
-				add_to_material_request(
-					item_code,
-					d.warehouse,
-					d.warehouse_reorder_level,
-					d.warehouse_reorder_qty,
-					d.material_request_type,
-					warehouse_group=d.warehouse_group,
-				)
+		company = d.company or default_company
+		material_requests[d.material_request_type].setdefault(company, []).append(
+			{"item_code": d.item_code, "warehouse": d.warehouse, "reorder_qty": reorder_qty}
+		)
 
-	if material_requests:
-		return create_material_request(material_requests)
+	mr_list = []
+	if reorder_rows:
+		mr_list = create_material_request(material_requests)
+
+	log_reorder_run(
+		reorder_rows=len(reorder_rows),
+		items=len({d.item_code for d in reorder_rows}),
+		material_requests=len(mr_list),
+		seconds=round(time.monotonic() - start, 3),
+	)
 
+	return mr_list
 
-def get_item_warehouse_projected_qty(items_to_consider):
-	item_warehouse_projected_qty = {}
 
-	for item_code, warehouse, projected_qty in frappe.db.sql(
-		"""select item_code, warehouse, projected_qty
-		from tabBin where item_code in ({0})
-			and (warehouse != '' and warehouse is not null)""".format(
-			", ".join(["%s"] * len(items_to_consider))
+def get_items_below_reorder_level():
+	"""Reorder levels of enabled stock items whose projected qty is below the reorder level.
+
+	Variants without reorder levels of their own follow the levels of their template.
+	The projected qty of a warehouse group is the total of all warehouses under it,
+	summed from Bin using the nested set of Warehouse."""
+	return frappe.db.sql(
+		"""
+		select
+			ir.item_code, ir.warehouse, ir.warehouse_reorder_level, ir.warehouse_reorder_qty,
+			ir.material_request_type, wh.company,
+			coalesce(sum(bin.projected_qty), 0) as projected_qty
+		from (
+			select item.name as item_code, ir.name as reorder_row, ir.warehouse, ir.warehouse_group,
+				ir.warehouse_reorder_level, ir.warehouse_reorder_qty, ir.material_request_type
+			from `tabItem` item
+			inner join `tabItem Reorder` ir on ir.parent = item.name
+			where {item_conditions}
+
+			union all
+
+			select item.name as item_code, ir.name as reorder_row, ir.warehouse,
+				null as warehouse_group, ir.warehouse_reorder_level, ir.warehouse_reorder_qty,
+				ir.material_request_type
+			from `tabItem` item
+			inner join `tabItem Reorder` ir on ir.parent = item.variant_of
+			where {item_conditions}
+				and not exists (select name from `tabItem Reorder` own where own.parent = item.name)
+		) ir
+		inner join `tabWarehouse` wh on wh.name = ir.warehouse and wh.disabled = 0
+		left join `tabWarehouse` target
+			on target.name = coalesce(nullif(ir.warehouse_group, ''), ir.warehouse)
+		left join `tabWarehouse` child on child.lft >= target.lft and child.rgt <= target.rgt
+		left join `tabBin` bin on bin.item_code = ir.item_code and bin.warehouse = child.name
+		where (ir.warehouse_reorder_level != 0 or ir.warehouse_reorder_qty != 0)
+		group by
+			ir.item_code, ir.reorder_row, ir.warehouse, ir.warehouse_reorder_level,
+			ir.warehouse_reorder_qty, ir.material_request_type, wh.company
+		having coalesce(sum(bin.projected_qty), 0) < ir.warehouse_reorder_level
+		order by ir.item_code, ir.warehouse
+		""".format(
+			item_conditions="""item.is_stock_item = 1 and item.has_variants = 0 and item.disabled = 0
+				and (item.end_of_life is null or item.end_of_life = '0000-00-00'
+					or item.end_of_life > %(today)s)"""
 		),
-		items_to_consider,
-	):
-
-		if item_code not in item_warehouse_projected_qty:
-			item_warehouse_projected_qty.setdefault(item_code, {})
-
-		if warehouse not in item_warehouse_projected_qty.get(item_code):
-			item_warehouse_projected_qty[item_code][warehouse] = flt(projected_qty)
-
-		warehouse_doc = frappe.get_doc("Warehouse", warehouse)
+		{"today": nowdate()},
+		as_dict=True,
+	)
 
-		while warehouse_doc.parent_warehouse:
-			if not item_warehouse_projected_qty.get(item_code, {}).get(warehouse_doc.parent_warehouse):
-				item_warehouse_projected_qty.setdefault(item_code, {})[warehouse_doc.parent_warehouse] = flt(
-					projected_qty
-				)
-			else:
-				item_warehouse_projected_qty[item_code][warehouse_doc.parent_warehouse] += flt(projected_qty)
-			warehouse_doc = frappe.get_doc("Warehouse", warehouse_doc.parent_warehouse)
 
-	return item_warehouse_projected_qty
+def log_reorder_run(**stats):
+	"""Log the runtime and row counts of a reorder run in the site's `reorder_item` log."""
+	frappe.logger("reorder_item", allow_site=True, file_count=50).info(stats)
 
 
 def create_material_request(material_requests):
@@ -145,69 +130,69 @@ def create_material_request(material_requests):
 
 		mr.log_error("Unable to create material request")
 
+	item_codes = {
+		d["item_code"]
+		for requests in material_requests.values()
+		for items in requests.values()
+		for d in items
+	}
+	item_details, conversion_factors, whole_number_uoms = get_item_details(item_codes)
+
 	for request_type in material_requests:
-		for company in material_requests[request_type]:
-			try:
-				items = material_requests[request_type][company]
-				if not items:
-					continue
-
-				mr = frappe.new_doc("Material Request")
-				mr.update(
-					{
-						"company": company,
-						"transaction_date": nowdate(),
-						"material_request_type": "Material Transfer" if request_type == "Transfer" else request_type,
-					}
-				)
-
-				for d in items:
-					d = frappe._dict(d)
-					item = frappe.get_doc("Item", d.item_code)
-					uom = item.stock_uom
-					conversion_factor = 1.0
-
-					if request_type == "Purchase":
-						uom = item.purchase_uom or item.stock_uom
-						if uom != item.stock_uom:
-							conversion_factor = (
-								frappe.db.get_value(
-									"UOM Conversion Detail", {"parent": item.name, "uom": uom}, "conversion_factor"
-								)
-								or 1.0
-							)
-
-					must_be_whole_number = frappe.db.get_value("UOM", uom, "must_be_whole_number", cache=True)
-					qty = d.reorder_qty / conversion_factor
-					if must_be_whole_number:
-						qty = ceil(qty)
-
-					mr.append(
-						"items",
+		material_request_type = "Material Transfer" if request_type == "Transfer" else request_type
+		for company, company_items in material_requests[request_type].items():
+			for items in create_batch(company_items, MATERIAL_REQUEST_BATCH_SIZE):
+				try:
+					mr = frappe.new_doc("Material Request")
+					mr.update(
 						{
-							"doctype": "Material Request Item",
-							"item_code": d.item_code,
-							"schedule_date": add_days(nowdate(), cint(item.lead_time_days)),
-							"qty": qty,
-							"uom": uom,
-							"stock_uom": item.stock_uom,
-							"warehouse": d.warehouse,
-							"item_name": item.item_name,
-							"description": item.description,
-							"item_group": item.item_group,
-							"brand": item.brand,
-						},
+							"company": company,
+							"transaction_date": nowdate(),
+							"material_request_type": material_request_type,
+						}
 					)
 
-				schedule_dates = [d.schedule_date for d in mr.items]
-				mr.schedule_date = max(schedule_dates or [nowdate()])
-				mr.flags.ignore_mandatory = True
-				mr.insert()
-				mr.submit()
-				mr_list.append(mr)
-
-			except Exception:
-				_log_exception(mr)
+					for d in items:
+						d = frappe._dict(d)
+						item = item_details[d.item_code]
+						uom = item.stock_uom
+						conversion_factor = 1.0
+
+						if request_type == "Purchase":
+							uom = item.purchase_uom or item.stock_uom
+							if uom != item.stock_uom:
+								conversion_factor = conversion_factors.get((item.name, uom)) or 1.0
+
+						qty = d.reorder_qty / conversion_factor
+						if whole_number_uoms.get(uom):
+							qty = ceil(qty)
+
+						mr.append(
+							"items",
+							{
+								"doctype": "Material Request Item",
+								"item_code": d.item_code,
+								"schedule_date": add_days(nowdate(), cint(item.lead_time_days)),
+								"qty": qty,
+								"uom": uom,
+								"stock_uom": item.stock_uom,
+								"warehouse": d.warehouse,
+								"item_name": item.item_name,
+								"description": item.description,
+								"item_group": item.item_group,
+								"brand": item.brand,
+							},
+						)
+
+					schedule_dates = [d.schedule_date for d in mr.items]
+					mr.schedule_date = max(schedule_dates or [nowdate()])
+					mr.flags.ignore_mandatory = True
+					mr.insert()
+					mr.submit()
+					mr_list.append(mr)
+
+				except Exception:
+					_log_exception(mr)
 
 	if mr_list:
 		if getattr(frappe.local, "reorder_email_notify", None) is None:
@@ -224,6 +209,49 @@ def create_material_request(material_requests):
 	return mr_list
 
 
+def get_item_details(item_codes):
+	"""Item fields, purchase UOM conversion factors and whole number UOMs of `item_codes`."""
+	if not item_codes:
+		return {}, {}, {}
+
+	item_details = {
+		item.name: item
+		for item in frappe.get_all(
+			"Item",
+			filters={"name": ("in", list(item_codes))},
+			fields=[
+				"name",
+				"item_name",
+				"description",
+				"item_group",
+				"brand",
+				"stock_uom",
+				"purchase_uom",
+				"lead_time_days",
+			],
+		)
+	}
+
+	conversion_factors = {
+		(d.parent, d.uom): d.conversion_factor
+		for d in frappe.get_all(
+			"UOM Conversion Detail",
+			filters={"parent": ("in", list(item_codes)), "parenttype": "Item"},
+			fields=["parent", "uom", "conversion_factor"],
+		)
+	}
+
+	uoms = {item.stock_uom for item in item_details.values()}
+	uoms |= {item.purchase_uom for item in item_details.values() if item.purchase_uom}
+	whole_number_uoms = dict(
+		frappe.get_all(
+			"UOM", filters={"name": ("in", list(uoms))}, fields=["name", "must_be_whole_number"], as_list=1
+		)
+	)
+
+	return item_details, conversion_factors, whole_number_uoms
+
+
 def send_email_notification(mr_list):
 	"""Notify user about auto creation of indent"""
 
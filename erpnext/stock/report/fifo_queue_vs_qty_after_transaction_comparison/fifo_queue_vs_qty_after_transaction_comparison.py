@@ -8,6 +8,8 @@ from frappe import _
 from frappe.utils import flt
 from frappe.utils.nestedset import get_descendants_of
 
+from erpnext.stock.valuation import decode_stock_queue
+
 SLE_FIELDS = (
 	"name",
 	"item_code",
@@ -80,7 +82,8 @@ def find_first_bad_queue(sles):
 
 	for _item_wh, sles in item_warehouse_sles.items():
 		for idx, sle in enumerate(sles):
-			queue = json.loads(sle.stock_queue or "[]")
+			queue = decode_stock_queue(sle.stock_queue)
+			sle.stock_queue = json.dumps(queue)
 
 			sle.fifo_queue_qty = 0.0
 			sle.fifo_stock_value = 0.0
@@ -2,14 +2,17 @@
 # License: GNU General Public License v3. See license.txt
 
 
+from datetime import date
 from operator import itemgetter
-from typing import Dict, List, Tuple, Union
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 import frappe
 from frappe import _
-from frappe.utils import cint, date_diff, flt
+from frappe.utils import add_days, cint, date_diff, flt, getdate
 
 from erpnext.stock.doctype.serial_no.serial_no import get_serial_nos
+from erpnext.stock.doctype.stock_closing_balance.stock_closing_balance import get_closing_date
+from erpnext.stock.valuation import decode_stock_queue, encode_stock_queue
 
 Filters = frappe._dict
 
@@ -211,15 +214,48 @@ def add_column(
 	range_columns.append(dict(label=label, fieldname=fieldname, fieldtype=fieldtype, width=width))
 
 
-class FIFOSlots:
-	"Returns FIFO computed slots of inwarded stock as per date."
+def encode_fifo_slots(fifo_queue: List) -> str:
+	"""Serialize FIFO slots of a non serialized item-warehouse, dates are stored as ordinals."""
+	return encode_stock_queue(
+		[
+			[flt(qty), getdate(posting_date).toordinal() if posting_date else 0]
+			for qty, posting_date in fifo_queue
+		],
+		compact=True,
+	)
 
-	def __init__(self, filters: Dict = None, sle: List = None):
+
+def decode_fifo_slots(value: Optional[str]) -> List:
+	return [
+		[qty, date.fromordinal(int(ordinal)) if ordinal else None]
+		for qty, ordinal in decode_stock_queue(value)
+	]
+
+
+class FIFOSlots:
+	"""Returns FIFO computed slots of inwarded stock as per date.
+
+	Unless stock ledger entries are passed, slots of non serialized items start from the
+	latest Stock Closing Balance on or before `to_date` and only later entries are replayed.
+	`apply_filters(query, table)` can further restrict the item-warehouses read then."""
+
+	def __init__(
+		self,
+		filters: Dict = None,
+		sle: List = None,
+		use_closing_balances: bool = True,
+		serialized_items: bool = True,
+		apply_filters: Callable = None,
+	):
 		self.item_details = {}
 		self.transferred_item_details = {}
 		self.serial_no_batch_purchase_details = {}
 		self.filters = filters
 		self.sle = sle
+		self.use_closing_balances = use_closing_balances
+		self.serialized_items = serialized_items
+		self.apply_filters = apply_filters
+		self.closing_date = None
 
 	def generate(self) -> Dict:
 		"""
@@ -232,6 +268,8 @@ class FIFOSlots:
 		}
 		"""
 		if self.sle is None:
+			if self.use_closing_balances:
+				self.__load_closing_slots()
 			self.sle = self.__get_stock_ledger_entries()
 
 		for d in self.sle:
@@ -381,6 +419,80 @@ class FIFOSlots:
 
 		return item_aggregated_data
 
+	def __load_closing_slots(self):
+		"Start from the slots of non serialized item-warehouses at the latest stock closing."
+		company, to_date = self.filters.get("company"), self.filters.get("to_date")
+		if not (company and to_date):
+			return
+
+		closing_date = get_closing_date(company, add_days(to_date, 1))
+		if not closing_date:
+			return
+
+		scb = frappe.qb.DocType("Stock Closing Balance")
+		item = self.__get_item_query()
+		query = (
+			frappe.qb.from_(scb)
+			.from_(item)
+			.select(
+				item.name,
+				item.item_name,
+				item.item_group,
+				item.brand,
+				item.description,
+				item.stock_uom,
+				item.has_serial_no,
+				scb.warehouse,
+				scb.qty_after_transaction,
+				scb.fifo_slots,
+				scb.is_stale,
+			)
+			.where(
+				(scb.item_code == item.name)
+				& (scb.company == company)
+				& (scb.closing_date == closing_date)
+				& (item.has_serial_no == 0)
+			)
+		)
+		if self.filters.get("warehouse"):
+			query = self.__get_warehouse_conditions(scb, query)
+
+		if self.apply_filters:
+			query = self.apply_filters(query, scb)
+
+		for row in query.run(as_dict=True):
+			if row.is_stale:
+				slots = self.__get_slots_from_ledger(row.name, row.warehouse, closing_date)
+			else:
+				slots = {
+					"fifo_queue": decode_fifo_slots(row.fifo_slots),
+					"qty_after_transaction": flt(row.qty_after_transaction),
+					"total_qty": flt(row.qty_after_transaction),
+				}
+
+			del row["fifo_slots"], row["is_stale"], row["qty_after_transaction"]
+			self.item_details[(row.name, row.warehouse)] = {"details": row, "has_serial_no": 0, **slots}
+
+		self.closing_date = closing_date
+
+	def __get_slots_from_ledger(self, item_code: str, warehouse: str, to_date) -> Dict:
+		filters = frappe._dict(
+			company=self.filters.get("company"),
+			item_code=item_code,
+			warehouse=warehouse,
+			to_date=to_date,
+			show_warehouse_wise_stock=True,
+		)
+		details = FIFOSlots(filters, use_closing_balances=False).generate().get((item_code, warehouse))
+		if not details:
+			return {"fifo_queue": [], "qty_after_transaction": 0.0, "total_qty": 0.0}
+
+		return {
+			"fifo_queue": details["fifo_queue"],
+			"qty_after_transaction": flt(details["qty_after_transaction"]),
+			"total_qty": flt(details["total_qty"]),
+		}
+
 	def __get_stock_ledger_entries(self) -> List[Dict]:
 		sle = frappe.qb.DocType("Stock Ledger Entry")
 		item = self.__get_item_query()  # used as derived table in sle query
@@ -416,6 +528,16 @@ class FIFOSlots:
 		if self.filters.get("warehouse"):
 			sle_query = self.__get_warehouse_conditions(sle, sle_query)
 
+		if self.closing_date:
+			# serialized items keep no slots at closing, serial nos are aged across warehouses
+			sle_query = sle_query.where((sle.posting_date > self.closing_date) | (item.has_serial_no == 1))
+
+		if not self.serialized_items:
+			sle_query = sle_query.where(item.has_serial_no == 0)
+
+		if self.apply_filters:
+			sle_query = self.apply_filters(sle_query, sle)
+
 		sle_query = sle_query.orderby(sle.posting_date, sle.posting_time, sle.creation, sle.actual_qty)
 
 		return sle_query.run(as_dict=True)
@@ -3,7 +3,7 @@
 
 
 from operator import itemgetter
-from typing import Any, Dict, List, Optional, TypedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TypedDict
 
 import frappe
 from frappe import _
@@ -13,6 +13,10 @@ from frappe.utils.nestedset import get_descendants_of
 
 import erpnext
 from erpnext.stock.doctype.inventory_dimension.inventory_dimension import get_inventory_dimensions
+from erpnext.stock.doctype.stock_closing_balance.stock_closing_balance import (
+	get_closing_balances,
+	get_closing_date,
+)
 from erpnext.stock.doctype.warehouse.warehouse import apply_warehouse_filter
 from erpnext.stock.report.stock_ageing.stock_ageing import FIFOSlots, get_average_age
 from erpnext.stock.utils import add_additional_uom_columns, is_reposting_item_valuation_in_progress
@@ -33,6 +37,9 @@ class StockBalanceFilter(TypedDict):
 
 SLEntry = Dict[str, Any]
 
+# Stock Ledger Entries fetched per query while folding the ledger into balances
+SLE_CHUNK_SIZE = 10_000
+
 
 def execute(filters: Optional[StockBalanceFilter] = None):
 	is_reposting_item_valuation_in_progress()
@@ -47,18 +54,27 @@ def execute(filters: Optional[StockBalanceFilter] = None):
 	include_uom = filters.get("include_uom")
 	columns = get_columns(filters)
 	items = get_items(filters)
-	sle = get_stock_ledger_entries(filters, items)
 
 	if filters.get("show_stock_ageing_data"):
 		filters["show_warehouse_wise_stock"] = True
-		item_wise_fifo_queue = FIFOSlots(filters, sle).generate()
+		# with a company, slots resume from the latest stock closing instead of the full ledger
+		sle = None if filters.get("company") else get_stock_ledger_entries_in_chunks(filters, items)
+		item_wise_fifo_queue = FIFOSlots(
+			filters, sle, apply_filters=get_item_warehouse_filter(filters, items)
+		).generate()
+
+	closing_date, opening_balances = get_opening_balances(filters, items)
+	iwb_map = get_item_warehouse_map(
+		filters,
+		get_stock_ledger_entries_in_chunks(filters, items, after_date=closing_date),
+		opening_balances,
+	)
 
 	# if no stock ledger entry found return
-	if not sle:
+	if not iwb_map:
 		return columns, []
 
-	iwb_map = get_item_warehouse_map(filters, sle)
-	item_map = get_item_details(items, sle, filters)
+	item_map = get_item_details(items or list({key[1] for key in iwb_map}), [], filters)
 	item_reorder_detail_map = get_item_reorder_details(item_map.keys())
 
 	data = []
@@ -96,7 +112,7 @@ def execute(filters: Optional[StockBalanceFilter] = None):
 				conversion_factors.setdefault(item, item_map[item].conversion_factor)
 
 			if filters.get("show_stock_ageing_data"):
-				fifo_queue = item_wise_fifo_queue[(item, warehouse)].get("fifo_queue")
+				fifo_queue = item_wise_fifo_queue.get((item, warehouse), {}).get("fifo_queue")
 
 				stock_ageing_data = {"average_age": 0, "earliest_age": 0, "latest_age": 0}
 				if fifo_queue:
@@ -283,6 +299,64 @@ def apply_conditions(query, filters):
 
 
 def get_stock_ledger_entries(filters: StockBalanceFilter, items: List[str]) -> List[SLEntry]:
+	return get_stock_ledger_entries_query(filters, items).run(as_dict=True)
+
+
+def get_stock_ledger_entries_in_chunks(
+	filters: StockBalanceFilter,
+	items: List[str],
+	chunk_size: Optional[int] = None,
+	after_date: Optional[str] = None,
+) -> Iterator[SLEntry]:
+	"""Yield the entries of `get_stock_ledger_entries` without holding the whole ledger in memory.
+
+	Each chunk continues after the last entry of the previous one (keyset pagination),
+	so every query reads only `chunk_size` entries however far into the ledger it is."""
+	sle = frappe.qb.DocType("Stock Ledger Entry")
+	posting_datetime = CombineDatetime(sle.posting_date, sle.posting_time)
+	chunk_size = chunk_size or SLE_CHUNK_SIZE
+
+	query = (
+		get_stock_ledger_entries_query(filters, items)
+		.select(sle.posting_time, sle.creation, sle.name.as_("sle_name"))
+		.orderby(sle.name)
+		.limit(chunk_size)
+	)
+	if after_date:
+		query = query.where(sle.posting_date > after_date)
+
+	last_sle = None
+	while True:
+		chunk_query = query
+		if last_sle:
+			last_posting_datetime = CombineDatetime(last_sle.posting_date, str(last_sle.posting_time))
+			chunk_query = chunk_query.where(sle.posting_date >= last_sle.posting_date).where(
+				(posting_datetime > last_posting_datetime)
+				| (
+					(posting_datetime == last_posting_datetime)
+					& (
+						(sle.creation > last_sle.creation)
+						| (
+							(sle.creation == last_sle.creation)
+							& (
+								(sle.actual_qty > last_sle.actual_qty)
+								| ((sle.actual_qty == last_sle.actual_qty) & (sle.name > last_sle.sle_name))
+							)
+						)
+					)
+				)
+			)
+
+		entries = chunk_query.run(as_dict=True)
+		yield from entries
+
+		if len(entries) < chunk_size:
+			break
+
+		last_sle = entries[-1]
+
+
+def get_stock_ledger_entries_query(filters: StockBalanceFilter, items: List[str]):
 	sle = frappe.qb.DocType("Stock Ledger Entry")
 
 	query = (
@@ -318,8 +392,52 @@ def get_stock_ledger_entries(filters: StockBalanceFilter, items: List[str]) -> L
 	if items:
 		query = query.where(sle.item_code.isin(items))
 
-	query = apply_conditions(query, filters)
-	return query.run(as_dict=True)
+	return apply_conditions(query, filters)
+
+
+def get_opening_balances(filters: StockBalanceFilter, items: List[str]):
+	"""Balances as per the latest stock closing before From Date.
+
+	Returns the closing date and balances by item-warehouse, only entries posted after
+	the closing date need to be read from the ledger then."""
+	company = filters.get("company")
+	if not (company and filters.get("from_date")) or any(
+		filters.get(field) for field in get_inventory_dimension_fields()
+	):
+		return None, {}
+
+	closing_date = get_closing_date(company, filters.get("from_date"))
+	if not closing_date:
+		return None, {}
+
+	return closing_date, get_closing_balances(
+		company, closing_date, get_item_warehouse_filter(filters, items)
+	)
+
+
+def get_item_warehouse_filter(filters: StockBalanceFilter, items: List[str]):
+	"""Returns `apply_filters(query, table)`, restricting a query on a table with item_code and
+	warehouse columns to the items and warehouses of the report."""
+
+	def apply_filters(query, table):
+		if items:
+			query = query.where(table.item_code.isin(items))
+
+		if filters.get("warehouse"):
+			query = apply_warehouse_filter(query, table, filters)
+		elif warehouse_type := filters.get("warehouse_type"):
+			warehouse_table = frappe.qb.DocType("Warehouse")
+			query = query.where(
+				table.warehouse.isin(
+					frappe.qb.from_(warehouse_table)
+					.select(warehouse_table.name)
+					.where(warehouse_table.warehouse_type == warehouse_type)
+				)
+			)
+
+		return query
+
+	return apply_filters
 
 
 def get_opening_vouchers(to_date):
@@ -354,30 +472,30 @@ def get_inventory_dimension_fields():
 	return [dimension.fieldname for dimension in get_inventory_dimensions()]
 
 
-def get_item_warehouse_map(filters: StockBalanceFilter, sle: List[SLEntry]):
+def get_item_warehouse_map(
+	filters: StockBalanceFilter,
+	sle: Iterable[SLEntry],
+	opening_balances: Optional[Dict[tuple, Dict]] = None,
+):
 	iwb_map = {}
 	from_date = getdate(filters.get("from_date"))
 	to_date = getdate(filters.get("to_date"))
-	opening_vouchers = get_opening_vouchers(to_date)
+	opening_vouchers = {
+		voucher_type: set(vouchers) for voucher_type, vouchers in get_opening_vouchers(to_date).items()
+	}
 	float_precision = cint(frappe.db.get_default("float_precision")) or 3
 	inventory_dimensions = get_inventory_dimension_fields()
 
+	for (item_code, warehouse), balance in (opening_balances or {}).items():
+		qty_dict = iwb_map[(filters.get("company"), item_code, warehouse)] = get_empty_balance()
+		qty_dict.opening_qty = qty_dict.bal_qty = flt(balance.qty_after_transaction)
+		qty_dict.opening_val = qty_dict.bal_val = flt(balance.stock_value)
+		qty_dict.val_rate = flt(balance.valuation_rate)
+
 	for d in sle:
 		group_by_key = get_group_by_key(d, filters, inventory_dimensions)
 		if group_by_key not in iwb_map:
-			iwb_map[group_by_key] = frappe._dict(
-				{
-					"opening_qty": 0.0,
-					"opening_val": 0.0,
-					"in_qty": 0.0,
-					"in_val": 0.0,
-					"out_qty": 0.0,
-					"out_val": 0.0,
-					"bal_qty": 0.0,
-					"bal_val": 0.0,
-					"val_rate": 0.0,
-				}
-			)
+			iwb_map[group_by_key] = get_empty_balance()
 
 		qty_dict = iwb_map[group_by_key]
 		for field in inventory_dimensions:
@@ -390,7 +508,7 @@ def get_item_warehouse_map(filters: StockBalanceFilter, sle: List[SLEntry]):
 
 		value_diff = flt(d.stock_value_difference)
 
-		if d.posting_date < from_date or d.voucher_no in opening_vouchers.get(d.voucher_type, []):
+		if d.posting_date < from_date or d.voucher_no in opening_vouchers.get(d.voucher_type, ()):
 			qty_dict.opening_qty += qty_diff
 			qty_dict.opening_val += value_diff
 
@@ -411,6 +529,22 @@ def get_item_warehouse_map(filters: StockBalanceFilter, sle: List[SLEntry]):
 	return iwb_map
 
 
+def get_empty_balance():
+	return frappe._dict(
+		{
+			"opening_qty": 0.0,
+			"opening_val": 0.0,
+			"in_qty": 0.0,
+			"in_val": 0.0,
+			"out_qty": 0.0,
+			"out_val": 0.0,
+			"bal_qty": 0.0,
+			"bal_val": 0.0,
+			"val_rate": 0.0,
+		}
+	)
+
+
 def get_group_by_key(row, filters, inventory_dimension_fields) -> tuple:
 	group_by_key = [row.company, row.item_code, row.warehouse]
 
@@ -172,3 +172,27 @@ class TestStockBalance(FrappeTestCase):
 		)
 		self.assertPartialDictEq(attributes, rows[0])
 		self.assertInvariants(rows)
+
+	def test_ledger_read_in_chunks(self):
+		from erpnext.stock.report.stock_balance import stock_balance as report
+
+		self.generate_stock_ledger(
+			self.item.name,
+			[
+				_dict(qty=5, rate=10, posting_date="2021-01-01"),
+				_dict(qty=3, rate=20, posting_date="2021-01-01"),
+				_dict(qty=2, rate=30, posting_date="2021-01-02", to_warehouse="Stores - _TC"),
+				_dict(qty=4, rate=40, posting_date="2021-02-01"),
+				_dict(qty=1, rate=50, posting_date="2021-03-01", to_warehouse="Stores - _TC"),
+			],
+		)
+		self.filters.update({"from_date": "2021-01-02"})
+		expected_rows = stock_balance(self.filters)
+
+		self.addCleanup(setattr, report, "SLE_CHUNK_SIZE", report.SLE_CHUNK_SIZE)
+		report.SLE_CHUNK_SIZE = 2
+
+		rows = stock_balance(self.filters)
+		self.assertEqual(rows, expected_rows)
+		self.assertEqual(len(rows), 2)
+		self.assertInvariants(rows)
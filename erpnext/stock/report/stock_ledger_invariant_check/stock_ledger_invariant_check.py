@@ -6,6 +6,8 @@ import json
 import frappe
 from frappe import _
 
+from erpnext.stock.valuation import decode_stock_queue
+
 SLE_FIELDS = (
 	"name",
 	"posting_date",
@@ -50,7 +52,8 @@ def add_invariant_check_fields(sles):
 	balance_qty = 0.0
 	balance_stock_value = 0.0
 	for idx, sle in enumerate(sles):
-		queue = json.loads(sle.stock_queue)
+		queue = decode_stock_queue(sle.stock_queue)
+		sle.stock_queue = json.dumps(queue)
 
 		fifo_qty = 0.0
 		fifo_value = 0.0
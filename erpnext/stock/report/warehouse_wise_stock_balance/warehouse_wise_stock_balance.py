@@ -6,6 +6,12 @@ from typing import Any, Dict, List, Optional, TypedDict
 import frappe
 from frappe import _
 from frappe.query_builder.functions import Sum
+from frappe.utils import flt
+
+from erpnext.stock.doctype.stock_closing_balance.stock_closing_balance import (
+	get_closing_balances,
+	get_closing_date,
+)
 
 
 class StockBalanceFilter(TypedDict):
@@ -34,11 +40,20 @@ def get_warehouse_wise_balance(filters: StockBalanceFilter) -> List[SLEntry]:
 		.groupby(sle.warehouse)
 	)
 
-	if filters.get("company"):
-		query = query.where(sle.company == filters.get("company"))
+	warehouse_balance = frappe._dict()
+	if company := filters.get("company"):
+		query = query.where(sle.company == company)
+
+		# start from the latest stock closing, only later entries are summed up
+		if closing_date := get_closing_date(company):
+			query = query.where(sle.posting_date > closing_date)
+			for (_item_code, warehouse), balance in get_closing_balances(company, closing_date).items():
+				warehouse_balance[warehouse] = warehouse_balance.get(warehouse, 0.0) + balance.stock_value
+
+	for warehouse, stock_balance in query.run(as_list=True):
+		warehouse_balance[warehouse] = warehouse_balance.get(warehouse, 0.0) + flt(stock_balance)
 
-	data = query.run(as_list=True)
-	return frappe._dict(data) if data else frappe._dict()
+	return warehouse_balance
 
 
 def get_warehouses(report_filters: StockBalanceFilter):
@@ -3,22 +3,44 @@
 
 import copy
 import json
+import time
+from collections import deque
 from typing import Optional, Set, Tuple
 
 import frappe
 from frappe import _
 from frappe.model.meta import get_field_precision
-from frappe.query_builder.functions import CombineDatetime, Sum
-from frappe.utils import cint, cstr, flt, get_link_to_form, getdate, now, nowdate
+from frappe.query_builder import Case
+from frappe.query_builder.functions import CombineDatetime, IfNull, Sum
+from frappe.utils import cint, cstr, flt, get_link_to_form, get_time, getdate, now, nowdate
 
 import erpnext
-from erpnext.stock.doctype.bin.bin import update_qty as update_bin_qty
+from erpnext.stock.doctype.bin.bin import bin_lock_wait, clear_bin_qty_cache
+from erpnext.stock.doctype.bin.bin import update_qty_in_bulk as update_bin_qty_in_bulk
+from erpnext.stock.doctype.serial_no_ledger_entry.serial_no_ledger_entry import (
+	cancel_serial_no_ledger_entries,
+)
+from erpnext.stock.doctype.stock_closing_balance.stock_closing_balance import (
+	invalidate_closing_balances,
+)
+from erpnext.stock.doctype.stock_valuation_checkpoint.stock_valuation_checkpoint import (
+	checkpoint_as_previous_sle,
+	get_checkpoint_before,
+	get_checkpoints_on_or_after,
+	invalidate_checkpoints,
+	update_checkpoint,
+)
 from erpnext.stock.utils import (
 	get_incoming_outgoing_rate_for_cancel,
 	get_or_make_bin,
 	get_valuation_method,
 )
-from erpnext.stock.valuation import FIFOValuation, LIFOValuation, round_off_if_near_zero
+from erpnext.stock.valuation import (
+	decode_stock_queue,
+	encode_stock_queue,
+	get_valuation_class,
+	round_off_if_near_zero,
+)
 
 
 class NegativeStockError(frappe.ValidationError):
@@ -29,6 +51,21 @@ class SerialNoExistsInFutureTransaction(frappe.ValidationError):
 	pass
 
 
+# Number of future Stock Ledger Entries fetched at a time while reposting
+FUTURE_SLE_CHUNK_SIZE = 1000
+
+# SLE fields recomputed by update_entries_after.process_sle
+SLE_REPOST_FIELDS = (
+	"qty_after_transaction",
+	"valuation_rate",
+	"stock_value",
+	"stock_value_difference",
+	"stock_queue",
+	"incoming_rate",
+	"outgoing_rate",
+)
+
+
 def make_sl_entries(sl_entries, allow_negative_stock=False, via_landed_cost_voucher=False):
 	"""Create SL entries from SL entry dicts
 
@@ -51,6 +88,10 @@ def make_sl_entries(sl_entries, allow_negative_stock=False, via_landed_cost_vouc
 		args = get_args_for_future_sle(sl_entries[0])
 		future_sle_exists(args, sl_entries)
 
+		bin_updates = []
+		# (item_code, warehouse): earliest posting date, to invalidate checkpoints
+		# and closing balances once
+		posted_item_warehouses = {}
 		for sle in sl_entries:
 			if sle.serial_no and not via_landed_cost_voucher:
 				validate_serial_no(sle)
@@ -83,12 +124,21 @@ def make_sl_entries(sl_entries, allow_negative_stock=False, via_landed_cost_vouc
 			if is_stock_item:
 				bin_name = get_or_make_bin(args.get("item_code"), args.get("warehouse"))
 				repost_current_voucher(args, allow_negative_stock, via_landed_cost_voucher)
-				update_bin_qty(bin_name, args)
+				bin_updates.append((bin_name, args))
+
+				key = (args.get("item_code"), args.get("warehouse"))
+				posting_date = getdate(args.get("posting_date"))
+				if key not in posted_item_warehouses or posting_date < posted_item_warehouses[key]:
+					posted_item_warehouses[key] = posting_date
 			else:
 				frappe.msgprint(
 					_("Item {0} ignored since it is not a stock item").format(args.get("item_code"))
 				)
 
+		invalidate_checkpoints(posted_item_warehouses)
+		invalidate_closing_balances(posted_item_warehouses)
+		update_bin_qty_in_bulk(bin_updates, get_ledger_update_batch_size())
+
 
 def repost_current_voucher(args, allow_negative_stock=False, via_landed_cost_voucher=False):
 	if args.get("actual_qty") or args.get("voucher_type") == "Stock Reconciliation":
@@ -188,6 +238,7 @@ def set_as_cancel(voucher_type, voucher_no):
 		where voucher_type=%s and voucher_no=%s and is_cancelled = 0""",
 		(now(), frappe.session.user, voucher_type, voucher_no),
 	)
+	cancel_serial_no_ledger_entries(voucher_type, voucher_no)
 
 
 def make_entry(args, allow_negative_stock=False, via_landed_cost_voucher=False):
@@ -217,13 +268,25 @@ def repost_future_sle(
 	if items_to_be_repost:
 		args = items_to_be_repost
 
+	from erpnext.stock.doctype.repost_item_valuation.repost_item_valuation import (
+		get_query_count,
+		record_item_warehouse_metrics,
+		update_reposting_metrics,
+	)
+
 	distinct_item_warehouses = get_distinct_item_warehouse(args, doc)
 	affected_transactions = get_affected_transactions(doc)
+	changed_transactions = get_affected_transactions(doc, "changed_transactions")
+	# last incoming rates of serial nos, shared by all item-warehouses reposted
+	serial_no_incoming_rates = {}
+	# (item_code, warehouse): (sles processed, seconds taken), recorded once all are reposted
+	item_warehouse_timings = {}
 
 	i = get_current_index(doc) or 0
 	while i < len(args):
 		validate_item_warehouse(args[i])
 
+		start, query_count = time.monotonic(), get_query_count() if doc else 0
 		obj = update_entries_after(
 			{
 				"item_code": args[i].get("item_code"),
@@ -232,11 +295,13 @@ def repost_future_sle(
 				"posting_time": args[i].get("posting_time"),
 				"creation": args[i].get("creation"),
 				"distinct_item_warehouses": distinct_item_warehouses,
+				"serial_no_incoming_rates": serial_no_incoming_rates,
 			},
 			allow_negative_stock=allow_negative_stock,
 			via_landed_cost_voucher=via_landed_cost_voucher,
 		)
 		affected_transactions.update(obj.affected_transactions)
+		changed_transactions.update(obj.changed_transactions)
 
 		distinct_item_warehouses[
 			(args[i].get("item_code"), args[i].get("warehouse"))
@@ -256,10 +321,24 @@ def repost_future_sle(
 		i += 1
 
 		if doc:
+			repost_item_valuation = doc.get("parent") or doc.name
+			seconds = time.monotonic() - start
+			update_reposting_metrics(
+				repost_item_valuation,
+				sles_processed=obj.processed_sles,
+				sl_reposting_time=seconds,
+				queries_issued=get_query_count() - query_count,
+			)
+			key = (args[i - 1].get("item_code"), args[i - 1].get("warehouse"))
+			sles, total_seconds = item_warehouse_timings.get(key, (0, 0.0))
+			item_warehouse_timings[key] = (sles + obj.processed_sles, total_seconds + seconds)
 			update_args_in_repost_item_valuation(
-				doc, i, args, distinct_item_warehouses, affected_transactions
+				doc, i, args, distinct_item_warehouses, affected_transactions, changed_transactions
 			)
 
+	if doc and item_warehouse_timings:
+		record_item_warehouse_metrics(doc.get("parent") or doc.name, item_warehouse_timings)
+
 
 def validate_item_warehouse(args):
 	for field in ["item_code", "warehouse", "posting_date", "posting_time"]:
@@ -269,7 +348,7 @@ def validate_item_warehouse(args):
 
 
 def update_args_in_repost_item_valuation(
-	doc, index, args, distinct_item_warehouses, affected_transactions
+	doc, index, args, distinct_item_warehouses, affected_transactions, changed_transactions=None
 ):
 	doc.db_set(
 		{
@@ -279,6 +358,7 @@ def update_args_in_repost_item_valuation(
 			),
 			"current_index": index,
 			"affected_transactions": frappe.as_json(affected_transactions),
+			"changed_transactions": frappe.as_json(changed_transactions or set()),
 		}
 	)
 
@@ -294,7 +374,7 @@ def update_args_in_repost_item_valuation(
 def get_items_to_be_repost(voucher_type=None, voucher_no=None, doc=None):
 	items_to_be_repost = []
 	if doc and doc.items_to_be_repost:
-		items_to_be_repost = json.loads(doc.items_to_be_repost) or []
+		items_to_be_repost = [frappe._dict(d) for d in json.loads(doc.items_to_be_repost) or []]
 
 	if not items_to_be_repost and voucher_type and voucher_no:
 		items_to_be_repost = frappe.db.get_all(
@@ -324,11 +404,11 @@ def get_distinct_item_warehouse(args=None, doc=None):
 	return distinct_item_warehouses
 
 
-def get_affected_transactions(doc) -> Set[Tuple[str, str]]:
-	if not doc.affected_transactions:
+def get_affected_transactions(doc, fieldname="affected_transactions") -> Set[Tuple[str, str]]:
+	if not doc.get(fieldname):
 		return set()
 
-	transactions = frappe.parse_json(doc.affected_transactions)
+	transactions = frappe.parse_json(doc.get(fieldname))
 	return {tuple(transaction) for transaction in transactions}
 
 
@@ -380,6 +460,18 @@ class update_entries_after(object):
 		self.new_items_found = False
 		self.distinct_item_warehouses = args.get("distinct_item_warehouses", frappe._dict())
 		self.affected_transactions: Set[Tuple[str, str]] = set()
+		# transactions whose stock value difference changed, only these need GL reposting
+		self.changed_transactions: Set[Tuple[str, str]] = set()
+		self.processed_sles = 0
+		# item-warehouses whose closing balances are marked stale
+		self.stale_closing_balances: Set[Tuple[str, str]] = set()
+		# (company, serial no): (name, incoming rate) of its last incoming Stock Ledger Entry
+		self.serial_no_incoming_rates = args.get("serial_no_incoming_rates", {})
+
+		self.deferred_updates = DeferredUpdates(get_ledger_update_batch_size())
+		self.compact_stock_queue = cint(
+			frappe.db.get_single_value("Stock Settings", "use_compact_stock_queue", cache=True)
+		)
 
 		self.data = frappe._dict()
 		self.initialize_previous_data(self.args)
@@ -413,7 +505,7 @@ class update_entries_after(object):
 		"""
 		self.data.setdefault(args.warehouse, frappe._dict())
 		warehouse_dict = self.data[args.warehouse]
-		previous_sle = get_previous_sle_of_current_voucher(args)
+		previous_sle = get_previous_sle_of_current_voucher(args, from_checkpoint=True)
 		warehouse_dict.previous_sle = previous_sle
 
 		for key in ("qty_after_transaction", "valuation_rate", "stock_value"):
@@ -422,7 +514,7 @@ class update_entries_after(object):
 		warehouse_dict.update(
 			{
 				"prev_stock_value": previous_sle.stock_value or 0.0,
-				"stock_queue": json.loads(previous_sle.stock_queue or "[]"),
+				"stock_queue": decode_stock_queue(previous_sle.stock_queue),
 				"stock_value_difference": 0.0,
 			}
 		)
@@ -436,22 +528,69 @@ class update_entries_after(object):
 				self.update_bin()
 		else:
 			entries_to_fix = self.get_future_entries_to_fix()
+			self.set_checkpoints_to_refresh()
 
-			i = 0
-			while i < len(entries_to_fix):
-				sle = entries_to_fix[i]
-				i += 1
-
+			for sle in entries_to_fix:
+				self.refresh_checkpoints(upto=sle.posting_date)
+				self.mark_closing_balances_stale(sle)
 				self.process_sle(sle)
+				self.last_processed_sle = sle
 
 				if sle.dependant_sle_voucher_detail_no:
-					entries_to_fix = self.get_dependent_entries_to_fix(entries_to_fix, sle)
+					self.get_dependent_entries_to_fix(entries_to_fix, sle)
 
+			self.refresh_checkpoints()
 			self.update_bin()
 
+		self.deferred_updates.flush()
+
 		if self.exceptions:
 			self.raise_exceptions()
 
+	def set_checkpoints_to_refresh(self):
+		"""Checkpoints after the starting point are refreshed as the repost walks past them."""
+		previous_sle = self.data[self.args.warehouse].previous_sle
+		self.last_processed_sle = previous_sle
+		self.checkpoints_to_refresh = get_checkpoints_on_or_after(
+			self.item_code,
+			self.args.warehouse,
+			previous_sle.get("posting_date") or self.args.get("posting_date") or "1900-01-01",
+		)
+
+	def mark_closing_balances_stale(self, sle):
+		"""Closing balances are stale from the first entry reposted of each item-warehouse,
+		including the dependent ones (transfer targets, manufactured items etc.)"""
+		key = (sle.item_code, sle.warehouse)
+		if key not in self.stale_closing_balances:
+			self.stale_closing_balances.add(key)
+			invalidate_closing_balances({key: sle.posting_date})
+
+	def refresh_checkpoints(self, upto=None):
+		"""Write current state to checkpoints dated before `upto` (all pending ones if not set)."""
+		while self.checkpoints_to_refresh and (
+			upto is None or self.checkpoints_to_refresh[0].checkpoint_date < getdate(upto)
+		):
+			checkpoint = self.checkpoints_to_refresh.pop(0)
+			if not self.last_processed_sle.get("name"):
+				continue
+
+			wh_data = self.data[self.args.warehouse]
+			update_checkpoint(
+				checkpoint.name,
+				frappe._dict(
+					{
+						"name": self.last_processed_sle.name,
+						"posting_date": self.last_processed_sle.posting_date,
+						"posting_time": self.last_processed_sle.posting_time,
+						"creation": self.last_processed_sle.creation,
+						"qty_after_transaction": wh_data.qty_after_transaction,
+						"valuation_rate": wh_data.valuation_rate,
+						"stock_value": wh_data.stock_value,
+						"stock_queue": encode_stock_queue(wh_data.stock_queue, self.compact_stock_queue),
+					}
+				),
+			)
+
 	def process_sle_against_current_timestamp(self):
 		sl_entries = self.get_sle_against_current_voucher()
 		for sle in sl_entries:
@@ -488,12 +627,10 @@ class update_entries_after(object):
 			{"item_code": self.item_code, "warehouse": self.args.warehouse}
 		)
 
-		return list(self.get_sle_after_datetime(args))
+		return FutureSLECursor(args)
 
 	def get_dependent_entries_to_fix(self, entries_to_fix, sle):
-		dependant_sle = get_sle_by_voucher_detail_no(
-			sle.dependant_sle_voucher_detail_no, excluded_sle=sle.name
-		)
+		dependant_sle = entries_to_fix.get_dependant_sle(sle)
 
 		if not dependant_sle:
 			return entries_to_fix
@@ -532,6 +669,8 @@ class update_entries_after(object):
 		# previous sle data for this warehouse
 		self.wh_data = self.data[sle.warehouse]
 		self.affected_transactions.add((sle.voucher_type, sle.voucher_no))
+		self.processed_sles += 1
+		previous_value_difference = flt(sle.stock_value_difference)
 
 		if (sle.serial_no and not self.via_landed_cost_voucher) or not cint(self.allow_negative_stock):
 			# validate negative stock for serialized items, fifo valuation
@@ -550,6 +689,7 @@ class update_entries_after(object):
 			and sle.actual_qty < 0
 			and frappe.get_cached_value(sle.voucher_type, sle.voucher_no, "is_internal_supplier")
 		):
+			self.deferred_updates.flush()
 			sle.outgoing_rate = get_incoming_rate_for_inter_company_transfer(sle)
 
 		if get_serial_nos(sle.serial_no):
@@ -596,11 +736,22 @@ class update_entries_after(object):
 		sle.qty_after_transaction = self.wh_data.qty_after_transaction
 		sle.valuation_rate = self.wh_data.valuation_rate
 		sle.stock_value = self.wh_data.stock_value
-		sle.stock_queue = json.dumps(self.wh_data.stock_queue)
+		sle.stock_queue = encode_stock_queue(self.wh_data.stock_queue, self.compact_stock_queue)
 		sle.stock_value_difference = stock_value_difference
-		sle.doctype = "Stock Ledger Entry"
+		if flt(stock_value_difference - previous_value_difference, self.currency_precision):
+			self.changed_transactions.add((sle.voucher_type, sle.voucher_no))
+
+		self.deferred_updates.add(
+			"Stock Ledger Entry",
+			sle.name,
+			{
+				field: sle.stock_queue if field == "stock_queue" else flt(sle.get(field))
+				for field in SLE_REPOST_FIELDS
+			},
+		)
 
-		frappe.get_doc(sle).db_update()
+		if sle.serial_no and flt(sle.actual_qty) > 0:
+			self.update_serial_no_incoming_rates(sle)
 
 		if not self.args.get("sle_id"):
 			self.update_outgoing_rate_on_transaction(sle)
@@ -624,6 +775,8 @@ class update_entries_after(object):
 	def get_dynamic_incoming_outgoing_rate(self, sle):
 		# Get updated incoming/outgoing rate from transaction
 		if sle.recalculate_rate:
+			# rates are read back from transactions and ledger updated so far
+			self.deferred_updates.flush()
 			rate = self.get_incoming_outgoing_rate_from_transaction(sle)
 
 			if flt(sle.actual_qty) >= 0:
@@ -713,13 +866,16 @@ class update_entries_after(object):
 				self.update_rate_on_subcontracting_receipt(sle, outgoing_rate)
 
 	def update_rate_on_stock_entry(self, sle, outgoing_rate):
-		frappe.db.set_value("Stock Entry Detail", sle.voucher_detail_no, "basic_rate", outgoing_rate)
+		self.deferred_updates.add(
+			"Stock Entry Detail", sle.voucher_detail_no, {"basic_rate": outgoing_rate}
+		)
 
 		# Update outgoing item's rate, recalculate FG Item's rate and total incoming/outgoing amount
 		if not sle.dependant_sle_voucher_detail_no:
 			self.recalculate_amounts_in_stock_entry(sle.voucher_no)
 
 	def recalculate_amounts_in_stock_entry(self, voucher_no):
+		self.deferred_updates.flush()
 		stock_entry = frappe.get_doc("Stock Entry", voucher_no, for_update=True)
 		stock_entry.calculate_rate_and_amount(reset_outgoing_rate=False, raise_error_if_no_rate=False)
 		stock_entry.db_update()
@@ -730,8 +886,8 @@ class update_entries_after(object):
 		# Update item's incoming rate on transaction
 		item_code = frappe.db.get_value(sle.voucher_type + " Item", sle.voucher_detail_no, "item_code")
 		if item_code == sle.item_code:
-			frappe.db.set_value(
-				sle.voucher_type + " Item", sle.voucher_detail_no, "incoming_rate", outgoing_rate
+			self.deferred_updates.add(
+				sle.voucher_type + " Item", sle.voucher_detail_no, {"incoming_rate": outgoing_rate}
 			)
 		else:
 			# packed item
@@ -747,16 +903,17 @@ class update_entries_after(object):
 			if sle.voucher_type in ["Purchase Receipt", "Purchase Invoice"] and frappe.get_cached_value(
 				sle.voucher_type, sle.voucher_no, "is_internal_supplier"
 			):
-				frappe.db.set_value(
-					f"{sle.voucher_type} Item", sle.voucher_detail_no, "valuation_rate", sle.outgoing_rate
+				self.deferred_updates.add(
+					f"{sle.voucher_type} Item", sle.voucher_detail_no, {"valuation_rate": sle.outgoing_rate}
 				)
 		else:
-			frappe.db.set_value(
-				"Purchase Receipt Item Supplied", sle.voucher_detail_no, "rate", outgoing_rate
+			self.deferred_updates.add(
+				"Purchase Receipt Item Supplied", sle.voucher_detail_no, {"rate": outgoing_rate}
 			)
 
 		# Recalculate subcontracted item's rate in case of subcontracted purchase receipt/invoice
 		if frappe.get_cached_value(sle.voucher_type, sle.voucher_no, "is_subcontracted"):
+			self.deferred_updates.flush()
 			doc = frappe.get_doc(sle.voucher_type, sle.voucher_no)
 			doc.update_valuation_rate(reset_outgoing_rate=False)
 			for d in doc.items + doc.supplied_items:
@@ -764,10 +921,12 @@ class update_entries_after(object):
 
 	def update_rate_on_subcontracting_receipt(self, sle, outgoing_rate):
 		if frappe.db.exists(sle.voucher_type + " Item", sle.voucher_detail_no):
-			frappe.db.set_value(sle.voucher_type + " Item", sle.voucher_detail_no, "rate", outgoing_rate)
+			self.deferred_updates.add(
+				sle.voucher_type + " Item", sle.voucher_detail_no, {"rate": outgoing_rate}
+			)
 		else:
-			frappe.db.set_value(
-				"Subcontracting Receipt Supplied Item", sle.voucher_detail_no, "rate", outgoing_rate
+			self.deferred_updates.add(
+				"Subcontracting Receipt Supplied Item", sle.voucher_detail_no, {"rate": outgoing_rate}
 			)
 
 	def get_serialized_values(self, sle):
@@ -810,6 +969,8 @@ class update_entries_after(object):
 				self.wh_data.valuation_rate = self.get_fallback_rate(sle)
 
 	def get_incoming_value_for_serial_nos(self, sle, serial_nos):
+		self.deferred_updates.flush()
+
 		# get rate from serial nos within same company
 		all_serial_nos = frappe.get_all(
 			"Serial No", fields=["purchase_rate", "name", "company"], filters={"name": ("in", serial_nos)}
@@ -819,29 +980,57 @@ class update_entries_after(object):
 
 		# Get rate for serial nos which has been transferred to other company
 		invalid_serial_nos = [d.name for d in all_serial_nos if d.company != sle.company]
+		self.set_serial_no_incoming_rates(sle.company, invalid_serial_nos)
 		for serial_no in invalid_serial_nos:
-			incoming_rate = frappe.db.sql(
-				"""
-				select incoming_rate
-				from `tabStock Ledger Entry`
+			incoming_values += self.serial_no_incoming_rates[(sle.company, serial_no)][1]
+
+		return incoming_values
+
+	def set_serial_no_incoming_rates(self, company, serial_nos):
+		"""Fetch the last incoming rate within `company` of serial nos not looked up yet."""
+		serial_nos = [
+			serial_no
+			for serial_no in serial_nos
+			if (company, serial_no) not in self.serial_no_incoming_rates
+		]
+		if not serial_nos:
+			return
+
+		for serial_no in serial_nos:
+			self.serial_no_incoming_rates[(company, serial_no)] = (None, 0.0)
+
+		for serial_no, sle_name, incoming_rate in frappe.db.sql(
+			"""
+			select serial_no, stock_ledger_entry, incoming_rate
+			from (
+				select
+					snle.serial_no, snle.stock_ledger_entry, sle.incoming_rate,
+					row_number() over (
+						partition by snle.serial_no
+						order by snle.posting_date desc, snle.posting_time desc, snle.creation desc
+					) as row_no
+				from `tabSerial No Ledger Entry` snle
+				inner join `tabStock Ledger Entry` sle on sle.name = snle.stock_ledger_entry
 				where
-					company = %s
-					and actual_qty > 0
-					and is_cancelled = 0
-					and (serial_no = %s
-						or serial_no like %s
-						or serial_no like %s
-						or serial_no like %s
-					)
-				order by posting_date desc
-				limit 1
-			""",
-				(sle.company, serial_no, serial_no + "\n%", "%\n" + serial_no, "%\n" + serial_no + "\n%"),
-			)
+					snle.serial_no in %(serial_nos)s
+					and snle.company = %(company)s
+					and snle.actual_qty > 0
+					and snle.is_cancelled = 0
+			) incoming
+			where row_no = 1
+		""",
+			{"serial_nos": serial_nos, "company": company},
+		):
+			self.serial_no_incoming_rates[(company, serial_no)] = (sle_name, flt(incoming_rate))
 
-			incoming_values += flt(incoming_rate[0][0]) if incoming_rate else 0
+	def update_serial_no_incoming_rates(self, sle):
+		"""Keep looked up incoming rates in line with the incoming entry being reposted."""
+		from erpnext.stock.doctype.serial_no.serial_no import get_serial_nos
 
-		return incoming_values
+		for serial_no in get_serial_nos(sle.serial_no):
+			key = (sle.company, serial_no)
+			if self.serial_no_incoming_rates.get(key, (None,))[0] == sle.name:
+				self.serial_no_incoming_rates[key] = (sle.name, flt(sle.incoming_rate))
 
 	def get_moving_average_values(self, sle):
 		actual_qty = flt(sle.actual_qty)
@@ -891,11 +1080,7 @@ class update_entries_after(object):
 			self.wh_data.qty_after_transaction + actual_qty
 		)
 
-		if self.valuation_method == "LIFO":
-			stock_queue = LIFOValuation(self.wh_data.stock_queue)
-		else:
-			stock_queue = FIFOValuation(self.wh_data.stock_queue)
-
+		stock_queue = self.get_stock_queue()
 		_prev_qty, prev_stock_value = stock_queue.get_total_stock_and_value()
 
 		if actual_qty > 0:
@@ -928,10 +1113,23 @@ class update_entries_after(object):
 			self.wh_data.stock_queue.append(
 				[0, sle.incoming_rate or sle.outgoing_rate or self.wh_data.valuation_rate]
 			)
+			self.wh_data.valuation_queue = None
 
 		if self.wh_data.qty_after_transaction:
 			self.wh_data.valuation_rate = self.wh_data.stock_value / self.wh_data.qty_after_transaction
 
+	def get_stock_queue(self):
+		"""Valuation queue of the current warehouse.
+
+		The queue is kept across entries as long as the stock queue of the warehouse
+		is not replaced, which avoids rebuilding large queues for every entry."""
+		stock_queue = self.wh_data.get("valuation_queue")
+		if stock_queue is None or stock_queue.state is not self.wh_data.stock_queue:
+			stock_queue = get_valuation_class(self.valuation_method)(self.wh_data.stock_queue)
+			self.wh_data.valuation_queue = stock_queue
+
+		return stock_queue
+
 	def update_batched_values(self, sle):
 		incoming_rate = flt(sle.incoming_rate)
 		actual_qty = flt(sle.actual_qty)
@@ -943,6 +1141,8 @@ class update_entries_after(object):
 		if actual_qty > 0:
 			stock_value_difference = incoming_rate * actual_qty
 		else:
+			# batch rate is computed from ledger entries updated so far
+			self.deferred_updates.flush()
 			outgoing_rate = get_batch_incoming_rate(
 				item_code=sle.item_code,
 				warehouse=sle.warehouse,
@@ -981,6 +1181,7 @@ class update_entries_after(object):
 	def get_fallback_rate(self, sle) -> float:
 		"""When exact incoming rate isn't available use any of other "average" rates as fallback.
 		This should only get used for negative stock."""
+		self.deferred_updates.flush()
 		return get_valuation_rate(
 			sle.item_code,
 			sle.warehouse,
@@ -1047,11 +1248,81 @@ class update_entries_after(object):
 			updated_values = {"actual_qty": data.qty_after_transaction, "stock_value": data.stock_value}
 			if data.valuation_rate is not None:
 				updated_values["valuation_rate"] = data.valuation_rate
-			frappe.db.set_value("Bin", bin_name, updated_values, update_modified=True)
+			with bin_lock_wait(self.args.get("voucher_type"), [bin_name]):
+				frappe.db.set_value("Bin", bin_name, updated_values, update_modified=True)
 
+		clear_bin_qty_cache(self.item_code)
 
-def get_previous_sle_of_current_voucher(args, operator="<", exclude_current_voucher=False):
-	"""get stock ledger entries filtered by specific posting datetime conditions"""
+
+class DeferredUpdates:
+	"""Buffer updates to existing rows and write them in bulk.
+
+	Updates are grouped per doctype and set of fields and written with one
+	multi-row `UPDATE ... SET field = CASE name WHEN ...` per batch.
+	Updates to the same row are merged, the last value wins.
+	"""
+
+	def __init__(self, batch_size=500):
+		self.batch_size = cint(batch_size) or 1
+		self.pending = {}
+		self.pending_count = 0
+
+	def add(self, doctype, name, values):
+		rows = self.pending.setdefault(doctype, {})
+		if name not in rows:
+			rows[name] = {}
+			self.pending_count += 1
+		rows[name].update(values)
+
+		if self.pending_count >= self.batch_size:
+			self.flush()
+
+	def flush(self):
+		pending, self.pending, self.pending_count = self.pending, {}, 0
+
+		for doctype, rows in pending.items():
+			rows_by_fields = {}
+			for name, values in rows.items():
+				rows_by_fields.setdefault(tuple(sorted(values)), {})[name] = values
+
+			for fields, field_rows in rows_by_fields.items():
+				bulk_update_rows(doctype, field_rows, fields)
+
+
+def bulk_update_rows(doctype, rows, fields):
+	"""Update `fields` of multiple rows with one statement. `rows` is a dict of name: values"""
+	table = frappe.qb.DocType(doctype)
+	query = frappe.qb.update(table).where(table.name.isin(list(rows)))
+
+	for field in fields:
+		value = Case()
+		for name, values in rows.items():
+			value = value.when(table.name == name, values[field])
+		query = query.set(table[field], value)
+
+	query.run()
+
+
+def get_ledger_update_batch_size():
+	return (
+		cint(
+			frappe.db.get_single_value(
+				"Stock Reposting Settings", "ledger_update_batch_size", cache=True
+			)
+		)
+		or 500
+	)
+
+
+def get_previous_sle_of_current_voucher(
+	args, operator="<", exclude_current_voucher=False, from_checkpoint=False
+):
+	"""get stock ledger entries filtered by specific posting datetime conditions
+
+	If `from_checkpoint` is set, only the ledger after the latest valid
+	Stock Valuation Checkpoint is searched and the checkpoint itself is
+	returned if no entry is found since.
+	"""
 
 	args["time_format"] = "%H:%i:%s"
 	if not args.get("posting_date"):
@@ -1064,6 +1335,16 @@ def get_previous_sle_of_current_voucher(args, operator="<", exclude_current_vouc
 		voucher_no = args.get("voucher_no")
 		voucher_condition = f"and voucher_no != '{voucher_no}'"
 
+	checkpoint = None
+	checkpoint_condition = ""
+	if from_checkpoint:
+		checkpoint = get_checkpoint_before(
+			args.get("item_code"), args.get("warehouse"), args["posting_date"]
+		)
+		if checkpoint:
+			args["checkpoint_date"] = checkpoint.checkpoint_date
+			checkpoint_condition = "and posting_date > %(checkpoint_date)s"
+
 	sle = frappe.db.sql(
 		"""
 		select *, timestamp(posting_date, posting_time) as "timestamp"
@@ -1072,6 +1353,7 @@ def get_previous_sle_of_current_voucher(args, operator="<", exclude_current_vouc
 			and warehouse = %(warehouse)s
 			and is_cancelled = 0
 			{voucher_condition}
+			{checkpoint_condition}
 			and (
 				posting_date < %(posting_date)s or
 				(
@@ -1082,12 +1364,17 @@ def get_previous_sle_of_current_voucher(args, operator="<", exclude_current_vouc
 		order by timestamp(posting_date, posting_time) desc, creation desc
 		limit 1
 		for update""".format(
-			operator=operator, voucher_condition=voucher_condition
+			operator=operator,
+			voucher_condition=voucher_condition,
+			checkpoint_condition=checkpoint_condition,
 		),
 		args,
 		as_dict=1,
 	)
 
+	if not sle and checkpoint:
+		return checkpoint_as_previous_sle(checkpoint)
+
 	return sle[0] if sle else frappe._dict()
 
 
@@ -1110,6 +1397,45 @@ def get_previous_sle(args, for_update=False):
 	return sle and sle[0] or {}
 
 
+def get_previous_sles(rows):
+	"""Set based `get_previous_sle` for rows with `item_code`, `warehouse`, `posting_date`
+	and `posting_time`, one query per posting datetime (usually one for a voucher).
+
+	Returns a dict keyed by (item_code, warehouse, posting_date, posting_time)."""
+	rows_by_timestamp = {}
+	for row in rows:
+		rows_by_timestamp.setdefault((row.posting_date, row.posting_time), []).append(row)
+
+	previous_sles = {}
+	for (posting_date, posting_time), timestamp_rows in rows_by_timestamp.items():
+		sles = frappe.db.sql(
+			"""
+			select * from (
+				select item_code, warehouse, qty_after_transaction, valuation_rate, stock_queue,
+					row_number() over (partition by item_code, warehouse
+						order by timestamp(posting_date, posting_time) desc, creation desc) as row_no
+				from `tabStock Ledger Entry`
+				where item_code in %(item_codes)s
+					and warehouse in %(warehouses)s
+					and is_cancelled = 0
+					and timestamp(posting_date, posting_time)
+						<= timestamp(%(posting_date)s, %(posting_time)s)
+			) sle
+			where row_no = 1""",
+			{
+				"item_codes": list({row.item_code for row in timestamp_rows}),
+				"warehouses": list({row.warehouse for row in timestamp_rows}),
+				"posting_date": posting_date,
+				"posting_time": posting_time,
+			},
+			as_dict=True,
+		)
+		for sle in sles:
+			previous_sles[(sle.item_code, sle.warehouse, posting_date, posting_time)] = sle
+
+	return previous_sles
+
+
 def get_stock_ledger_entries(
 	previous_sle,
 	operator=None,
@@ -1176,6 +1502,122 @@ def get_stock_ledger_entries(
 	)
 
 
+class FutureSLECursor:
+	"""Iterate over future Stock Ledger Entries of an item-warehouse for reposting.
+
+	Entries after `previous_sle` are fetched and locked in chunks ordered by posting
+	datetime and creation, each chunk continuing after the last entry of the previous
+	one, so that long ledgers are read once without being held in memory at once.
+	Dependent entries (e.g. target of a transfer) of each chunk are fetched along with it.
+	"""
+
+	def __init__(self, previous_sle, chunk_size=FUTURE_SLE_CHUNK_SIZE):
+		self.args = frappe._dict(
+			{
+				"item_code": previous_sle.get("item_code"),
+				"warehouse": previous_sle.get("warehouse"),
+				"posting_date": previous_sle.get("posting_date") or "1900-01-01",
+				"posting_time": previous_sle.get("posting_time") or "00:00",
+				"name": previous_sle.get("name") or "",
+				"creation": None,
+				"limit": cint(chunk_size) or FUTURE_SLE_CHUNK_SIZE,
+			}
+		)
+		self.chunk = deque()
+		self.exhausted = False
+		self.dependant_sles = {}
+
+	def __iter__(self):
+		return self
+
+	def __next__(self):
+		if not self.chunk and not self.exhausted:
+			self.fetch_next_chunk()
+
+		if not self.chunk:
+			raise StopIteration
+
+		return self.chunk.popleft()
+
+	def fetch_next_chunk(self):
+		if self.args.creation is None:
+			# first chunk, same as `get_stock_ledger_entries(previous_sle, ">", "asc")`
+			condition = """
+				timestamp(posting_date, posting_time) > timestamp(%(posting_date)s, %(posting_time)s)
+				and name != %(name)s"""
+		else:
+			condition = """(
+				timestamp(posting_date, posting_time) > timestamp(%(posting_date)s, %(posting_time)s)
+				or (
+					timestamp(posting_date, posting_time) = timestamp(%(posting_date)s, %(posting_time)s)
+					and (creation > %(creation)s or (creation = %(creation)s and name > %(name)s))
+				)
+			)"""
+
+		entries = frappe.db.sql(
+			f"""
+			select *, timestamp(posting_date, posting_time) as "timestamp"
+			from `tabStock Ledger Entry`
+			where item_code = %(item_code)s
+				and warehouse = %(warehouse)s
+				and is_cancelled = 0
+				and posting_date >= %(posting_date)s
+				and {condition}
+			order by timestamp(posting_date, posting_time), creation, name
+			limit %(limit)s
+			for update""",
+			self.args,
+			as_dict=1,
+		)
+
+		if len(entries) < self.args.limit:
+			self.exhausted = True
+
+		if entries:
+			last_sle = entries[-1]
+			self.args.update(
+				{
+					"posting_date": last_sle.posting_date,
+					"posting_time": last_sle.posting_time,
+					"creation": last_sle.creation,
+					"name": last_sle.name,
+				}
+			)
+
+		self.chunk.extend(entries)
+		self.fetch_dependant_sles(entries)
+
+	def fetch_dependant_sles(self, entries):
+		self.dependant_sles = {}
+		voucher_detail_nos = {
+			sle.dependant_sle_voucher_detail_no for sle in entries if sle.dependant_sle_voucher_detail_no
+		}
+		if not voucher_detail_nos:
+			return
+
+		sle = frappe.qb.DocType("Stock Ledger Entry")
+		for dependant_sle in (
+			frappe.qb.from_(sle)
+			.select(
+				sle.name,
+				sle.voucher_detail_no,
+				sle.item_code,
+				sle.warehouse,
+				sle.posting_date,
+				sle.posting_time,
+				CombineDatetime(sle.posting_date, sle.posting_time).as_("timestamp"),
+			)
+			.where((sle.voucher_detail_no.isin(list(voucher_detail_nos))) & (sle.is_cancelled == 0))
+		).run(as_dict=True):
+			self.dependant_sles.setdefault(dependant_sle.voucher_detail_no, []).append(dependant_sle)
+
+	def get_dependant_sle(self, sle):
+		"""Same as `get_sle_by_voucher_detail_no` for entries of the current chunk."""
+		for dependant_sle in self.dependant_sles.get(sle.dependant_sle_voucher_detail_no) or []:
+			if dependant_sle.name != sle.name:
+				return dependant_sle
+
+
 def get_sle_by_voucher_detail_no(voucher_detail_no, excluded_sle=None):
 	return frappe.db.get_value(
 		"Stock Ledger Entry",
@@ -1191,6 +1633,93 @@ def get_sle_by_voucher_detail_no(voucher_detail_no, excluded_sle=None):
 	)
 
 
+def get_independent_item_warehouse_chains(args):
+	"""Group reposting args into chains of item-warehouses that can be reposted independently.
+
+	Item-warehouses are linked when an entry in one has a dependent entry in the other
+	(transfer, repack, manufacture), directly or through other item-warehouses.
+	Each group keeps the original args and their order.
+	"""
+
+	def get_key(row):
+		return (row.get("item_code"), row.get("warehouse"))
+
+	def get_timestamp(row):
+		return (getdate(row.get("posting_date")), get_time(row.get("posting_time") or "00:00"))
+
+	def find(key):
+		while parents[key] != key:
+			parents[key] = parents[parents[key]]
+			key = parents[key]
+		return key
+
+	start_from = {}
+	parents = {}
+	for row in args:
+		key = get_key(row)
+		parents.setdefault(key, key)
+		if key not in start_from or get_timestamp(row) < get_timestamp(start_from[key]):
+			start_from[key] = row
+
+	to_visit = list(start_from)
+	while to_visit:
+		key = to_visit.pop()
+		for dependant_sle in get_dependent_item_warehouses(start_from[key]):
+			dependant_key = get_key(dependant_sle)
+			parents.setdefault(dependant_key, dependant_key)
+			parents[find(dependant_key)] = find(key)
+
+			if dependant_key not in start_from or get_timestamp(dependant_sle) < get_timestamp(
+				start_from[dependant_key]
+			):
+				start_from[dependant_key] = dependant_sle
+				to_visit.append(dependant_key)
+
+	chains = {}
+	for row in args:
+		chains.setdefault(find(get_key(row)), []).append(row)
+
+	return list(chains.values())
+
+
+def get_dependent_item_warehouses(args):
+	"""Get earliest dependent entry per item-warehouse for entries of `args` item-warehouse
+	posted on or after `args` posting date and time."""
+	sle = frappe.qb.DocType("Stock Ledger Entry")
+	dependant_sle = frappe.qb.DocType("Stock Ledger Entry").as_("dependant_sle")
+
+	entries = (
+		frappe.qb.from_(sle)
+		.inner_join(dependant_sle)
+		.on(dependant_sle.voucher_detail_no == sle.dependant_sle_voucher_detail_no)
+		.select(
+			dependant_sle.item_code,
+			dependant_sle.warehouse,
+			dependant_sle.posting_date,
+			dependant_sle.posting_time,
+		)
+		.where(
+			(sle.item_code == args.get("item_code"))
+			& (sle.warehouse == args.get("warehouse"))
+			& (sle.is_cancelled == 0)
+			& (IfNull(sle.dependant_sle_voucher_detail_no, "") != "")
+			& (
+				CombineDatetime(sle.posting_date, sle.posting_time)
+				>= CombineDatetime(args.get("posting_date"), args.get("posting_time") or "00:00")
+			)
+			& (dependant_sle.name != sle.name)
+			& (dependant_sle.is_cancelled == 0)
+		)
+		.orderby(CombineDatetime(dependant_sle.posting_date, dependant_sle.posting_time))
+	).run(as_dict=True)
+
+	earliest_entries = {}
+	for entry in entries:
+		earliest_entries.setdefault((entry.item_code, entry.warehouse), entry)
+
+	return list(earliest_entries.values())
+
+
 def get_batch_incoming_rate(
 	item_code, warehouse, batch_no, posting_date, posting_time, creation=None
 ):
@@ -1222,6 +1751,165 @@ def get_batch_incoming_rate(
 		return batch_details[0].batch_value / batch_details[0].batch_qty
 
 
+def get_batch_incoming_rates(rows):
+	"""Set based `get_batch_incoming_rate` for rows with `item_code`, `warehouse`, `batch_no`,
+	`posting_date` and `posting_time`.
+
+	Returns a dict keyed by (item_code, warehouse, batch_no, posting_date, posting_time)."""
+	rows_by_timestamp = {}
+	for row in rows:
+		rows_by_timestamp.setdefault((row.posting_date, row.posting_time), []).append(row)
+
+	sle = frappe.qb.DocType("Stock Ledger Entry")
+	incoming_rates = {}
+	for (posting_date, posting_time), timestamp_rows in rows_by_timestamp.items():
+		batch_details = (
+			frappe.qb.from_(sle)
+			.select(
+				sle.item_code,
+				sle.warehouse,
+				sle.batch_no,
+				Sum(sle.stock_value_difference).as_("batch_value"),
+				Sum(sle.actual_qty).as_("batch_qty"),
+			)
+			.where(
+				(sle.item_code.isin(list({row.item_code for row in timestamp_rows})))
+				& (sle.warehouse.isin(list({row.warehouse for row in timestamp_rows})))
+				& (sle.batch_no.isin(list({row.batch_no for row in timestamp_rows})))
+				& (sle.is_cancelled == 0)
+				& (
+					CombineDatetime(sle.posting_date, sle.posting_time)
+					< CombineDatetime(posting_date, posting_time)
+				)
+			)
+			.groupby(sle.item_code, sle.warehouse, sle.batch_no)
+		).run(as_dict=True)
+
+		for batch in batch_details:
+			if batch.batch_qty:
+				key = (batch.item_code, batch.warehouse, batch.batch_no, posting_date, posting_time)
+				incoming_rates[key] = batch.batch_value / batch.batch_qty
+
+	return incoming_rates
+
+
+def get_batchwise_valuation_batches(batch_nos):
+	batch_nos = list(set(filter(None, batch_nos)))
+	if not batch_nos:
+		return set()
+
+	return set(
+		frappe.get_all(
+			"Batch", filters={"name": ("in", batch_nos), "use_batchwise_valuation": 1}, pluck="name"
+		)
+	)
+
+
+def get_valuation_rates(rows, currency=None):
+	"""Set based `get_valuation_rate` for rows with `item_code`, `warehouse`, `batch_no`,
+	`voucher_type` and `voucher_no`.
+
+	Returns the valuation rate of each row in the same order, None where no rate is found.
+	Errors for missing rates are left to the caller."""
+	rates = [None] * len(rows)
+	batchwise_batches = get_batchwise_valuation_batches(row.batch_no for row in rows if row.warehouse)
+
+	rows_by_voucher = {}
+	for idx, row in enumerate(rows):
+		rows_by_voucher.setdefault((row.voucher_type, row.voucher_no), []).append((idx, row))
+
+	for (voucher_type, voucher_no), voucher_rows in rows_by_voucher.items():
+		# moving average rate of batches valued batch-wise
+		batch_rows = [
+			(idx, row) for idx, row in voucher_rows if row.warehouse and row.batch_no in batchwise_batches
+		]
+		if batch_rows:
+			batch_rates = frappe.db.sql(
+				"""
+				select item_code, warehouse, batch_no, sum(stock_value_difference) / sum(actual_qty)
+				from `tabStock Ledger Entry`
+				where
+					item_code in %(item_codes)s
+					AND warehouse in %(warehouses)s
+					AND batch_no in %(batch_nos)s
+					AND is_cancelled = 0
+					AND NOT (voucher_no = %(voucher_no)s AND voucher_type = %(voucher_type)s)
+				group by item_code, warehouse, batch_no""",
+				{
+					"item_codes": list({row.item_code for idx, row in batch_rows}),
+					"warehouses": list({row.warehouse for idx, row in batch_rows}),
+					"batch_nos": list({row.batch_no for idx, row in batch_rows}),
+					"voucher_no": voucher_no,
+					"voucher_type": voucher_type,
+				},
+			)
+			batch_rates = {(d[0], d[1], d[2]): flt(d[3]) for d in batch_rates if d[3] is not None}
+			for idx, row in batch_rows:
+				rates[idx] = batch_rates.get((row.item_code, row.warehouse, row.batch_no))
+
+		# valuation rate from last sle for the same item and warehouse
+		pending_rows = [(idx, row) for idx, row in voucher_rows if rates[idx] is None]
+		if not pending_rows:
+			continue
+
+		last_rates = frappe.db.sql(
+			"""
+			select item_code, warehouse, valuation_rate from (
+				select item_code, warehouse, valuation_rate,
+					row_number() over (partition by item_code, warehouse
+						order by posting_date desc, posting_time desc, name desc) as row_no
+				from `tabStock Ledger Entry`
+				where
+					item_code in %(item_codes)s
+					AND warehouse in %(warehouses)s
+					AND valuation_rate >= 0
+					AND is_cancelled = 0
+					AND NOT (voucher_no = %(voucher_no)s AND voucher_type = %(voucher_type)s)
+			) sle
+			where row_no = 1""",
+			{
+				"item_codes": list({row.item_code for idx, row in pending_rows}),
+				"warehouses": list({row.warehouse for idx, row in pending_rows}),
+				"voucher_no": voucher_no,
+				"voucher_type": voucher_type,
+			},
+		)
+		last_rates = {(d[0], d[1]): flt(d[2]) for d in last_rates}
+		for idx, row in pending_rows:
+			rates[idx] = last_rates.get((row.item_code, row.warehouse))
+
+	# If negative stock allowed, and item delivered without any incoming entry,
+	# system does not found any SLE, then take valuation rate from Item
+	item_codes = list({row.item_code for idx, row in enumerate(rows) if rates[idx] is None})
+	if not item_codes:
+		return rates
+
+	item_rates = {}
+	for item in frappe.get_all(
+		"Item",
+		filters={"name": ("in", item_codes)},
+		fields=["name", "valuation_rate", "standard_rate"],
+	):
+		item_rates[item.name] = item.valuation_rate or item.standard_rate
+
+	# try in price list
+	without_rate = [item_code for item_code in item_codes if not item_rates.get(item_code)]
+	if without_rate:
+		for price in frappe.get_all(
+			"Item Price",
+			filters={"item_code": ("in", without_rate), "buying": 1, "currency": currency},
+			fields=["item_code", "price_list_rate"],
+		):
+			if not item_rates.get(price.item_code):
+				item_rates[price.item_code] = price.price_list_rate
+
+	for idx, row in enumerate(rows):
+		if rates[idx] is None:
+			rates[idx] = item_rates.get(row.item_code)
+
+	return rates
+
+
 def get_valuation_rate(
 	item_code,
 	warehouse,
@@ -2,8 +2,9 @@ import json
 
 import frappe
 from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, nowdate
 
-from erpnext.stock.utils import scan_barcode
+from erpnext.stock.utils import get_incoming_rate, get_incoming_rates, scan_barcode
 
 
 class StockTestMixin:
@@ -81,3 +82,39 @@ class TestStockUtilities(FrappeTestCase, StockTestMixin):
 		self.assertEqual(serial_scan["serial_no"], serial.name)
 		self.assertEqual(serial_scan["has_batch_no"], 0)
 		self.assertEqual(serial_scan["has_serial_no"], 1)
+
+	def test_incoming_rates_of_many_rows(self):
+		from erpnext.stock.doctype.stock_entry.stock_entry_utils import make_stock_entry
+
+		warehouse = "_Test Warehouse - _TC"
+		fifo_item = self.make_item(properties={"valuation_method": "FIFO"}).name
+		avg_item = self.make_item(properties={"valuation_method": "Moving Average"}).name
+		batch_item = self.make_item(
+			properties={"has_batch_no": 1, "create_new_batch": 1, "valuation_method": "FIFO"}
+		).name
+		rate_only_item = self.make_item(properties={"valuation_rate": 42}).name
+
+		for item_code, rates in ((fifo_item, (100, 200)), (avg_item, (100, 200)), (batch_item, (50,))):
+			for days, rate in enumerate(rates):
+				se = make_stock_entry(
+					item_code=item_code,
+					to_warehouse=warehouse,
+					qty=10,
+					rate=rate,
+					posting_date=add_days(nowdate(), days - 5),
+				)
+		batch_no = se.items[0].batch_no
+
+		common = {"company": "_Test Company", "posting_date": nowdate(), "posting_time": "23:59:59"}
+		args_list = [
+			{"item_code": fifo_item, "warehouse": warehouse, "qty": -15},
+			{"item_code": fifo_item, "warehouse": warehouse, "qty": -5},
+			{"item_code": avg_item, "warehouse": warehouse, "qty": -5},
+			{"item_code": batch_item, "warehouse": warehouse, "qty": -5, "batch_no": batch_no},
+			{"item_code": rate_only_item, "warehouse": warehouse, "qty": -5},
+		]
+		args_list = [dict(args, **common) for args in args_list]
+
+		expected = [get_incoming_rate(dict(args), raise_error_if_no_rate=False) for args in args_list]
+		self.assertEqual(get_incoming_rates(args_list, raise_error_if_no_rate=False), expected)
+		self.assertEqual(expected, [(100 * 10 + 200 * 5) / 15, 100, 150, 50, 42])
@@ -8,7 +8,15 @@ from hypothesis import strategies as st
 
 from erpnext.stock.doctype.item.test_item import make_item
 from erpnext.stock.doctype.stock_entry.stock_entry_utils import make_stock_entry
-from erpnext.stock.valuation import FIFOValuation, LIFOValuation, round_off_if_near_zero
+from erpnext.stock.valuation import (
+	COMPRESS_QUEUE_FROM_BINS,
+	DequeFIFOValuation,
+	FIFOValuation,
+	LIFOValuation,
+	decode_stock_queue,
+	encode_stock_queue,
+	round_off_if_near_zero,
+)
 
 qty_gen = st.floats(min_value=-1e6, max_value=1e6)
 value_gen = st.floats(min_value=1, max_value=1e6)
@@ -198,6 +206,71 @@ class TestFIFOValuation(unittest.TestCase):
 			self.assertGreaterEqual(total_value, 0)
 
 
+class TestDequeFIFOValuation(unittest.TestCase):
+	def assertSameAsFIFO(self, stock_queue, outgoing_rate=0.0, index_rates=True):
+		expected = FIFOValuation([])
+		queue = DequeFIFOValuation([], index_rates=index_rates)
+
+		for qty, rate in stock_queue:
+			if round_off_if_near_zero(qty) == 0:
+				continue
+			if qty > 0:
+				expected.add_stock(qty, rate)
+				queue.add_stock(qty, rate)
+			else:
+				self.assertEqual(
+					expected.remove_stock(abs(qty), outgoing_rate),
+					queue.remove_stock(abs(qty), outgoing_rate),
+				)
+			self.assertEqual(expected.state, queue.state)
+			self.assertEqual(expected.get_total_stock_and_value(), queue.get_total_stock_and_value())
+
+	def test_consumption_at_outgoing_rate(self):
+		queue = DequeFIFOValuation([[10, 10], [10, 20], [10, 30], [10, 20]])
+
+		self.assertEqual(queue.remove_stock(15, outgoing_rate=20), [[10, 20], [5, 20]])
+		self.assertEqual(queue, [[10, 10], [10, 30], [5, 20]])
+
+		self.assertEqual(queue.remove_stock(5, outgoing_rate=40), [[5, 10]])
+		self.assertEqual(queue.remove_stock(20), [[5, 10], [10, 30], [5, 20]])
+		self.assertEqual(queue.remove_stock(1), [[0, 0.0], [1, 0.0]])
+		self.assertEqual(queue, [[-1, 0.0]])
+
+	@given(stock_queue_generator)
+	def test_deque_fifo_hypothesis(self, stock_queue):
+		self.assertSameAsFIFO(stock_queue)
+
+	@given(stock_queue_generator)
+	def test_deque_fifo_with_outgoing_rate_hypothesis(self, stock_queue):
+		# repeat a few rates so that bins in the middle of the queue match the outgoing rate
+		rates = [rate for _, rate in stock_queue[:3]]
+		stock_queue = [
+			(qty, rates[i % 3] if i % 2 else rate) for i, (qty, rate) in enumerate(stock_queue)
+		]
+
+		self.assertSameAsFIFO(stock_queue, outgoing_rate=rates[1])
+		self.assertSameAsFIFO(stock_queue, outgoing_rate=rates[1], index_rates=False)
+
+
+class TestStockQueueEncoding(unittest.TestCase):
+	def test_legacy_json_queue(self):
+		self.assertEqual(decode_stock_queue('[[10, 100.5], [-2.0, 3]]'), [[10, 100.5], [-2, 3]])
+		self.assertEqual(decode_stock_queue(None), [])
+		self.assertEqual(encode_stock_queue([[10, 100.5]]), "[[10, 100.5]]")
+
+	def test_empty_queue_is_always_json(self):
+		self.assertEqual(encode_stock_queue([], compact=True), "[]")
+
+	@given(stock_queue_generator)
+	def test_compact_queue_roundtrip(self, stock_queue):
+		for size in (1, COMPRESS_QUEUE_FROM_BINS):
+			queue = [[qty, rate] for qty, rate in (stock_queue * size)[: size * 10]]
+			encoded = encode_stock_queue(queue, compact=True)
+
+			self.assertFalse(encoded.startswith("["))
+			self.assertEqual(decode_stock_queue(encoded), queue)
+
+
 class TestLIFOValuation(unittest.TestCase):
 	def setUp(self):
 		self.stack = LIFOValuation([])
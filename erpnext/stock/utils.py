@@ -11,7 +11,7 @@ from frappe.query_builder.functions import CombineDatetime
 from frappe.utils import cstr, flt, get_link_to_form, nowdate, nowtime
 
 import erpnext
-from erpnext.stock.valuation import FIFOValuation, LIFOValuation
+from erpnext.stock.valuation import decode_stock_queue, get_valuation_class
 
 BarcodeScanResult = Dict[str, Optional[str]]
 
@@ -149,30 +149,30 @@ def get_serial_nos_data_after_transactions(args):
 
 	serial_nos = set()
 	args = frappe._dict(args)
-	sle = frappe.qb.DocType("Stock Ledger Entry")
+	snle = frappe.qb.DocType("Serial No Ledger Entry")
 
-	stock_ledger_entries = (
-		frappe.qb.from_(sle)
-		.select("serial_no", "actual_qty")
+	serial_no_entries = (
+		frappe.qb.from_(snle)
+		.select(snle.serial_no, snle.actual_qty)
 		.where(
-			(sle.item_code == args.item_code)
-			& (sle.warehouse == args.warehouse)
+			(snle.item_code == args.item_code)
+			& (snle.warehouse == args.warehouse)
+			& (snle.stock_ledger_entry.isnotnull())
 			& (
-				CombineDatetime(sle.posting_date, sle.posting_time)
+				CombineDatetime(snle.posting_date, snle.posting_time)
 				< CombineDatetime(args.posting_date, args.posting_time)
 			)
-			& (sle.is_cancelled == 0)
+			& (snle.is_cancelled == 0)
 		)
-		.orderby(sle.posting_date, sle.posting_time, sle.creation)
+		.orderby(snle.posting_date, snle.posting_time, snle.creation)
 		.run(as_dict=1)
 	)
 
-	for stock_ledger_entry in stock_ledger_entries:
-		changed_serial_no = get_serial_nos_data(stock_ledger_entry.serial_no)
-		if stock_ledger_entry.actual_qty > 0:
-			serial_nos.update(changed_serial_no)
+	for entry in serial_no_entries:
+		if entry.actual_qty > 0:
+			serial_nos.add(entry.serial_no)
 		else:
-			serial_nos.difference_update(changed_serial_no)
+			serial_nos.discard(entry.serial_no)
 
 	return "\n".join(serial_nos)
 
@@ -244,12 +244,16 @@ def get_or_make_bin(item_code: str, warehouse: str) -> str:
 def _create_bin(item_code, warehouse):
 	"""Create a bin and take care of concurrent inserts."""
 
+	from erpnext.stock.doctype.bin.bin import bin_lock_wait
+
 	bin_creation_savepoint = "create_bin"
 	try:
 		frappe.db.savepoint(bin_creation_savepoint)
 		bin_obj = frappe.get_doc(doctype="Bin", item_code=item_code, warehouse=warehouse)
 		bin_obj.flags.ignore_permissions = 1
-		bin_obj.insert()
+		with bin_lock_wait() as locked_bins:
+			bin_obj.insert()
+			locked_bins.append(bin_obj.name)
 	except frappe.UniqueValidationError:
 		frappe.db.rollback(save_point=bin_creation_savepoint)  # preserve transaction in postgres
 		bin_obj = frappe.get_last_doc("Bin", {"item_code": item_code, "warehouse": warehouse})
@@ -289,7 +293,7 @@ def get_incoming_rate(args, raise_error_if_no_rate=True):
 		previous_sle = get_previous_sle(args)
 		if valuation_method in ("FIFO", "LIFO"):
 			if previous_sle:
-				previous_stock_queue = json.loads(previous_sle.get("stock_queue", "[]") or "[]")
+				previous_stock_queue = decode_stock_queue(previous_sle.get("stock_queue"))
 				in_rate = (
 					_get_fifo_lifo_rate(previous_stock_queue, args.get("qty") or 0, valuation_method)
 					if previous_stock_queue
@@ -314,6 +318,86 @@ def get_incoming_rate(args, raise_error_if_no_rate=True):
 	return flt(in_rate)
 
 
+def get_incoming_rates(args_list, raise_error_if_no_rate=True):
+	"""Get Incoming Rates of many rows (e.g. items of a voucher) in a few set based queries.
+
+	Rows with serial nos are resolved one by one via `get_incoming_rate`.
+	Returns the incoming rates in the same order as `args_list`."""
+	from erpnext.stock.stock_ledger import (
+		get_batch_incoming_rates,
+		get_batchwise_valuation_batches,
+		get_previous_sles,
+		get_valuation_rate,
+		get_valuation_rates,
+	)
+
+	in_rates = [None] * len(args_list)
+	rows = []
+	for idx, args in enumerate(args_list):
+		if isinstance(args, str):
+			args = json.loads(args)
+
+		args = frappe._dict(args)
+		if args.get("serial_no") or args.get("sle") or not (args.item_code and args.warehouse):
+			in_rates[idx] = get_incoming_rate(args, raise_error_if_no_rate)
+			continue
+
+		args.voucher_no = args.get("voucher_no") or args.get("name")
+		args.posting_date = args.get("posting_date") or "1900-01-01"
+		args.posting_time = args.get("posting_time") or "00:00"
+		rows.append((idx, args))
+
+	batchwise_batches = get_batchwise_valuation_batches(args.batch_no for idx, args in rows)
+	batch_rows = [(idx, args) for idx, args in rows if args.batch_no in batchwise_batches]
+	batch_rates = get_batch_incoming_rates([args for idx, args in batch_rows])
+	for idx, args in batch_rows:
+		key = (args.item_code, args.warehouse, args.batch_no, args.posting_date, args.posting_time)
+		in_rates[idx] = batch_rates.get(key)
+
+	item_rows = [(idx, args) for idx, args in rows if args.batch_no not in batchwise_batches]
+	previous_sles = get_previous_sles([args for idx, args in item_rows])
+	for idx, args in item_rows:
+		key = (args.item_code, args.warehouse, args.posting_date, args.posting_time)
+		previous_sle = previous_sles.get(key) or {}
+
+		valuation_method = get_valuation_method(args.item_code)
+		if valuation_method in ("FIFO", "LIFO"):
+			if previous_sle:
+				previous_stock_queue = decode_stock_queue(previous_sle.get("stock_queue"))
+				in_rates[idx] = (
+					_get_fifo_lifo_rate(previous_stock_queue, args.get("qty") or 0, valuation_method)
+					if previous_stock_queue
+					else 0
+				)
+		elif valuation_method == "Moving Average":
+			in_rates[idx] = previous_sle.get("valuation_rate") or 0
+
+	rows_by_currency = {}
+	for idx, args in rows:
+		if in_rates[idx] is None:
+			currency = erpnext.get_company_currency(args.get("company"))
+			rows_by_currency.setdefault(currency, []).append((idx, args))
+
+	for currency, currency_rows in rows_by_currency.items():
+		valuation_rates = get_valuation_rates([args for idx, args in currency_rows], currency=currency)
+		for (idx, args), valuation_rate in zip(currency_rows, valuation_rates):
+			if not valuation_rate and raise_error_if_no_rate and not args.get("allow_zero_valuation"):
+				# raises with the ways to fix it, if a rate is required
+				valuation_rate = get_valuation_rate(
+					args.item_code,
+					args.warehouse,
+					args.get("voucher_type"),
+					args.voucher_no,
+					currency=currency,
+					company=args.get("company"),
+					batch_no=args.batch_no,
+				)
+
+			in_rates[idx] = valuation_rate
+
+	return [flt(in_rate) for in_rate in in_rates]
+
+
 def get_avg_purchase_rate(serial_nos):
 	"""get average value of serial numbers"""
 
@@ -349,7 +433,7 @@ def get_lifo_rate(previous_stock_queue, qty):
 
 
 def _get_fifo_lifo_rate(previous_stock_queue, qty, method):
-	ValuationKlass = LIFOValuation if method == "LIFO" else FIFOValuation
+	ValuationKlass = get_valuation_class(method)
 
 	stock_queue = ValuationKlass(previous_stock_queue)
 	if flt(qty) >= 0:
@@ -1,6 +1,13 @@
+import base64
+import json
+import struct
+import zlib
 from abc import ABC, abstractmethod, abstractproperty
-from typing import Callable, List, NewType, Optional, Tuple
+from collections import deque
+from itertools import chain
+from typing import Callable, Deque, Dict, List, NewType, Optional, Set, Tuple, Type
 
+import frappe
 from frappe.utils import flt
 
 StockBin = NewType("StockBin", List[float])  # [[qty, rate], ...]
@@ -9,6 +16,12 @@ StockBin = NewType("StockBin", List[float])  # [[qty, rate], ...]
 QTY = 0
 RATE = 1
 
+# Prefixes of compact stock queues, legacy JSON queues always start with "["
+PACKED_QUEUE = "p:"
+COMPRESSED_QUEUE = "z:"
+# compression only pays off for longer queues
+COMPRESS_QUEUE_FROM_BINS = 32
+
 
 class BinWiseValuation(ABC):
 	@abstractmethod
@@ -150,6 +163,181 @@ class FIFOValuation(BinWiseValuation):
 		return consumed_bins
 
 
+class DequeFIFOValuation(BinWiseValuation):
+	"""FIFO valuation backed by a deque, meant for queues with a large number of bins.
+
+	Consumption happens exactly like `FIFOValuation`, but consuming the oldest bin is
+	O(1) instead of shifting the whole list. With `index_rates`, bins are also indexed
+	by rate so that consumption at a given outgoing rate does not scan the queue.
+
+	Bins consumed from the middle of the queue are marked as removed and dropped
+	once they reach either end of the deque or when too many of them pile up.
+	"""
+
+	# specifying the attributes to save resources
+	# ref: https://docs.python.org/3/reference/datamodel.html#slots
+	__slots__ = ["queue", "rate_index", "removed", "_state", "_totals"]
+
+	def __init__(self, state: Optional[List[StockBin]], index_rates: bool = True):
+		self.queue: Deque[StockBin] = deque([list(stock_bin) for stock_bin in state or []])
+		self.removed: Set[int] = set()
+		self._state: Optional[List[StockBin]] = None
+		self._totals: Optional[Tuple[float, float]] = None
+
+		self.rate_index: Optional[Dict[float, Deque[StockBin]]] = None
+		if index_rates:
+			self.rate_index = {}
+			for stock_bin in self.queue:
+				self.rate_index.setdefault(stock_bin[RATE], deque()).append(stock_bin)
+
+	@property
+	def state(self) -> List[StockBin]:
+		"""Get current state of queue, recomputed only after it is modified."""
+		if self._state is None:
+			self._state = [b for b in self.queue if not self.removed or id(b) not in self.removed]
+		return self._state
+
+	def get_total_stock_and_value(self) -> Tuple[float, float]:
+		if self._totals is None:
+			self._totals = super().get_total_stock_and_value()
+		return self._totals
+
+	def add_stock(self, qty: float, rate: float) -> None:
+		"""Update fifo queue with new stock, same as `FIFOValuation.add_stock`.
+
+		args:
+		        qty: new quantity to add
+		        rate: incoming rate of new quantity"""
+		self._state = self._totals = None
+
+		if not self.queue:
+			self._append(0, 0)
+
+		last_bin = self.queue[-1]
+		# last row has the same rate, merge new bin.
+		if last_bin[RATE] == rate:
+			last_bin[QTY] += qty
+		elif last_bin[QTY] > 0:
+			# Item has a positive balance qty, add new entry
+			self._append(qty, rate)
+		else:  # negative balance qty
+			qty = last_bin[QTY] + qty
+			if qty > 0:  # new balance qty is positive
+				self._unindex(last_bin)
+				last_bin[QTY], last_bin[RATE] = qty, rate
+				self._index(last_bin)
+			else:  # new balance qty is still negative, maintain same rate
+				last_bin[QTY] = qty
+
+	def remove_stock(
+		self, qty: float, outgoing_rate: float = 0.0, rate_generator: Callable[[], float] = None
+	) -> List[StockBin]:
+		"""Remove stock from the queue and return popped bins, same as `FIFOValuation.remove_stock`.
+
+		args:
+		        qty: quantity to remove
+		        rate: outgoing rate
+		        rate_generator: function to be called if queue is not found and rate is required.
+		"""
+		if not rate_generator:
+			rate_generator = lambda: 0.0  # noqa
+
+		self._state = self._totals = None
+		consumed_bins = []
+		while qty:
+			if not self.queue:
+				# rely on rate generator.
+				self._append(0, rate_generator())
+
+			# select first bin or the bin with same rate
+			fifo_bin = self.queue[0]
+			if outgoing_rate > 0:
+				fifo_bin = self._find_bin(outgoing_rate) or fifo_bin
+
+			if qty >= fifo_bin[QTY]:
+				# consume current bin
+				qty = round_off_if_near_zero(qty - fifo_bin[QTY])
+				self._remove(fifo_bin)
+				consumed_bins.append(list(fifo_bin))
+
+				if not self.queue and qty:
+					# stock finished, qty still remains to be withdrawn
+					# negative stock, keep in as a negative bin
+					self._append(-qty, outgoing_rate or fifo_bin[RATE])
+					consumed_bins.append([qty, outgoing_rate or fifo_bin[RATE]])
+					break
+			else:
+				# qty found in current bin consume it and exit
+				fifo_bin[QTY] = round_off_if_near_zero(fifo_bin[QTY] - qty)
+				consumed_bins.append([qty, fifo_bin[RATE]])
+				qty = 0
+
+		return consumed_bins
+
+	def _append(self, qty: float, rate: float) -> None:
+		stock_bin = [qty, rate]
+		self.queue.append(stock_bin)
+		self._index(stock_bin)
+
+	def _index(self, stock_bin: StockBin) -> None:
+		if self.rate_index is not None:
+			self.rate_index.setdefault(stock_bin[RATE], deque()).append(stock_bin)
+
+	def _unindex(self, stock_bin: StockBin) -> None:
+		if self.rate_index is None:
+			return
+
+		bins = self.rate_index[stock_bin[RATE]]
+		# bins leave from the front of the queue or are the first one having their rate,
+		# only rate changes of the last bin remove from the end.
+		if bins[0] is stock_bin:
+			bins.popleft()
+		elif bins[-1] is stock_bin:
+			bins.pop()
+		else:
+			bins.remove(stock_bin)
+
+		if not bins:
+			del self.rate_index[stock_bin[RATE]]
+
+	def _find_bin(self, rate: float) -> Optional[StockBin]:
+		"""First bin in the queue having `rate`."""
+		if self.rate_index is not None:
+			bins = self.rate_index.get(rate)
+			return bins[0] if bins else None
+
+		for stock_bin in self.queue:
+			if stock_bin[RATE] == rate and id(stock_bin) not in self.removed:
+				return stock_bin
+
+	def _remove(self, stock_bin: StockBin) -> None:
+		self._unindex(stock_bin)
+
+		if stock_bin is self.queue[0]:
+			self.queue.popleft()
+		elif stock_bin is self.queue[-1]:
+			self.queue.pop()
+		else:
+			# removed bins are still referenced by the queue, so their ids can't be reused
+			self.removed.add(id(stock_bin))
+
+		self._drop_removed_bins()
+
+	def _drop_removed_bins(self) -> None:
+		if not self.removed:
+			return
+
+		while self.queue and id(self.queue[0]) in self.removed:
+			self.removed.discard(id(self.queue.popleft()))
+
+		while self.queue and id(self.queue[-1]) in self.removed:
+			self.removed.discard(id(self.queue.pop()))
+
+		if len(self.removed) > 32 and len(self.removed) > len(self.queue) // 2:
+			self.queue = deque(b for b in self.queue if id(b) not in self.removed)
+			self.removed.clear()
+
+
 class LIFOValuation(BinWiseValuation):
 	"""Valuation method where a *stack* of all the incoming stock is maintained.
 
@@ -244,6 +432,52 @@ class LIFOValuation(BinWiseValuation):
 		return consumed_bins
 
 
+def get_valuation_class(
+	valuation_method: str, implementation: Optional[str] = None
+) -> Type[BinWiseValuation]:
+	"""Get the queue class used to value stock for FIFO / LIFO valuation method.
+
+	FIFO queues can be backed by a deque by setting `stock_queue_implementation`
+	to "deque" in site config, LIFO stacks are always appended and popped at the end."""
+	if valuation_method == "LIFO":
+		return LIFOValuation
+
+	implementation = implementation or frappe.conf.get("stock_queue_implementation")
+	return DequeFIFOValuation if implementation == "deque" else FIFOValuation
+
+
+def encode_stock_queue(stock_queue: List[StockBin], compact: bool = False) -> str:
+	"""Serialize a stock queue to be stored in Stock Ledger Entry.
+
+	Compact queues are little-endian doubles packed as qty, rate, qty, rate, ...
+	(zlib compressed for long queues) and base64 encoded. Empty queues are always
+	stored as "[]" as a few queries rely on it."""
+	if not compact or not stock_queue:
+		return json.dumps(stock_queue)
+
+	packed = struct.pack(f"<{2 * len(stock_queue)}d", *chain.from_iterable(stock_queue))
+	if len(stock_queue) < COMPRESS_QUEUE_FROM_BINS:
+		return PACKED_QUEUE + base64.b64encode(packed).decode()
+
+	return COMPRESSED_QUEUE + base64.b64encode(zlib.compress(packed, 1)).decode()
+
+
+def decode_stock_queue(value: Optional[str]) -> List[StockBin]:
+	"""Read a stock queue stored in either legacy JSON or compact format."""
+	if not value:
+		return []
+
+	if value.startswith(PACKED_QUEUE):
+		packed = base64.b64decode(value[len(PACKED_QUEUE) :])
+	elif value.startswith(COMPRESSED_QUEUE):
+		packed = zlib.decompress(base64.b64decode(value[len(COMPRESSED_QUEUE) :]))
+	else:
+		return json.loads(value)
+
+	values = iter(struct.unpack(f"<{len(packed) // 8}d", packed))
+	return list(map(list, zip(values, values)))
+
+
 def round_off_if_near_zero(number: float, precision: int = 7) -> float:
 	"""Rounds off the number to zero only if number is close to zero for decimal
 	specified in precision. Precision defaults to 7.